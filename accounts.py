@@ -0,0 +1,48 @@
+"""
+User accounts: signup and login.
+"""
+import hashlib
+
+import mysql.connector
+
+from db import get_connection
+from errors import ER_DUP_ENTRY, ConflictError, ValidationError
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def login_user(email, password):
+    """The Users row (dict) for these credentials, or None."""
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM Users WHERE email=%s AND password=%s", (email, hash_password(password)))
+        user = cursor.fetchone()
+        cursor.close()
+    return user
+
+
+def signup_user(name, email, phone, address, password):
+    """
+    Create a user and return the new user_id.
+    Raises ValidationError for missing fields and ConflictError when the
+    email is already registered.
+    """
+    if not name or not email or not password:
+        raise ValidationError("Name, email and password are required.")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO Users (name, email, phone, address, password) VALUES (%s,%s,%s,%s,%s)",
+                (name, email, phone, address, hash_password(password))
+            )
+            conn.commit()
+            return cursor.lastrowid
+        except mysql.connector.IntegrityError as e:
+            if e.errno == ER_DUP_ENTRY:
+                raise ConflictError("An account with this email already exists.") from e
+            raise
+        finally:
+            cursor.close()
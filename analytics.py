@@ -0,0 +1,197 @@
+"""
+Sales analytics for the admin dashboard.
+
+Every query reads the rollup tables from migration 006 (Sales_Daily_Restaurant,
+Sales_Daily_Item, Order_Status_Daily, Coupon_Usage_Daily), which triggers on
+Orders and Order_Items keep current as orders are placed, changed and
+cancelled.  A dashboard costs a handful of indexed range reads over at most
+days x restaurants (or items) rows, however many orders exist.  Results are
+cached briefly ("analytics" namespace).
+
+Revenue is the item revenue at the price paid (before coupon, tax and
+delivery fee) and excludes cancelled orders; coupon usage reports the final
+charged amounts.
+
+    python analytics.py --backfill     # rebuild the rollups from live and archived orders
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from cache import cache
+from db import get_connection
+from orders import union_parts
+
+ROLLUP_TABLES = ("Sales_Daily_Restaurant", "Sales_Daily_Item", "Order_Status_Daily", "Coupon_Usage_Daily",
+                 "Order_Restaurant_Lines")
+
+# The backfill of migrations/006_sales_rollups.sql, over live and archived
+# orders (orders.union_parts()).  Order_Restaurant_Lines is the item
+# triggers' bookkeeping and only covers live orders.
+_ITEM_SALES_SQL = """
+        SELECT DATE(o.order_date) AS sales_date, o.order_id, oi.menu_id, m.restaurant_id,
+               oi.quantity, oi.unit_price * oi.quantity AS amount
+        FROM {orders} o
+        JOIN {items} oi ON oi.order_id = o.order_id
+        JOIN Menu m ON m.menu_id = oi.menu_id
+        WHERE o.status <> 'Cancelled'
+"""
+_ORDERS_SQL = """
+        SELECT DATE(order_date) AS order_date, status, coupon_code, total_amount FROM {orders}
+"""
+
+
+def _all_orders(sql):
+    return union_parts(sql, include_archived=True)[0]
+
+
+BACKFILL_SQL = [
+    f"""
+    INSERT INTO Sales_Daily_Restaurant (sales_date, restaurant_id, orders, items_sold, revenue)
+    SELECT sales_date, restaurant_id, COUNT(DISTINCT order_id), SUM(quantity), SUM(amount)
+    FROM ({_all_orders(_ITEM_SALES_SQL)}) s
+    GROUP BY sales_date, restaurant_id
+    """,
+    f"""
+    INSERT INTO Sales_Daily_Item (sales_date, menu_id, restaurant_id, items_sold, revenue)
+    SELECT sales_date, menu_id, MIN(restaurant_id), SUM(quantity), SUM(amount)
+    FROM ({_all_orders(_ITEM_SALES_SQL)}) s
+    GROUP BY sales_date, menu_id
+    """,
+    f"""
+    INSERT INTO Order_Status_Daily (order_date, status, orders)
+    SELECT order_date, status, COUNT(*)
+    FROM ({_all_orders(_ORDERS_SQL)}) o
+    GROUP BY order_date, status
+    """,
+    f"""
+    INSERT INTO Coupon_Usage_Daily (usage_date, coupon_code, orders, cancelled, charged)
+    SELECT order_date, coupon_code, COUNT(*), SUM(status = 'Cancelled'),
+           SUM(CASE WHEN status <> 'Cancelled' THEN total_amount ELSE 0 END)
+    FROM ({_all_orders(_ORDERS_SQL)}) o
+    WHERE coupon_code IS NOT NULL
+    GROUP BY order_date, coupon_code
+    """,
+    """
+    INSERT INTO Order_Restaurant_Lines (order_id, restaurant_id, line_count)
+    SELECT oi.order_id, m.restaurant_id, COUNT(*)
+    FROM Order_Items oi
+    JOIN Menu m ON m.menu_id = oi.menu_id
+    GROUP BY oi.order_id, m.restaurant_id
+    """,
+]
+
+DAILY_REVENUE_SQL = """
+    SELECT sales_date, SUM(orders) AS orders, SUM(items_sold) AS items_sold, SUM(revenue) AS revenue
+    FROM Sales_Daily_Restaurant
+    WHERE sales_date BETWEEN %s AND %s
+    GROUP BY sales_date
+    ORDER BY sales_date
+"""
+RESTAURANT_REVENUE_SQL = """
+    SELECT s.restaurant_id, r.name AS restaurant_name,
+           SUM(s.orders) AS orders, SUM(s.items_sold) AS items_sold, SUM(s.revenue) AS revenue
+    FROM Sales_Daily_Restaurant s
+    LEFT JOIN Restaurants r ON r.restaurant_id = s.restaurant_id
+    WHERE s.sales_date BETWEEN %s AND %s
+    GROUP BY s.restaurant_id, r.name
+    ORDER BY revenue DESC
+"""
+TOP_ITEMS_SQL = """
+    SELECT s.menu_id, m.name AS item_name, r.name AS restaurant_name,
+           SUM(s.items_sold) AS items_sold, SUM(s.revenue) AS revenue
+    FROM Sales_Daily_Item s
+    LEFT JOIN Menu m ON m.menu_id = s.menu_id
+    LEFT JOIN Restaurants r ON r.restaurant_id = s.restaurant_id
+    WHERE s.sales_date BETWEEN %s AND %s
+    GROUP BY s.menu_id, m.name, r.name
+    ORDER BY items_sold DESC, revenue DESC
+    LIMIT %s
+"""
+STATUS_FUNNEL_SQL = """
+    SELECT status, SUM(orders) AS orders
+    FROM Order_Status_Daily
+    WHERE order_date BETWEEN %s AND %s
+    GROUP BY status
+    ORDER BY FIELD(status, 'Pending', 'Confirmed', 'Out for Delivery', 'Delivered', 'Cancelled')
+"""
+COUPON_USAGE_SQL = """
+    SELECT coupon_code, SUM(orders) AS orders, SUM(cancelled) AS cancelled, SUM(charged) AS charged
+    FROM Coupon_Usage_Daily
+    WHERE usage_date BETWEEN %s AND %s
+    GROUP BY coupon_code
+    ORDER BY orders DESC
+"""
+
+
+def _read(name, sql, params):
+    def load():
+        with get_connection() as conn:
+            return pd.read_sql(sql, conn, params=params)
+    return cache.get_or_load("analytics", (name,) + tuple(params), load)
+
+
+def daily_revenue(date_from, date_to):
+    """Per day: orders, items sold and item revenue (all restaurants)."""
+    return _read("daily", DAILY_REVENUE_SQL, (date_from, date_to))
+
+
+def revenue_by_restaurant(date_from, date_to):
+    """Per restaurant over the range, highest revenue first."""
+    return _read("restaurants", RESTAURANT_REVENUE_SQL, (date_from, date_to))
+
+
+def top_items(date_from, date_to, limit=10):
+    """Best-selling items by quantity over the range."""
+    return _read("items", TOP_ITEMS_SQL, (date_from, date_to, int(limit)))
+
+
+def status_funnel(date_from, date_to):
+    """Orders placed in the range by current status."""
+    return _read("funnel", STATUS_FUNNEL_SQL, (date_from, date_to))
+
+
+def coupon_usage(date_from, date_to):
+    """Orders, cancellations and charged totals per coupon code."""
+    return _read("coupons", COUPON_USAGE_SQL, (date_from, date_to))
+
+
+def backfill():
+    """
+    Rebuild every rollup table from Orders and Order_Items in one
+    transaction.  INSERT ... SELECT locks the rows it reads, so orders placed
+    meanwhile wait for it rather than being counted twice.  Returns
+    {table: rows}.
+    """
+    counts = {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            for table in ROLLUP_TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            for table, sql in zip(ROLLUP_TABLES, BACKFILL_SQL):
+                cursor.execute(sql)
+                counts[table] = cursor.rowcount
+            conn.commit()
+        finally:
+            cursor.close()
+    cache.invalidate("analytics")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sales rollup maintenance.")
+    parser.add_argument("--backfill", action="store_true", help="rebuild the rollup tables")
+    args = parser.parse_args(argv)
+    if not args.backfill:
+        parser.print_help()
+        return 1
+    for table, rows in backfill().items():
+        print(f"{table:<24} {rows} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
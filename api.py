@@ -0,0 +1,530 @@
+"""
+Async HTTP/JSON API for polling clients (customer and rider apps).
+
+Runs as its own process next to the Streamlit app, on Tornado's asyncio
+loop.  Reads (cart, order status, order history) and simple cart writes go
+through aiomysql with a separate async pool, so thousands of clients polling
+order status every few seconds cost one short indexed query each and no
+Streamlit session threads.  Checkout and status changes reuse the
+transactional service code (orders.place_order / set_order_status, with
+stock holds and the dispatcher) on a small thread pool, so there is one
+implementation of those rules.
+
+    python api.py                      # listens on FOOD_API_PORT (8502)
+
+Endpoints (JSON in and out; send "Authorization: Bearer <token>"):
+
+    POST   /api/login                      {"email", "password"} -> {"token", "expires_in", "user"}
+    GET    /api/cart
+    POST   /api/cart                       {"menu_id", "quantity"} or {"items": [{"menu_id", "quantity"}, ...]}
+    PUT    /api/cart                       {"items": [...]}  set quantities (0 removes)
+    POST   /api/cart/remove                {"cart_ids": [...]}
+    DELETE /api/cart/<cart_id>
+    POST   /api/checkout                   {"cart_ids", "payment_method", "coupon_code"?}
+    GET    /api/orders?before=<id>&limit=<n>     order history, newest first
+                                                 (&archived=1 includes archived orders)
+    GET    /api/orders/<order_id>                status (ETag; 304 when unchanged)
+    GET    /api/orders/<order_id>?history=1      ... with the status history
+    PUT    /api/orders/<order_id>/status   {"status"}  (users may only cancel)
+    POST   /api/orders/<order_id>/reorder  put the order's items back in the cart
+    GET    /api/orders/changes?after=<history_id>  status changes since a cursor
+    GET    /api/search?q=<text>&min_price=&max_price=&in_stock=1&restaurant_id=&limit=
+                                           dish search (in-memory index, no login)
+
+Settings:
+
+    FOOD_API_PORT           (default 8502)
+    FOOD_API_SECRET         signs user tokens; random per process when unset
+    FOOD_API_TOKEN_TTL      seconds a user token stays valid (default 86400)
+    FOOD_API_ADMIN_TOKEN    bearer token allowed to set any status (riders/admin)
+    FOOD_API_POOL_MIN / FOOD_API_POOL_MAX   async pool size (default 1 / 20)
+    FOOD_API_WORKERS        threads for checkout / status changes (default 8)
+
+Status changes are served from this process's order feed (feed.py), so a
+client polling /api/orders/changes costs no query while it is caught up;
+call it without `after` once to get the current cursor.
+
+Caches are per process: the Streamlit app sees cart changes made here once
+its cached cart entry expires (cache.DEFAULT_TTLS["cart"]).
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+import aiomysql
+import pymysql
+import tornado.web
+
+import accounts
+import cart
+import orders
+from db import DB_CONFIG, POOL_CONFIG, _env_int
+from dispatcher import ACTIVE_STATUSES
+from feed import BATCH as FEED_BATCH, FEED_SQL, order_feed
+from search import DEFAULT_LIMIT as SEARCH_LIMIT, menu_index
+from errors import ER_NO_REFERENCED_ROW, ConflictError, NotFoundError, ServiceError, ValidationError
+
+ORDER_STATUSES = ('Pending', 'Confirmed', 'Out for Delivery', 'Delivered', 'Cancelled')
+HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+MAX_SEARCH_LIMIT = 200
+
+API_CONFIG = {
+    "port": _env_int("FOOD_API_PORT", 8502),
+    "secret": os.environ.get("FOOD_API_SECRET") or secrets.token_hex(32),
+    "admin_token": os.environ.get("FOOD_API_ADMIN_TOKEN"),
+    "token_ttl": _env_int("FOOD_API_TOKEN_TTL", 24 * 3600),
+    "pool_min": _env_int("FOOD_API_POOL_MIN", 1),
+    "pool_max": _env_int("FOOD_API_POOL_MAX", 20),
+    "workers": _env_int("FOOD_API_WORKERS", 8),
+}
+
+ORDER_SQL = """
+    SELECT order_id, user_id, status, subtotal_amount, total_amount, coupon_code,
+           delivery_partner_id, order_date, updated_at
+    FROM Orders
+    WHERE order_id = %s
+"""
+# Run per table set with orders.union_parts() (archived ones with ?archived=1)
+HISTORY_ORDERS_SQL = """
+    SELECT o.order_id, o.status, o.subtotal_amount, o.total_amount, o.order_date,
+           d.name AS delivery_partner_name
+    FROM {orders} o
+    LEFT JOIN Delivery_Partners d ON o.delivery_partner_id = d.delivery_partner_id
+    WHERE o.user_id = %s {before}
+    ORDER BY o.order_id DESC
+    LIMIT %s
+"""
+HISTORY_ITEMS_SQL = """
+    SELECT oi.order_id, oi.order_item_id, oi.menu_id, m.name AS item_name, m.category, oi.quantity,
+           oi.unit_price AS price, (oi.unit_price * oi.quantity) AS total,
+           r.restaurant_id, r.name AS restaurant_name
+    FROM {items} oi
+    JOIN Menu m ON oi.menu_id = m.menu_id
+    JOIN Restaurants r ON m.restaurant_id = r.restaurant_id
+    WHERE oi.order_id IN ({ids})
+"""
+
+
+# --------------------------
+# TOKENS
+# --------------------------
+def _sign(user_id, expires):
+    message = f"{user_id}.{expires}".encode()
+    return hmac.new(API_CONFIG["secret"].encode(), message, hashlib.sha256).hexdigest()
+
+
+def make_token(user_id, now=None):
+    """"<user_id>.<expiry (unix time)>.<signature>", valid for token_ttl seconds."""
+    expires = int(now if now is not None else time.time()) + API_CONFIG["token_ttl"]
+    return f"{user_id}.{expires}.{_sign(user_id, expires)}"
+
+
+def verify_token(token, now=None):
+    """user_id for a valid, unexpired user token, else None."""
+    parts = (token or "").split(".")
+    if len(parts) != 3:
+        return None
+    user_id, expires, sig = parts
+    # isdigit() alone accepts digits like "²" that int() rejects, and
+    # compare_digest() raises on non-ASCII strings
+    if not (user_id.isascii() and user_id.isdigit() and expires.isascii() and expires.isdigit()
+            and sig.isascii()):
+        return None
+    if int(expires) < (now if now is not None else time.time()):
+        return None
+    user_id, expires = int(user_id), int(expires)
+    return user_id if hmac.compare_digest(sig, _sign(user_id, expires)) else None
+
+
+# --------------------------
+# HANDLERS
+# --------------------------
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+class ApiHandler(tornado.web.RequestHandler):
+    """JSON bodies, bearer-token auth and ServiceError -> HTTP status mapping."""
+
+    STATUS_FOR = ((ValidationError, 400), (NotFoundError, 404), (ConflictError, 409), (ServiceError, 409))
+
+    @property
+    def pool(self):
+        return self.application.settings["db_pool"]
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def send(self, payload, status=200):
+        self.set_status(status)
+        self.finish(json.dumps(payload, default=_json_default))
+
+    def body(self):
+        try:
+            data = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise ValidationError("Request body must be JSON.")
+        if not isinstance(data, dict):
+            raise ValidationError("Request body must be a JSON object.")
+        return data
+
+    def bearer(self):
+        header = self.request.headers.get("Authorization", "")
+        return header[7:].strip() if header.startswith("Bearer ") else None
+
+    def is_admin(self):
+        admin = API_CONFIG["admin_token"]
+        token = self.bearer()
+        return bool(admin and token and hmac.compare_digest(token, admin))
+
+    def current_user_id(self):
+        user_id = verify_token(self.bearer())
+        if user_id is None:
+            raise tornado.web.HTTPError(401)
+        return user_id
+
+    async def fetchall(self, sql, params=()):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+
+    async def execute(self, sql, params):
+        """Run one write statement; returns its rowcount."""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                try:
+                    await cur.execute(sql, params)
+                except pymysql.err.IntegrityError as e:
+                    if e.args and e.args[0] == ER_NO_REFERENCED_ROW:
+                        raise NotFoundError("One or more items are no longer available.") from e
+                    raise
+                return cur.rowcount
+
+    async def in_thread(self, fn, *args):
+        """Run a blocking service call on the API's worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.application.settings["executor"], fn, *args)
+
+    def write_error(self, status_code, **kwargs):
+        reason = self._reason
+        exc = kwargs.get("exc_info", (None, None))[1]
+        if isinstance(exc, ServiceError):
+            reason = str(exc)
+        self.finish(json.dumps({"error": reason}))
+
+    def log_exception(self, typ, value, tb):
+        if not isinstance(value, ServiceError):
+            super().log_exception(typ, value, tb)
+
+    def send_error(self, status_code=500, **kwargs):
+        exc = kwargs.get("exc_info", (None, None))[1]
+        if isinstance(exc, ServiceError):
+            status_code = next(code for cls, code in self.STATUS_FOR if isinstance(exc, cls))
+        super().send_error(status_code, **kwargs)
+
+
+class LoginHandler(ApiHandler):
+    async def post(self):
+        data = self.body()
+        user = await self.in_thread(accounts.login_user, data.get("email", ""), data.get("password", ""))
+        if user is None:
+            raise tornado.web.HTTPError(401)
+        user.pop("password", None)
+        self.send({"token": make_token(user["user_id"]), "expires_in": API_CONFIG["token_ttl"], "user": user})
+
+
+class CartHandler(ApiHandler):
+    async def get(self):
+        user_id = self.current_user_id()
+        self.send({"items": await self.fetchall(cart.CART_SQL, (user_id,))})
+
+    def items(self, data):
+        """{menu_id: quantity} from an "items" list of {"menu_id", "quantity"} objects."""
+        items = data.get("items")
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            raise ValidationError('"items" must be a list of {"menu_id", "quantity"} objects.')
+        return [(i.get("menu_id"), i.get("quantity", 1)) for i in items]
+
+    async def put(self):
+        user_id = self.current_user_id()
+        # insert + delete in one transaction: run the service on a worker thread
+        await self.in_thread(cart.set_quantities, user_id, self.items(self.body()))
+        self.send({"items": await self.fetchall(cart.CART_SQL, (user_id,))})
+
+    async def post(self):
+        user_id = self.current_user_id()
+        data = self.body()
+        if "items" in data:
+            items = cart.normalize_items(self.items(data))
+            if items:
+                await self.execute(*cart.upsert_sql(user_id, items))
+            return self.send({"items": await self.fetchall(cart.CART_SQL, (user_id,))}, 201)
+        try:
+            menu_id, quantity = int(data["menu_id"]), int(data.get("quantity", 1))
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError("menu_id and a numeric quantity are required.")
+        if quantity <= 0:
+            raise ValidationError("Quantity must be at least 1.")
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                try:
+                    await cur.execute(cart.ADD_SQL, (user_id, menu_id, quantity))
+                except pymysql.err.IntegrityError as e:
+                    if e.args and e.args[0] == ER_NO_REFERENCED_ROW:
+                        raise NotFoundError("This item is no longer available.") from e
+                    raise
+                cart_id = cur.lastrowid
+        self.send({"cart_id": cart_id}, 201)
+
+
+class CartRemoveHandler(ApiHandler):
+    async def post(self):
+        user_id = self.current_user_id()
+        try:
+            cart_ids = [int(c) for c in self.body().get("cart_ids") or []]
+        except (TypeError, ValueError):
+            raise ValidationError('"cart_ids" must be a list of integers.')
+        removed = 0
+        if cart_ids:
+            removed = await self.execute(
+                f"DELETE FROM Cart WHERE user_id=%s AND cart_id IN ({','.join(['%s'] * len(cart_ids))})",
+                [user_id] + cart_ids,
+            )
+        self.send({"removed": removed})
+
+
+class ReorderHandler(ApiHandler):
+    async def post(self, order_id):
+        user_id = self.current_user_id()
+        if not await self.execute(cart.REORDER_SQL, (int(order_id), user_id)):
+            raise NotFoundError("None of this order's items are available.")
+        self.send({"items": await self.fetchall(cart.CART_SQL, (user_id,))}, 201)
+
+
+class CartItemHandler(ApiHandler):
+    async def delete(self, cart_id):
+        user_id = self.current_user_id()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("DELETE FROM Cart WHERE cart_id=%s AND user_id=%s", (int(cart_id), user_id))
+                removed = cur.rowcount > 0
+        if not removed:
+            raise NotFoundError("Cart item not found.")
+        self.set_status(204)
+        self.finish()
+
+
+class CheckoutHandler(ApiHandler):
+    async def post(self):
+        user_id = self.current_user_id()
+        data = self.body()
+        cart_ids = data.get("cart_ids")
+        payment_method = data.get("payment_method")
+        if not isinstance(cart_ids, list) or not cart_ids or not payment_method:
+            raise ValidationError("cart_ids (non-empty list) and payment_method are required.")
+        try:
+            cart_ids = [int(c) for c in cart_ids]
+        except (TypeError, ValueError):
+            raise ValidationError('"cart_ids" must be a list of integers.')
+        result = await self.in_thread(
+            orders.place_order, user_id, cart_ids, payment_method, data.get("coupon_code") or None
+        )
+        self.send(result, 201)
+
+
+class OrderHistoryHandler(ApiHandler):
+    async def get(self):
+        user_id = self.current_user_id()
+        try:
+            before = self.get_query_argument("before", None)
+            before = int(before) if before else None
+            limit = min(int(self.get_query_argument("limit", HISTORY_PAGE_SIZE)), MAX_HISTORY_PAGE_SIZE)
+        except ValueError:
+            raise ValidationError("before and limit must be integers.")
+        if limit < 1:
+            raise ValidationError("limit must be at least 1.")
+
+        # Live orders only, unless ?archived=1
+        archived = self.get_query_argument("archived", "") in ("1", "true")
+
+        query, params = orders.union_parts(
+            HISTORY_ORDERS_SQL, [user_id] + ([before] if before else []) + [limit + 1], archived,
+            before="AND o.order_id < %s" if before else "",
+        )
+        rows = await self.fetchall(query + " ORDER BY order_id DESC LIMIT %s", params + (limit + 1,))
+        next_before = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_before = rows[-1]["order_id"]
+        if rows:
+            ids = [row["order_id"] for row in rows]
+            query, params = orders.union_parts(HISTORY_ITEMS_SQL, ids, archived, ids=",".join(["%s"] * len(ids)))
+            items = await self.fetchall(query + " ORDER BY order_id DESC, order_item_id", params)
+            by_order = {}
+            for item in items:
+                del item["order_item_id"]
+                by_order.setdefault(item.pop("order_id"), []).append(item)
+            for row in rows:
+                row["items"] = by_order.get(row["order_id"], [])
+        self.send({"orders": rows, "next_before": next_before})
+
+
+class OrderChangesHandler(ApiHandler):
+    async def get(self):
+        # Users get changes to their own orders; the admin token gets all.
+        user_id = None if self.is_admin() else self.current_user_id()
+        after = self.get_query_argument("after", None)
+        if after is None:
+            rows = await self.fetchall("SELECT IFNULL(MAX(history_id), 0) AS last_id FROM Order_Status_History")
+            return self.send({"events": [], "last_id": rows[0]["last_id"]})
+        try:
+            after = int(after)
+        except ValueError:
+            raise ValidationError("after must be an integer.")
+
+        events, complete = order_feed.since(after, user_id)
+        if complete:
+            last_id = max(after, order_feed.cursor())
+        else:
+            # Cursor older than the in-memory buffer: read the next FEED_BATCH
+            # rows of the table and keep the user's.  The cursor moves past
+            # the whole window, so a user without events there still advances.
+            rows = await self.fetchall(FEED_SQL, (after, FEED_BATCH))
+            events = [row for row in rows if user_id is None or row["user_id"] == user_id]
+            last_id = rows[-1]["history_id"] if rows else after
+        self.send({"events": events, "last_id": last_id})
+
+
+class SearchHandler(ApiHandler):
+    async def get(self):
+        def number(name, cast=float):
+            value = self.get_query_argument(name, None)
+            try:
+                return cast(value) if value not in (None, "") else None
+            except ValueError:
+                raise ValidationError(f"{name} must be a number.")
+
+        query = self.get_query_argument("q", "")
+        filters = {
+            "min_price": number("min_price"),
+            "max_price": number("max_price"),
+            "in_stock": self.get_query_argument("in_stock", "") in ("1", "true"),
+            "restaurant_id": number("restaurant_id", int),
+            "limit": min(number("limit", int) or SEARCH_LIMIT, MAX_SEARCH_LIMIT),
+        }
+        # may (re)load restaurants from the database first: keep it off the loop
+        results = await self.in_thread(lambda: menu_index.search(query, **filters))
+        self.send({"results": results})
+
+
+class OrderHandler(ApiHandler):
+    async def _load(self, order_id):
+        rows = await self.fetchall(ORDER_SQL, (int(order_id),))
+        order = rows[0] if rows else None
+        if order is None or (not self.is_admin() and order["user_id"] != self.current_user_id()):
+            raise NotFoundError("Order not found.")
+        return order
+
+    async def get(self, order_id):
+        # Polling clients send If-None-Match; Tornado answers 304 when the
+        # body (and so its ETag) is unchanged.
+        order = await self._load(order_id)
+        if self.get_query_argument("history", None):
+            order["history"] = await self.fetchall(
+                "SELECT history_id, old_status, new_status, changed_at, changed_by "
+                "FROM Order_Status_History WHERE order_id=%s ORDER BY history_id",
+                (order["order_id"],)
+            )
+        self.send(order)
+
+
+class OrderStatusHandler(OrderHandler):
+    async def put(self, order_id):
+        order = await self._load(order_id)
+        status = self.body().get("status")
+        if status not in ORDER_STATUSES:
+            raise ValidationError(f"status must be one of: {', '.join(ORDER_STATUSES)}.")
+        if not self.is_admin() and status != 'Cancelled':
+            raise tornado.web.HTTPError(403)
+        if order["status"] not in ACTIVE_STATUSES:
+            raise ConflictError(f"Order is already {order['status']}.")
+        await self.in_thread(orders.set_order_status, order["order_id"], status)
+        self.send(await self._load(order_id))
+
+
+# --------------------------
+# APPLICATION
+# --------------------------
+async def create_pool():
+    return await aiomysql.create_pool(
+        host=DB_CONFIG["host"], port=DB_CONFIG["port"], user=DB_CONFIG["user"],
+        password=DB_CONFIG["password"], db=DB_CONFIG["database"],
+        minsize=API_CONFIG["pool_min"], maxsize=API_CONFIG["pool_max"],
+        pool_recycle=int(POOL_CONFIG["recycle"]),
+        # Every statement here stands alone; autocommit also keeps pooled
+        # connections from holding an old REPEATABLE READ snapshot, which
+        # would make polled statuses look frozen.
+        autocommit=True,
+    )
+
+
+def make_app(db_pool, executor):
+    return tornado.web.Application([
+        (r"/api/login", LoginHandler),
+        (r"/api/cart", CartHandler),
+        (r"/api/cart/remove", CartRemoveHandler),
+        (r"/api/cart/(\d+)", CartItemHandler),
+        (r"/api/checkout", CheckoutHandler),
+        (r"/api/orders", OrderHistoryHandler),
+        (r"/api/orders/changes", OrderChangesHandler),
+        (r"/api/orders/(\d+)", OrderHandler),
+        (r"/api/orders/(\d+)/status", OrderStatusHandler),
+        (r"/api/orders/(\d+)/reorder", ReorderHandler),
+        (r"/api/search", SearchHandler),
+    ], db_pool=db_pool, executor=executor)
+
+
+async def serve(port):
+    db_pool = await create_pool()
+    executor = ThreadPoolExecutor(max_workers=API_CONFIG["workers"], thread_name_prefix="api-worker")
+    app = make_app(db_pool, executor)
+    app.listen(port)
+    print(f"Order API listening on :{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        db_pool.close()
+        await db_pool.wait_closed()
+        executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Async order API.")
+    parser.add_argument("--port", type=int, default=API_CONFIG["port"])
+    args = parser.parse_args(argv)
+    if not os.environ.get("FOOD_API_SECRET"):
+        print("FOOD_API_SECRET is not set; tokens are only valid until this process exits.")
+    try:
+        asyncio.run(serve(args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,32 @@
 import streamlit as st
 import mysql.connector
 import pandas as pd
-import hashlib
-import random
-import os
-from PIL import Image
-
-# -------------------------------------------------------------------
-# Ensure fresh DB data each run (help avoid stale caches)
-# -------------------------------------------------------------------
-try:
-    st.cache_data.clear()
-except Exception:
-    pass
+import tempfile
+from datetime import date, timedelta
+
+from db import pool_stats
+from cache import cache
+import images
+import accounts
+import analytics
+import cart
+import catalog
+import coupons
+import export
+import menu_import
+import orders
+import pricing
+import querystats
+import reviews
+from catalog import (
+    load_summaries, filter_summaries, get_restaurants, get_menu_by_restaurant,
+    get_reviews_by_restaurant, get_delivery_partners, REVIEW_PAGE_SIZE,
+)
+from orders import get_orders_page
+from pricing import TAX_RATE
+from errors import NotFoundError, ServiceError
+from feed import order_feed
+from search import menu_index, search_menu
 
 # --------------------------
 # RERUN FUNCTION
@@ -21,52 +35,23 @@ def rerun_app():
     st.session_state['rerun'] = not st.session_state.get('rerun', False)
 
 # --------------------------
-# DATABASE CONNECTION
+# ACCOUNTS
 # --------------------------
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="Sirishreyu@2431",
-        database="FoodOrdering"
-    )
-
-# --------------------------
-# PASSWORD UTILITIES
-# --------------------------
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
 def login_user(email, password):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM Users WHERE email=%s AND password=%s", (email, hash_password(password)))
-    user = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return user
+    return accounts.login_user(email, password)
 
 def signup_user(name, email, phone, address, password):
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute(
-            "INSERT INTO Users (name, email, phone, address, password) VALUES (%s,%s,%s,%s,%s)",
-            (name, email, phone, address, hash_password(password))
-        )
-        conn.commit()
+        accounts.signup_user(name, email, phone, address, password)
         return True
-    except mysql.connector.Error as e:
+    except (ServiceError, mysql.connector.Error) as e:
         st.error(f"Error: {e}")
         return False
-    finally:
-        cursor.close()
-        conn.close()
 
 # --------------------------
 # BANNER (visible on all pages)
 # --------------------------
-def show_banner(image_path):
+def show_banner():
     st.markdown("""
     <style>
     .stApp { background: linear-gradient(135deg, #ffe4b5, #fff5ee); color: #222; }
@@ -76,316 +61,210 @@ def show_banner(image_path):
     </style>
     """, unsafe_allow_html=True)
 
-    if os.path.exists(image_path):
-        try:
-            st.image(image_path, width=700)
-        except Exception as e:
-            st.warning(f"Banner image could not be displayed: {e}")
+    banner = images.banner(700)
+    if banner:
+        st.image(banner, width=700)
     else:
-        st.warning(f"⚠️ Banner image not found: {image_path}")
-
-# --------------------------
-# DATA FETCH HELPERS (always fresh)
-# --------------------------
-def get_restaurants():
-    conn = get_connection()
-    df = pd.read_sql("SELECT * FROM Restaurants ORDER BY restaurant_id", conn)
-    conn.close()
-    return df
-
-def get_menu_by_restaurant(restaurant_id):
-    conn = get_connection()
-    df = pd.read_sql("SELECT * FROM Menu WHERE restaurant_id=%s ORDER BY menu_id", conn, params=(restaurant_id,))
-    conn.close()
-    return df
-
-def get_reviews_by_restaurant(restaurant_id):
-    conn = get_connection()
-    df = pd.read_sql("""
-        SELECT u.name AS user_name, r.rating, r.comment, r.review_date
-        FROM Reviews r
-        JOIN Users u ON r.user_id = u.user_id
-        WHERE r.restaurant_id=%s
-        ORDER BY r.review_date DESC
-    """, conn, params=(restaurant_id,))
-    conn.close()
-    return df
+        st.warning(f"⚠️ Banner image not found: images/{images.BANNER}")
 
 # --------------------------
 # CART FUNCTIONS
 # --------------------------
-def add_to_cart(user_id, menu_id, quantity):
+# The cart lives in st.session_state['cart'] (cart.SessionCart): clicks only
+# change it in memory and flush_cart() writes the coalesced changes on
+# checkout, navigation, logout or every CART_SYNC_INTERVAL seconds.
+CART_SYNC_INTERVAL = cart.SessionCart.FLUSH_INTERVAL
+
+def session_cart(user_id):
+    sc = st.session_state.get('cart')
+    if sc is None or sc.user_id != int(user_id):
+        sc = cart.SessionCart(user_id)
+        st.session_state['cart'] = sc
+    return sc
+
+def flush_cart(force=True):
+    """Write pending cart changes; returns False (with an error shown) on failure."""
+    sc = st.session_state.get('cart')
+    if sc is None:
+        return True
+    try:
+        sc.flush(force=force)
+        return True
+    except NotFoundError as e:
+        # an item left the menu: drop the local changes and show the table
+        sc.reload()
+        st.error(f"❌ {e} Your cart was reloaded.")
+    except (ServiceError, mysql.connector.Error) as e:
+        st.error(f"❌ Could not save your cart: {e}")
+    return False
+
+@st.fragment(run_every=CART_SYNC_INTERVAL)
+def sync_cart():
+    """Write-behind timer: flush the session cart once its changes are due."""
+    if 'cart' in st.session_state:
+        flush_cart(force=False)
+
+def add_to_cart(user_id, item, quantity):
     """
-    Add item to cart. If the same (user_id, menu_id) already exists,
-    increment the quantity. Also set a session_state flag so rapid
-    double-fires won't create duplicates from repeated reruns.
+    Add item (a menu row plus restaurant_name) to the session cart; it is
+    written to the Cart table by the next flush.  A session_state flag keeps
+    rapid double-fires from adding twice in the same run.
     """
     # session key to prevent duplicate processing during the same run
-    key = f"added_{user_id}_{menu_id}"
+    key = f"added_{user_id}_{item['menu_id']}"
     if st.session_state.get(key):
         # Already processed in this UI run
         return
 
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        # Cart has UNIQUE KEY (user_id, menu_id) so ON DUPLICATE KEY works
-        cursor.execute("""
-            INSERT INTO Cart (user_id, menu_id, quantity)
-            VALUES (%s, %s, %s)
-            ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
-        """, (user_id, menu_id, quantity))
-        conn.commit()
+        session_cart(user_id).add(item['menu_id'], quantity, {
+            'restaurant_id': item['restaurant_id'], 'item_name': item['name'],
+            'category': item['category'], 'price': item['price'],
+            'restaurant_name': item['restaurant_name'],
+        })
         # Provide a simple message (no balloons)
         st.success("Added to cart!")
         # mark processed for this run (will reset on next rerun)
         st.session_state[key] = True
-    except mysql.connector.Error as e:
+    except (ServiceError, mysql.connector.Error) as e:
         st.error(f"DB error adding to cart: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
-    # clear caches and trigger UI refresh
-    try:
-        st.cache_data.clear()
-    except Exception:
-        pass
     rerun_app()
 
 def get_cart(user_id):
-    conn = get_connection()
-    df = pd.read_sql("""
-        SELECT c.cart_id, m.menu_id, m.name AS item_name, m.category, m.price, c.quantity,
-               (m.price * c.quantity) AS total, r.name AS restaurant_name
-        FROM Cart c
-        JOIN Menu m ON c.menu_id = m.menu_id
-        JOIN Restaurants r ON m.restaurant_id = r.restaurant_id
-        WHERE c.user_id=%s
-    """, conn, params=(user_id,))
-    conn.close()
-    return df
-
-def remove_cart_item(cart_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM Cart WHERE cart_id=%s", (cart_id,))
-    conn.commit()
-    conn.close()
-    st.info("Item removed from cart!")
+    sc = session_cart(user_id)
+    if sc.flush_due():
+        flush_cart(force=False)
+    return sc.frame()
+
+def remove_cart_items(user_id, menu_ids):
+    """Remove cart lines (by menu_id) from the session cart."""
+    session_cart(user_id).remove(menu_ids)
+    st.info(f"{len(menu_ids)} item(s) removed from cart!")
+    rerun_app()
+
+def reorder(user_id, order_id):
+    """Put all items of a past order back in the cart (one statement)."""
+    if not flush_cart():
+        return
     try:
-        st.cache_data.clear()
-    except Exception:
-        pass
+        cart.reorder(user_id, order_id)
+        session_cart(user_id).reload()
+        st.success(f"Items from order #{order_id} added to your cart!")
+    except (ServiceError, mysql.connector.Error) as e:
+        st.error(f"❌ Could not reorder: {e}")
     rerun_app()
 
 # --------------------------
 # ORDER FUNCTIONS
 # --------------------------
-def get_delivery_partners():
-    """
-    Fetch all available delivery partners from the database.
-    Returns a list of dictionaries with keys: delivery_partner_id, name.
-    """
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute("SELECT delivery_partner_id, name FROM Delivery_Partners ORDER BY name;")
-        partners = cursor.fetchall()
-        return partners
-    except mysql.connector.Error as e:
-        st.error(f"❌ Error fetching delivery partners: {e}")
-        return []
-    finally:
-        cursor.close()
-        conn.close()
-
-def place_selected_items(user_id, selected_cart_ids, payment_method, coupon_code=None):
+def place_selected_items(user_id, selected_menu_ids, payment_method, coupon_code=None):
     """
-    Place order for selected cart rows. Applies coupon, tax, delivery fee
-    and stores final total in Orders and Payments.
+    Place order for selected cart lines. Applies coupon, tax, delivery fee
+    and stores final total in Orders and Payments (one transaction).
     """
-    if not selected_cart_ids:
+    if not selected_menu_ids:
         st.warning("No items selected.")
         return
 
-    TAX_RATE = 0.05
-    DELIVERY_FEE = 30.00
+    # the order is built from Cart rows: write pending changes first
+    if not flush_cart():
+        return
+    sc = session_cart(user_id)
+    if sc.conflict:
+        st.warning("Your cart was changed in another session; please review it before ordering.")
+        return
+    cart_df = sc.frame()
+    selected_cart_ids = [int(c) for c in cart_df[cart_df['menu_id'].isin(selected_menu_ids)]['cart_id']]
 
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-        # 1) Create order row (no delivery partner assigned)
-        cursor.execute(
-            "INSERT INTO Orders (user_id, total_amount, status, delivery_partner_id) VALUES (%s, %s, %s, %s)",
-            (user_id, 0.00, 'Pending', None)
-        )
-        conn.commit()
-        v_order_id = cursor.lastrowid
-
-        # 1.a) Assign a delivery partner automatically (random)
-        cursor.execute("SELECT delivery_partner_id FROM Delivery_Partners ORDER BY RAND() LIMIT 1")
-        partner = cursor.fetchone()
-        delivery_partner_id = partner['delivery_partner_id'] if partner else None
-        cursor.execute("UPDATE Orders SET delivery_partner_id=%s WHERE order_id=%s", (delivery_partner_id, v_order_id))
-        conn.commit()
-
-        # 2) Copy selected cart rows into Order_Items
-        placeholders = ",".join(["%s"] * len(selected_cart_ids))
-        insert_sql = f"""
-            INSERT INTO Order_Items (order_id, menu_id, quantity)
-            SELECT %s, menu_id, quantity FROM Cart
-            WHERE cart_id IN ({placeholders}) AND user_id = %s
-        """
-        params = [v_order_id] + selected_cart_ids + [user_id]
-        cursor.execute(insert_sql, params)
-        conn.commit()
-
-        # 3) Compute subtotal for inserted items
-        cursor.execute("""
-            SELECT IFNULL(SUM(m.price * oi.quantity), 0.00) AS subtotal
-            FROM Order_Items oi
-            JOIN Menu m ON oi.menu_id = m.menu_id
-            WHERE oi.order_id = %s
-        """, (v_order_id,))
-        row = cursor.fetchone()
-        subtotal = float(row['subtotal'] or 0.0)
-
-        # 4) Coupon lookup + discount calculation (cap by max_discount_amount)
-        discount = 0.0
-        if coupon_code:
-            cursor.execute("""
-                SELECT * FROM Coupons
-                WHERE code=%s AND active=TRUE AND (expiry_date IS NULL OR expiry_date >= CURDATE())
-                LIMIT 1
-            """, (coupon_code,))
-            coupon = cursor.fetchone()
-            if coupon:
-                pct = float(coupon.get('discount_percent') or 0) / 100.0
-                max_disc = float(coupon.get('max_discount_amount') or 0.0)
-                discount = min(subtotal * pct, max_disc)
-
-        subtotal_after_coupon = max(subtotal - discount, 0.0)
-        tax_amount = subtotal_after_coupon * TAX_RATE
-        final_total = subtotal_after_coupon + tax_amount + (DELIVERY_FEE if subtotal > 0 else 0.0)
-
-        # 5) Update Orders.total_amount with final_total
-        cursor.execute("UPDATE Orders SET total_amount=%s WHERE order_id=%s", (final_total, v_order_id))
-        conn.commit()
-
-        # 6) Insert Payment record (include coupon_code if Payments table supports it)
-        try:
-            cursor.execute(
-                "INSERT INTO Payments (order_id, amount, method, status, coupon_code) VALUES (%s,%s,%s,%s,%s)",
-                (v_order_id, final_total, payment_method, 'Completed', coupon_code)
-            )
-        except mysql.connector.Error:
-            # Fallback if coupon_code column does not exist
-            cursor.execute(
-                "INSERT INTO Payments (order_id, amount, method, status) VALUES (%s,%s,%s,%s)",
-                (v_order_id, final_total, payment_method, 'Completed')
-            )
-        conn.commit()
+        result = orders.place_order(user_id, selected_cart_ids, payment_method, coupon_code)
+    except (ServiceError, mysql.connector.Error) as e:
+        st.error(f"❌ Error placing order: {e}")
+        return
 
-        # 7) Remove those cart rows
-        delete_sql = f"DELETE FROM Cart WHERE cart_id IN ({placeholders}) AND user_id = %s"
-        delete_params = selected_cart_ids + [user_id]
-        cursor.execute(delete_sql, delete_params)
-        conn.commit()
+    # success message (no balloons)
+    st.success(f"Order #{result['order_id']} placed successfully! Final total: ₹{result['total']:.2f}")
+    # ordered lines left the Cart table
+    sc.reload()
+    # checkout holds for the ordered items were consumed
+    st.session_state.pop('held_items', None)
+    # new orders are not in the status feed: reload the order history once
+    st.session_state.pop('order_history', None)
+    rerun_app()
 
-        # success message (no balloons)
-        st.success(f"Order #{v_order_id} placed successfully! Final total: ₹{final_total:.2f}")
-        try:
-            st.cache_data.clear()
-        except Exception:
-            pass
-        rerun_app()
+def get_order_items(user_id=None):
+    return orders.get_order_items(user_id)
 
-    except mysql.connector.Error as e:
-        st.error(f"❌ Error placing order: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
+ORDER_FEED_REFRESH = 2  # seconds between checks of the order status feed
 
-# --------------------------
-# Fetch orders for display (this was missing earlier - ensure defined)
-# --------------------------
-def get_order_items(user_id=None):
+def load_order_history(user_id):
     """
-    Fetch all orders with restaurant, user, and delivery partner info.
-    Returns a flat dataframe with one row per order-item.
+    The user's order rows, queried once per session and then kept current by
+    applying Order_Status_History events from the order feed.  Subscribes
+    before loading so no change between the query and the first check is lost.
     """
-    conn = get_connection()
-    query = """
-        SELECT 
-            o.order_id,
-            o.user_id,
-            o.status,
-            o.total_amount,
-            o.order_date,
-            u.name AS user_name,
-            d.name AS delivery_partner_name,
-            m.name AS item_name,
-            m.category,
-            r.name AS restaurant_name,
-            r.restaurant_id,
-            oi.quantity,
-            (m.price * oi.quantity) AS total
-        FROM Orders o
-        JOIN Users u ON o.user_id = u.user_id
-        LEFT JOIN Delivery_Partners d ON o.delivery_partner_id = d.delivery_partner_id
-        JOIN Order_Items oi ON o.order_id = oi.order_id
-        JOIN Menu m ON oi.menu_id = m.menu_id
-        JOIN Restaurants r ON m.restaurant_id = r.restaurant_id
+    sub = st.session_state.get('order_feed')
+    if sub is None or sub.user_id != user_id:
+        sub = order_feed.subscribe(user_id)
+        st.session_state['order_feed'] = sub
+        st.session_state.pop('order_history', None)
+    if sub.overflowed or 'order_history' not in st.session_state:
+        sub.reset()
+        st.session_state['order_history'] = get_order_items(user_id)
+    return st.session_state['order_history']
+
+def apply_order_events(events):
     """
-
-    if user_id:
-        query += " WHERE o.user_id=%s ORDER BY o.order_id DESC"
-        df = pd.read_sql(query, conn, params=(user_id,))
-    else:
-        query += " ORDER BY o.order_id DESC"
-        df = pd.read_sql(query, conn)
-
-    conn.close()
-    return df
+    Apply status events to the session's order history.  Returns True when
+    something changed; an event for an unknown order drops the history so
+    the next run reloads it.
+    """
+    df = st.session_state.get('order_history')
+    if df is None:
+        return False
+    changed = False
+    for event in events:
+        mask = df['order_id'] == event['order_id']
+        if not mask.any():
+            st.session_state.pop('order_history', None)
+            return True
+        if (df.loc[mask, 'status'] != event['new_status']).any():
+            df.loc[mask, 'status'] = event['new_status']
+            changed = True
+    return changed
+
+@st.fragment(run_every=ORDER_FEED_REFRESH)
+def watch_order_feed():
+    """Rerun the page only when the feed has status changes for this user."""
+    sub = st.session_state.get('order_feed')
+    if sub is None:
+        return
+    if sub.overflowed:
+        st.session_state.pop('order_history', None)
+        st.rerun()
+    if apply_order_events(sub.drain()):
+        st.rerun()
 
 def update_order_status(order_id, new_status):
-    """Update the order's status and trigger history logging."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE Orders SET status=%s WHERE order_id=%s", (new_status, order_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-    try:
-        st.cache_data.clear()
-    except Exception:
-        pass
-
+    """Update the order's status and trigger history logging (cancel restores stock)."""
+    orders.set_order_status(order_id, new_status)
+    # show our own change right away; the feed event that follows is a no-op
+    apply_order_events([{'order_id': order_id, 'new_status': new_status}])
     rerun_app()
 
 def submit_review(user_id, restaurant_id, rating, comment):
     """Submit a user review via stored procedure AddReview."""
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.callproc('AddReview', [user_id, restaurant_id, rating, comment])
-        conn.commit()
+        reviews.submit_review(user_id, restaurant_id, rating, comment)
         st.success("⭐ Review submitted successfully!")
-    except mysql.connector.Error as e:
+    except (ServiceError, mysql.connector.Error) as e:
         st.error(f"❌ Error submitting review: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
-    try:
-        st.cache_data.clear()
-    except Exception:
-        pass
     rerun_app()
 
+ORDER_STATUSES = ['Pending', 'Confirmed', 'Out for Delivery', 'Delivered', 'Cancelled']
+
 # --------------------------
 # LOGIN / SIGNUP
 # --------------------------
@@ -429,6 +308,7 @@ def show_login_signup():
 # --------------------------
 # ADMIN PORTAL
 # --------------------------
+MAX_IMPORT_PREVIEW = 500  # changed rows listed after an import
 def show_admin_portal():
     st.header("👨‍💼 Admin Dashboard")
     # Admin logout button in sidebar (always visible)
@@ -436,10 +316,18 @@ def show_admin_portal():
         st.session_state.clear()
         rerun_app()
 
-    tabs = st.tabs(["Restaurants", "Menu", "Orders"])
+    # Connection pool gauges (in use / idle / checkout wait)
+    with st.sidebar.expander("DB connection pool"):
+        st.json(pool_stats())
+    with st.sidebar.expander("Catalog cache"):
+        st.json(cache.stats())
+    with st.sidebar.expander("Dish search index"):
+        st.json(menu_index.stats())
+
+    tabs = st.tabs(["Restaurants", "Menu", "Orders", "Analytics", "Export", "Performance"])
 
     # --- RESTAURANTS TAB ---
-    with tabs[0]:
+    with tabs[0], querystats.page_render("Admin: Restaurants"):
         st.subheader("🏢 Manage Restaurants")
         rest_df = get_restaurants()
         st.dataframe(rest_df)
@@ -448,37 +336,26 @@ def show_admin_portal():
         address = st.text_input("Address", key="add_rest_address")
 
         if st.button("Add Restaurant", key="add_rest_btn"):
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute("INSERT INTO Restaurants (name, address) VALUES (%s,%s)", (name, address))
-            conn.commit()
-            conn.close()
-            st.success("✅ Restaurant added successfully!")
             try:
-                st.cache_data.clear()
-            except Exception:
-                pass
+                catalog.add_restaurant(name, address)
+                st.success("✅ Restaurant added successfully!")
+            except ServiceError as e:
+                st.error(f"❌ {e}")
             rerun_app()
 
         if not rest_df.empty:
             rest_name = st.selectbox("Select Restaurant to Delete", rest_df['name'], key="delete_rest_select")
             if st.button("🗑️ Delete Selected Restaurant", key="delete_rest_btn"):
                 rest_id = int(rest_df[rest_df['name'] == rest_name]['restaurant_id'].values[0])
-                conn = get_connection()
-                cur = conn.cursor()
-                cur.execute("DELETE FROM Menu WHERE restaurant_id=%s", (rest_id,))
-                cur.execute("DELETE FROM Restaurants WHERE restaurant_id=%s", (rest_id,))
-                conn.commit()
-                conn.close()
-                st.warning(f"'{rest_name}' deleted successfully!")
                 try:
-                    st.cache_data.clear()
-                except Exception:
-                    pass
+                    catalog.delete_restaurant(rest_id)
+                    st.warning(f"'{rest_name}' deleted successfully!")
+                except ServiceError as e:
+                    st.error(f"❌ {e}")
                 rerun_app()
 
     # --- MENU TAB ---
-    with tabs[1]:
+    with tabs[1], querystats.page_render("Admin: Menu"):
         rest_df = get_restaurants()
         if not rest_df.empty:
             rest_name = st.selectbox("Select Restaurant", rest_df['name'], key="menu_rest_select")
@@ -486,6 +363,9 @@ def show_admin_portal():
             menu_df = get_menu_by_restaurant(rest_id)
             st.dataframe(menu_df)
 
+            with st.expander("📥 Bulk import / price & stock feed (CSV or JSON)"):
+                show_menu_import(rest_id, rest_name)
+
             st.markdown("### ➕ Add New Menu Item")
             name = st.text_input("Item Name", key="add_menu_name")
             category = st.text_input("Category", key="add_menu_category")
@@ -493,19 +373,11 @@ def show_admin_portal():
             stock = st.number_input("Stock", min_value=0, step=1, key="add_menu_stock")
 
             if st.button("Add Item", key="add_menu_btn"):
-                conn = get_connection()
-                cur = conn.cursor()
-                cur.execute(
-                    "INSERT INTO Menu (restaurant_id, name, category, price, stock) VALUES (%s,%s,%s,%s,%s)",
-                    (rest_id, name, category, price, stock)
-                )
-                conn.commit()
-                conn.close()
-                st.success("✅ Item added successfully!")
                 try:
-                    st.cache_data.clear()
-                except Exception:
-                    pass
+                    catalog.add_menu_item(rest_id, name, category, price, stock)
+                    st.success("✅ Item added successfully!")
+                except ServiceError as e:
+                    st.error(f"❌ {e}")
                 rerun_app()
 
             if not menu_df.empty:
@@ -526,44 +398,86 @@ def show_admin_portal():
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("💾 Update Item", key="update_menu_btn"):
-                        conn = get_connection()
-                        cur = conn.cursor()
-                        cur.execute("UPDATE Menu SET price=%s, stock=%s WHERE menu_id=%s",
-                                    (new_price, new_stock, menu_id))
-                        conn.commit()
-                        conn.close()
-                        st.success(f"✅ '{menu_name}' updated successfully!")
                         try:
-                            st.cache_data.clear()
-                        except Exception:
-                            pass
+                            catalog.update_menu_item(rest_id, menu_id, new_price, new_stock)
+                            st.success(f"✅ '{menu_name}' updated successfully!")
+                        except ServiceError as e:
+                            st.error(f"❌ {e}")
                         rerun_app()
 
                 with col2:
                     if st.button("🗑️ Delete Item", key="delete_menu_btn"):
-                        conn = get_connection()
-                        cur = conn.cursor()
-                        cur.execute("DELETE FROM Menu WHERE menu_id=%s", (menu_id,))
-                        conn.commit()
-                        conn.close()
-                        st.warning(f"'{menu_name}' deleted successfully!")
                         try:
-                            st.cache_data.clear()
-                        except Exception:
-                            pass
+                            catalog.delete_menu_item(rest_id, menu_id)
+                            st.warning(f"'{menu_name}' deleted successfully!")
+                        except ServiceError as e:
+                            st.error(f"❌ {e}")
                         rerun_app()
         else:
             st.warning("⚠️ No restaurants found. Please add one first.")
 
     # --- ORDERS TAB ---
-    with tabs[2]:
+    with tabs[2], querystats.page_render("Admin: Orders"):
         st.subheader("📦 Manage Orders")
 
-        df = get_order_items()
+        # Server-side filters; only one page of orders is fetched and rendered
+        fcol1, fcol2, fcol3 = st.columns(3)
+        with fcol1:
+            statuses = st.multiselect("Status", ORDER_STATUSES, key="adm_ord_status")
+            page_size = st.selectbox("Orders per page", [10, 20, 50, 100], index=1, key="adm_ord_page_size")
+        with fcol2:
+            date_range = st.date_input("Order date range", value=(), key="adm_ord_dates")
+            rest_df = get_restaurants()
+            rest_names = ["All"] + list(rest_df['name'])
+            rest_choice = st.selectbox("Restaurant", rest_names, key="adm_ord_rest")
+        with fcol3:
+            partners = get_delivery_partners()
+            partner_names = ["All"] + [p['name'] for p in partners]
+            partner_choice = st.selectbox("Delivery Partner", partner_names, key="adm_ord_partner")
+            include_archived = st.checkbox("Include archived orders", key="adm_ord_archived")
+
+        date_from = date_range[0] if len(date_range) > 0 else None
+        date_to = date_range[1] if len(date_range) > 1 else date_from
+        restaurant_id = None
+        if rest_choice != "All":
+            restaurant_id = int(rest_df[rest_df['name'] == rest_choice]['restaurant_id'].values[0])
+        partner_id = None
+        if partner_choice != "All":
+            partner_id = next(p['delivery_partner_id'] for p in partners if p['name'] == partner_choice)
+
+        # Keyset cursors: stack of "before order_id" values, reset when filters change
+        filters = (tuple(statuses), date_from, date_to, restaurant_id, partner_id, page_size, include_archived)
+        if st.session_state.get('adm_ord_filters') != filters:
+            st.session_state['adm_ord_filters'] = filters
+            st.session_state['adm_ord_cursors'] = [None]
+            st.session_state['adm_ord_next_before'] = None
+        cursors = st.session_state['adm_ord_cursors']
+
+        # Apply pager clicks before fetching, so the page shown matches the click
+        if st.session_state.get('adm_ord_prev') and len(cursors) > 1:
+            cursors.pop()
+        elif st.session_state.get('adm_ord_next') and st.session_state.get('adm_ord_next_before'):
+            cursors.append(st.session_state['adm_ord_next_before'])
+
+        df, next_before = get_orders_page(
+            statuses=statuses, date_from=date_from, date_to=date_to,
+            restaurant_id=restaurant_id, delivery_partner_id=partner_id,
+            before_order_id=cursors[-1], page_size=page_size, include_archived=include_archived,
+        )
+        st.session_state['adm_ord_next_before'] = next_before
+
+        ncol1, ncol2, ncol3 = st.columns([1, 1, 3])
+        with ncol1:
+            st.button("⬅️ Newer", key="adm_ord_prev", disabled=len(cursors) <= 1)
+        with ncol2:
+            st.button("Older ➡️", key="adm_ord_next", disabled=next_before is None)
+        with ncol3:
+            st.caption(f"Page {len(cursors)}")
+
         if df.empty:
             st.info("No orders found.")
         else:
-            grouped = df.groupby("order_id")
+            grouped = df.groupby("order_id", sort=False)
 
             for order_id, group in grouped:
                 status = group["status"].iloc[0]
@@ -574,9 +488,11 @@ def show_admin_portal():
                 st.write(f"🛵 **Delivery Partner:** {delivery_partner}")
 
                 st.dataframe(
-                    group[['item_name', 'restaurant_name', 'quantity', 'total']],
+                    group[['item_name', 'restaurant_name', 'quantity', 'price', 'total']],
                     use_container_width=True
                 )
+                st.write(f"Subtotal: ₹{float(group['subtotal_amount'].iloc[0]):.2f} | "
+                         f"Charged: ₹{float(group['total_amount'].iloc[0]):.2f}")
 
                 col1, col2 = st.columns(2)
 
@@ -594,72 +510,354 @@ def show_admin_portal():
 
                 st.markdown("---")
 
+    # --- ANALYTICS TAB ---
+    with tabs[3], querystats.page_render("Admin: Analytics"):
+        show_analytics()
+
+    # --- EXPORT TAB ---
+    with tabs[4], querystats.page_render("Admin: Export"):
+        show_export()
+
+    # --- PERFORMANCE TAB ---
+    with tabs[5]:
+        show_performance()
+
+def show_menu_import(rest_id, rest_name):
+    """Upload menu rows, preview the diff and apply it in one transaction (menu_import.py)."""
+    st.caption("Columns: menu_id (optional), name, category, price, stock. "
+               "Empty cells keep the current value.")
+    upload = st.file_uploader("Menu file", type=["csv", "json"], key="import_file")
+    feed = st.checkbox("Feed across all restaurants (every row has a menu_id)", key="import_feed")
+    delete_missing = st.checkbox(f"Delete items of {rest_name} that are not in the file",
+                                 key="import_delete", disabled=feed)
+    if upload is None:
+        return
+    target = None if feed else rest_id
+
+    icol1, icol2 = st.columns(2)
+    dry_run = icol1.button("🔍 Preview changes", key="import_preview")
+    apply = icol2.button("✅ Apply import", key="import_apply")
+    if not (dry_run or apply):
+        return
+    try:
+        records = menu_import.read_records(upload.getvalue(), filename=upload.name)
+        result = menu_import.import_menu(target, records, delete_missing and not feed, dry_run=dry_run)
+    except ServiceError as e:
+        st.error(f"❌ {e}")
+        return
+    except mysql.connector.Error as e:
+        st.error(f"❌ Import failed, nothing was changed: {e}")
+        return
+
+    verb = "Would apply" if result["dry_run"] else "Applied"
+    st.success(f"{verb}: {result['inserted']} inserted, {result['updated']} updated, "
+               f"{result['deleted']} deleted, {result['unchanged']} unchanged.")
+    plan = result["plan"]
+    if plan["inserts"]:
+        st.markdown("**New items**")
+        st.dataframe(pd.DataFrame(plan["inserts"][:MAX_IMPORT_PREVIEW], columns=["restaurant_id", "name", "category", "price", "stock"]))
+    if plan["updates"]:
+        st.markdown("**Changed items**")
+        st.dataframe(pd.DataFrame([
+            {"menu_id": old["menu_id"], "name": new["name"],
+             **{f: f"{old[f]} → {new[f]}" if old[f] != new[f] else "" for f in menu_import.FIELDS[1:]}}
+            for old, new in plan["updates"][:MAX_IMPORT_PREVIEW]
+        ]))
+    if plan["deletes"]:
+        st.markdown("**Deleted items**")
+        st.dataframe(pd.DataFrame(plan["deletes"][:MAX_IMPORT_PREVIEW]))
+    if not result["dry_run"]:
+        rerun_app()
+
+def show_analytics():
+    """Sales dashboard read from the rollup tables (analytics.py)."""
+    st.subheader("📊 Sales Analytics")
+    today = date.today()
+    date_range = st.date_input("Order date range", value=(today - timedelta(days=29), today), key="ana_dates")
+    date_from = date_range[0] if len(date_range) > 0 else today
+    date_to = date_range[1] if len(date_range) > 1 else date_from
+
+    try:
+        daily = analytics.daily_revenue(date_from, date_to)
+        by_restaurant = analytics.revenue_by_restaurant(date_from, date_to)
+        items = analytics.top_items(date_from, date_to)
+        funnel = analytics.status_funnel(date_from, date_to)
+        coupon_df = analytics.coupon_usage(date_from, date_to)
+    except mysql.connector.Error as e:
+        st.error(f"❌ Analytics unavailable: {e}")
+        return
+
+    mcol1, mcol2, mcol3 = st.columns(3)
+    mcol1.metric("Revenue", f"₹{float(daily['revenue'].sum()):,.2f}")
+    mcol2.metric("Orders (not cancelled)", int(funnel[funnel['status'] != 'Cancelled']['orders'].sum()))
+    mcol3.metric("Items sold", int(daily['items_sold'].sum()))
+
+    st.markdown("#### Daily revenue")
+    if daily.empty:
+        st.info("No sales in this period.")
+    else:
+        st.line_chart(daily.set_index('sales_date')['revenue'])
+
+    st.markdown("#### Revenue per restaurant")
+    st.dataframe(by_restaurant, use_container_width=True)
+    st.markdown("#### Top selling items")
+    st.dataframe(items, use_container_width=True)
+
+    fcol, ccol = st.columns(2)
+    with fcol:
+        st.markdown("#### Order status funnel")
+        st.dataframe(funnel, use_container_width=True)
+    with ccol:
+        st.markdown("#### Coupon usage")
+        st.dataframe(coupon_df, use_container_width=True)
+
+def show_export():
+    """
+    Export orders, items, payments and rollups for a date range.  Files are
+    streamed to disk in chunks (export.py) and only read back for a download
+    button when that file is asked for, one file at a time.  The session's
+    export directory is removed on the next export, at logout or when the
+    session ends (TemporaryDirectory cleans up when garbage collected).
+    """
+    st.subheader("📤 Export Orders & Sales")
+    ecol1, ecol2 = st.columns(2)
+    with ecol1:
+        date_range = st.date_input("Order date range", value=(), key="exp_dates")
+        fmt = st.selectbox("Format", export.FORMATS, key="exp_format")
+    with ecol2:
+        datasets = st.multiselect("Datasets", list(export.DATASETS), default=list(export.DATASETS),
+                                  key="exp_datasets")
+        include_archived = st.checkbox("Include archived orders (slower)", key="exp_archived")
+
+    date_from = date_range[0] if len(date_range) > 0 else None
+    date_to = date_range[1] if len(date_range) > 1 else date_from
+    if st.button("Run export", key="exp_run", disabled=not datasets):
+        # Only the latest export of a session is kept on disk
+        previous = st.session_state.pop('exp_dir', None)
+        if previous is not None:
+            previous.cleanup()
+        st.session_state.pop('exp_results', None)
+        st.session_state.pop('exp_ready', None)
+        st.session_state['exp_dir'] = tempfile.TemporaryDirectory(prefix="food-export-")
+        try:
+            with st.spinner("Exporting..."):
+                st.session_state['exp_results'] = export.export(
+                    date_from, date_to, st.session_state['exp_dir'].name, fmt, datasets,
+                    include_archived=include_archived,
+                )
+        except (mysql.connector.Error, ImportError) as e:
+            st.error(f"❌ Export failed: {e}")
+
+    for dataset, (path, rows) in st.session_state.get('exp_results', {}).items():
+        if not path.exists():
+            continue
+        if st.session_state.get('exp_ready') != dataset:
+            if st.button(f"Prepare {dataset} ({rows} rows)", key=f"exp_prep_{dataset}"):
+                st.session_state['exp_ready'] = dataset
+                st.rerun()
+            continue
+        with open(path, "rb") as f:
+            st.download_button(f"⬇️ {dataset} ({rows} rows)", f, file_name=path.name, key=f"exp_dl_{dataset}")
+
+def show_performance():
+    """Query latency per fingerprint and per page (querystats.py)."""
+    st.subheader("⏱️ Query Performance")
+    stats = querystats.stats
+    acquire = stats.acquire_summary()
+    pcol1, pcol2, pcol3, pcol4 = st.columns(4)
+    pcol1.metric("Pool checkouts", acquire["checkouts"])
+    pcol2.metric("Acquire avg (ms)", f"{acquire['avg_ms']:.2f}")
+    pcol3.metric("Acquire p95 (ms)", f"{acquire['p95_ms']:.2f}")
+    pcol4.metric("Acquire max (ms)", f"{acquire['max_ms']:.2f}")
+
+    st.markdown("**Per page render**")
+    pages = pd.DataFrame(stats.page_rows())
+    if pages.empty:
+        st.info("No page renders recorded yet.")
+    else:
+        st.dataframe(pages.round(2), use_container_width=True)
+
+    st.markdown("**Statements** (slowest total time first; p50/p95 are histogram bucket bounds)")
+    queries = pd.DataFrame(stats.query_rows())
+    if queries.empty:
+        st.info("No statements recorded yet.")
+    else:
+        st.dataframe(queries.round(2), use_container_width=True)
+
+    st.markdown(f"**Slow statements** (≥ {querystats.SLOW_QUERY_SECONDS * 1000:.0f} ms, latest first)")
+    slow = pd.DataFrame(stats.slow_queries())
+    if slow.empty:
+        st.info("No slow statements.")
+    else:
+        slow["at"] = pd.to_datetime(slow["at"], unit="s")
+        slow["ms"] = (slow.pop("seconds") * 1000).round(1)
+        st.dataframe(slow, use_container_width=True)
+
+    dcol1, dcol2 = st.columns(2)
+    with dcol1:
+        st.download_button("⬇️ Prometheus metrics", stats.render_prometheus(),
+                           file_name="food_metrics.prom", key="perf_prom")
+    with dcol2:
+        if st.button("Reset statistics", key="perf_reset"):
+            stats.reset()
+            rerun_app()
+
 # --------------------------
 # RESTAURANT BROWSING
 # --------------------------
+DISH_SEARCH_LIMIT = 30
 def show_restaurants_dropdown_menu():
     user = st.session_state['user']
     st.header("🍴 Browse Restaurants")
 
-    restaurant_images = {
-        'Pizza Palace': r"C:\Users\Dr Bharathi\Desktop\FOOD ORDERING SYSTEM\images\pizza-palace.jpg",
-        'Sushi World': r"C:\Users\Dr Bharathi\Desktop\FOOD ORDERING SYSTEM\images\sushi-world.jpg",
-        'Burger Hub': r"C:\Users\Dr Bharathi\Desktop\FOOD ORDERING SYSTEM\images\burger-hub.jpeg",
-        'Curry House': r"C:\Users\Dr Bharathi\Desktop\FOOD ORDERING SYSTEM\images\curry-house.jpeg",
-        'Taco Town': r"C:\Users\Dr Bharathi\Desktop\FOOD ORDERING SYSTEM\images\taco.jpeg",
-        'Pasta Corner': r"C:\Users\Dr Bharathi\Desktop\FOOD ORDERING SYSTEM\images\pasta-corner.jpeg",
-        'Sandwich Stop': r"C:\Users\Dr Bharathi\Desktop\FOOD ORDERING SYSTEM\images\sandwich-shop.png"
-    }
+    # Summaries only (restaurants, ratings, categories, price ranges); the
+    # filters run over this in-memory list without touching the database.
+    summaries = load_summaries()
+    all_categories = sorted({c for s in summaries for c in s['categories']})
+    prices = [p for s in summaries for p in (s['min_price'], s['max_price']) if p is not None]
+
+    fcol1, fcol2 = st.columns([2, 2])
+    with fcol1:
+        search = st.text_input("Search restaurants", key="browse_search",
+                               placeholder="Restaurant name or category")
+    with fcol2:
+        categories = st.multiselect("Categories", all_categories, key="browse_categories")
+    price_range = None
+    if prices and min(prices) < max(prices):
+        lo, hi = int(min(prices)), int(max(prices)) + 1
+        price_range = st.slider("Price range (₹)", lo, hi, (lo, hi), key="browse_price")
+        if price_range == (lo, hi):
+            price_range = None
+
+    dcol1, dcol2 = st.columns([3, 1])
+    with dcol1:
+        dish_query = st.text_input("🔎 Search dishes", key="browse_dish_search",
+                                   placeholder="Dish, category or restaurant (typos are fine)")
+    with dcol2:
+        in_stock = st.checkbox("In stock only", key="browse_in_stock")
+    if dish_query.strip():
+        show_dish_search(user, dish_query, categories, price_range, in_stock)
+        return
 
-    restaurants = get_restaurants()
-    for _, row in restaurants.iterrows():
-        with st.expander(f"{row['name']} - {row['address']}"):
-            img_path = restaurant_images.get(row['name'])
-            if img_path and os.path.exists(img_path):
-                st.image(img_path, width=500)
-            else:
-                st.warning("Image not found for this restaurant.")
+    matches = filter_summaries(summaries, search, categories, price_range)
+    if not matches:
+        st.info("No restaurants match your filters.")
+        return
 
-            # Always fetch fresh menu to reflect admin changes
-            menu_df = get_menu_by_restaurant(row['restaurant_id'])
-            if menu_df.empty:
-                st.info("No menu available.")
+    selected = st.session_state.get('browse_rid')
+    for s in matches:
+        rid = s['restaurant_id']
+        rating = s['rating']
+        rating_label = f"⭐ {rating['average']:.1f} ({rating['count']})" if rating['count'] else "No ratings yet"
+        col1, col2, col3 = st.columns([1, 3, 1])
+        with col1:
+            thumb = images.restaurant_thumbnail(s['name'], 320, s['image'])
+            if thumb:
+                st.image(thumb, width=120)
+        with col2:
+            st.markdown(f"**{s['name']}** — {s['address']}")
+            price_label = f" | ₹{s['min_price']:.0f}–₹{s['max_price']:.0f}" if s['min_price'] is not None else ""
+            st.caption(f"{rating_label}{price_label} | {', '.join(s['categories']) or 'No menu yet'}")
+        with col3:
+            if rid == selected:
+                if st.button("Close", key=f"browse_close_{rid}"):
+                    st.session_state.pop('browse_rid', None)
+                    st.rerun()
+            elif st.button("View menu", key=f"browse_open_{rid}"):
+                st.session_state['browse_rid'] = rid
+                st.rerun()
+
+        if rid == selected:
+            with st.container(border=True):
+                show_restaurant_menu(user, s, categories, price_range)
+
+
+def show_dish_search(user, query, categories=(), price_range=None, in_stock=False):
+    """Dish results from the in-memory search index (search.py)."""
+    lo, hi = price_range if price_range is not None else (None, None)
+    try:
+        results = search_menu(query, min_price=lo, max_price=hi, in_stock=in_stock,
+                              categories=categories, limit=DISH_SEARCH_LIMIT)
+    except mysql.connector.Error as e:
+        st.error(f"Search is unavailable: {e}")
+        return
+    if not results:
+        st.info("No dishes match your search.")
+        return
+    for m in results:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.write(f"**{m['name']}** - ₹{m['price']:.2f} | {m['category']} | Stock: {m['stock']}")
+            st.caption(m['restaurant_name'])
+        with col2:
+            if m['stock'] > 0:
+                qty = st.number_input("Quantity", min_value=1, max_value=m['stock'], value=1,
+                                      step=1, key=f"search_qty_{m['menu_id']}")
+                if st.button("Add to Cart", key=f"search_add_{user['user_id']}_{m['menu_id']}"):
+                    add_to_cart(user['user_id'], m, qty)
             else:
-                for cat in menu_df['category'].unique():
-                    with st.expander(cat):
-                        cat_items = menu_df[menu_df['category'] == cat]
-                        for _, m in cat_items.iterrows():
-                            col1, col2 = st.columns([3, 1])
-                            with col1:
-                                st.write(f"**{m['name']}** - ₹{m['price']} | Stock: {m['stock']}")
-                            with col2:
-                                # If stock is zero, show disabled Out of Stock button and avoid invalid number_input
-                                try:
-                                    stock_val = int(m['stock'])
-                                except Exception:
-                                    stock_val = 0
-                                if stock_val > 0:
-                                    # Use a friendly label "Quantity" (not qty_1 etc)
-                                    qty = st.number_input(
-                                        "Quantity", min_value=1, max_value=stock_val, value=1,
-                                        step=1, key=f"qty_{m['menu_id']}_user"
-                                    )
-                                    # safer Add to Cart button (unique per user & item)
-                                    if st.button("Add to Cart", key=f"add_{user['user_id']}_{m['menu_id']}"):
-                                        add_to_cart(user['user_id'], m['menu_id'], qty)
-                                else:
-                                    st.button("Out of Stock", disabled=True, key=f"out_{m['menu_id']}")
-
-            reviews_df = get_reviews_by_restaurant(row['restaurant_id'])
-            if not reviews_df.empty:
-                st.markdown("**Reviews:**")
-                for _, rev in reviews_df.iterrows():
-                    # safe formatting of date if datetime type
-                    try:
-                        date_str = rev['review_date'].strftime('%Y-%m-%d')
-                    except Exception:
-                        date_str = str(rev['review_date'])
-                    st.write(f"⭐ {rev['rating']} — {rev['comment']}  (_by {rev['user_name']} on {date_str}_)")
+                st.button("Out of Stock", disabled=True, key=f"search_out_{m['menu_id']}")
+
+
+def show_restaurant_menu(user, summary, categories=(), price_range=None):
+    """Menu and reviews of one restaurant; only built for the opened one."""
+    rid = summary['restaurant_id']
+    thumb = images.restaurant_thumbnail(summary['name'], 500, summary['image'])
+    if thumb:
+        st.image(thumb, width=500)
+
+    menu_df = get_menu_by_restaurant(rid)
+    # Items without a category are listed under the summaries' label
+    menu_df = menu_df.assign(category=menu_df['category'].fillna('').replace('', catalog.UNCATEGORIZED))
+    if categories:
+        menu_df = menu_df[menu_df['category'].isin(categories)]
+    if price_range is not None:
+        menu_df = menu_df[menu_df['price'].astype(float).between(*price_range)]
+    if menu_df.empty:
+        st.info("No menu available.")
+    else:
+        for cat in menu_df['category'].unique():
+            with st.expander(cat):
+                cat_items = menu_df[menu_df['category'] == cat]
+                for _, m in cat_items.iterrows():
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        st.write(f"**{m['name']}** - ₹{m['price']} | Stock: {m['stock']}")
+                    with col2:
+                        # If stock is zero, show disabled Out of Stock button and avoid invalid number_input
+                        try:
+                            stock_val = int(m['stock'])
+                        except Exception:
+                            stock_val = 0
+                        if stock_val > 0:
+                            # Use a friendly label "Quantity" (not qty_1 etc)
+                            qty = st.number_input(
+                                "Quantity", min_value=1, max_value=stock_val, value=1,
+                                step=1, key=f"qty_{m['menu_id']}_user"
+                            )
+                            # safer Add to Cart button (unique per user & item)
+                            if st.button("Add to Cart", key=f"add_{user['user_id']}_{m['menu_id']}"):
+                                add_to_cart(user['user_id'], {**m, 'restaurant_name': summary['name']}, qty)
+                        else:
+                            st.button("Out of Stock", disabled=True, key=f"out_{m['menu_id']}")
+
+    # First page of reviews is cached; older ones on demand
+    limit_key = f"reviews_limit_{rid}"
+    limit = st.session_state.get(limit_key, REVIEW_PAGE_SIZE)
+    reviews_df = get_reviews_by_restaurant(rid, limit)
+    if not reviews_df.empty:
+        st.markdown("**Reviews:**")
+        for _, rev in reviews_df.iterrows():
+            # safe formatting of date if datetime type
+            try:
+                date_str = rev['review_date'].strftime('%Y-%m-%d')
+            except Exception:
+                date_str = str(rev['review_date'])
+            st.write(f"⭐ {rev['rating']} — {rev['comment']}  (_by {rev['user_name']} on {date_str}_)")
+        if len(reviews_df) < summary['rating']['count']:
+            if st.button("Load more reviews", key=f"more_reviews_{rid}"):
+                st.session_state[limit_key] = limit + REVIEW_PAGE_SIZE
+                st.rerun()
 
 # --------------------------
 # CART
@@ -669,39 +867,54 @@ def show_cart():
     st.header("🛒 Your Cart")
 
     cart_df = get_cart(user['user_id'])
+    sc = session_cart(user['user_id'])
+    if sc.conflict:
+        st.warning("Your cart was changed in another session; showing the merged cart.")
+        sc.conflict = False
     if cart_df.empty:
         st.info("Cart is empty.")
         return
 
-    # Build unique options: label -> cart_id
+    # Build unique options: label -> menu_id (one cart line per menu item)
     # Keep labels clean: no #[id], no (x3). We'll show quantities in the preview table below.
     options = {
-        f"{row.item_name} — {row.restaurant_name}": int(row.cart_id)
+        f"{row.item_name} — {row.restaurant_name}": int(row.menu_id)
         for _, row in cart_df.iterrows()
     }
     option_labels = list(options.keys())
 
-    # Selection by unique labels -> cart_ids
+    # Selection by unique labels -> menu_ids
     selected_labels = st.multiselect("Select items to order", option_labels, key="cart_select")
-    selected_cart_ids = [options[lbl] for lbl in selected_labels]
+    selected_menu_ids = [options[lbl] for lbl in selected_labels if lbl in options]
 
     # Filter dataframe to only selected rows
-    if selected_cart_ids:
-        selected_cart_df = cart_df[cart_df['cart_id'].isin(selected_cart_ids)].copy()
+    if selected_menu_ids:
+        selected_cart_df = cart_df[cart_df['menu_id'].isin(selected_menu_ids)].copy()
         st.subheader("Selected items")
         # Show quantities and totals in table; this avoids needing qty in the label.
         st.dataframe(selected_cart_df[['item_name','restaurant_name','category','quantity','price','total']])
-        subtotal = float(selected_cart_df['total'].sum())
+        subtotal = pricing.from_cents(pricing.subtotal_of(zip(selected_cart_df['price'], selected_cart_df['quantity'])))
     else:
         st.info("No items selected — pick items above to see a preview and total.")
         selected_cart_df = pd.DataFrame()
         subtotal = 0.0
 
-    # Remove buttons for each cart row (unique cart_id)
+    # Hold stock for the selected items while they sit in checkout
+    wanted = {int(r.menu_id): int(r.quantity) for r in selected_cart_df.itertuples()} if selected_menu_ids else {}
+    if st.session_state.get('held_items') != wanted:
+        try:
+            st.session_state['held_items'] = cart.hold_selection(user['user_id'], cart_df, selected_menu_ids)
+        except ServiceError as e:
+            st.error(f"❌ {e}")
+
+    # Remove buttons for each cart line, or all selected lines at once
+    if selected_menu_ids and st.button("Remove selected items", key="remove_selected"):
+        remove_cart_items(user['user_id'], selected_menu_ids)
+        st.rerun()
     for _, row in cart_df.iterrows():
-        if st.button(f"Remove {row['item_name']}", key=f"remove_{row['cart_id']}"):
-            remove_cart_item(row['cart_id'])
-            return  # Streamlit will rerun and reflect changes
+        if st.button(f"Remove {row['item_name']}", key=f"remove_{row['menu_id']}"):
+            remove_cart_items(user['user_id'], [row['menu_id']])
+            st.rerun()  # show the cart without the removed line
 
     # Payment and coupon input
     payment = st.selectbox("Payment Method",
@@ -710,57 +923,27 @@ def show_cart():
     coupon_code = st.text_input("Coupon (optional)", key="cart_coupon").strip()
     coupon_code = coupon_code if coupon_code else None
 
-    # Pricing rules
-    TAX_RATE = 0.05          # 5% tax
-    DELIVERY_FEE = 30.00     # flat delivery fee
-
-    # Helper: get coupon from DB
-    def lookup_coupon(code):
-        if not code:
-            return None
-        conn = get_connection()
-        cur = conn.cursor(dictionary=True)
-        try:
-            cur.execute("""
-                SELECT * FROM Coupons
-                WHERE code=%s AND active=TRUE AND (expiry_date IS NULL OR expiry_date >= CURDATE())
-                LIMIT 1
-            """, (code,))
-            return cur.fetchone()
-        except Exception:
-            return None
-        finally:
-            cur.close()
-            conn.close()
-
-    coupon = lookup_coupon(coupon_code)
-
-    # Compute discount (capped)
-    discount = 0.0
-    if coupon and subtotal > 0:
-        pct = float(coupon.get('discount_percent') or 0) / 100.0
-        max_disc = float(coupon.get('max_discount_amount') or 0.0)
-        discount = min(subtotal * pct, max_disc)
-
-    subtotal_after_coupon = max(subtotal - discount, 0.0)
-    tax_amount = subtotal_after_coupon * TAX_RATE
-    final_total = subtotal_after_coupon + tax_amount + (DELIVERY_FEE if subtotal > 0 else 0.0)
+    # Same pricing rules as checkout (discount capped, tax, delivery fee)
+    try:
+        price = coupons.quote(subtotal, coupon_code)
+    except mysql.connector.Error:
+        price = coupons.quote(subtotal, None)
 
     # Show breakdown
     st.markdown("---")
     st.markdown("### Price summary")
-    st.write(f"Subtotal: ₹{subtotal:.2f}")
-    st.write(f"Coupon discount: -₹{discount:.2f}  {'(' + coupon_code + ')' if coupon else ''}")
-    st.write(f"Subtotal after coupon: ₹{subtotal_after_coupon:.2f}")
-    st.write(f"Tax ({TAX_RATE*100:.0f}%): ₹{tax_amount:.2f}")
-    st.write(f"Delivery fee: ₹{(DELIVERY_FEE if subtotal > 0 else 0.0):.2f}")
-    st.markdown(f"**Final total: ₹{final_total:.2f}**")
+    st.write(f"Subtotal: ₹{price['subtotal']:.2f}")
+    st.write(f"Coupon discount: -₹{price['discount']:.2f}  {'(' + coupon_code + ')' if price['coupon'] else ''}")
+    st.write(f"Subtotal after coupon: ₹{price['subtotal_after_coupon']:.2f}")
+    st.write(f"Tax ({TAX_RATE*100:.0f}%): ₹{price['tax']:.2f}")
+    st.write(f"Delivery fee: ₹{price['delivery_fee']:.2f}")
+    st.markdown(f"**Final total: ₹{price['total']:.2f}**")
     st.markdown("---")
 
     # Place order (disabled if no selection)
-    place_btn = st.button("Place Selected Order", key="cart_order_btn", disabled=(len(selected_cart_ids) == 0))
+    place_btn = st.button("Place Selected Order", key="cart_order_btn", disabled=(len(selected_menu_ids) == 0))
     if place_btn:
-        place_selected_items(user['user_id'], selected_cart_ids, payment, coupon_code)
+        place_selected_items(user['user_id'], selected_menu_ids, payment, coupon_code)
 
 # --------------------------
 # ORDER HISTORY
@@ -769,9 +952,14 @@ def show_order_history():
     user = st.session_state['user']
     st.header("📦 Order History")
 
-    df = get_order_items(user['user_id'])
+    if st.button("🔄 Refresh", key="order_history_refresh"):
+        st.session_state.pop('order_history', None)
+        st.session_state.pop('archived_orders', None)
+    df = load_order_history(user['user_id'])
+    watch_order_feed()
     if df.empty:
-        st.info("No orders found.")
+        st.info("No recent orders found.")
+        show_archived_orders(user['user_id'])
         return
 
     grouped = df.groupby('order_id')
@@ -784,7 +972,9 @@ def show_order_history():
         if delivery_partner:
             st.write(f"🛵 **Delivery Partner:** {delivery_partner}")
 
-        st.dataframe(order_items[['item_name', 'restaurant_name', 'category', 'quantity', 'total']])
+        st.dataframe(order_items[['item_name', 'restaurant_name', 'category', 'quantity', 'price', 'total']])
+        st.write(f"Subtotal: ₹{float(order_items['subtotal_amount'].iloc[0]):.2f} | "
+                 f"Charged: ₹{float(order_items['total_amount'].iloc[0]):.2f}")
 
         # --- Review Section ---
         restaurants_in_order = order_items[['restaurant_name', 'restaurant_id']].drop_duplicates()
@@ -801,7 +991,7 @@ def show_order_history():
                 submit_review(user['user_id'], rest_options[selected_restaurant], rating, comment)
 
         # --- Action Buttons ---
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         with col1:
             if order_status not in ["Delivered", "Cancelled"] and st.button(
                 f"Mark Delivered #{order_id}", key=f"user_delivered_{order_id}"
@@ -814,14 +1004,35 @@ def show_order_history():
             ):
                 update_order_status(order_id, "Cancelled")
                 st.warning(f"⚠️ Order #{order_id} Cancelled!")
+        with col3:
+            if st.button(f"Reorder #{order_id}", key=f"user_reorder_{order_id}"):
+                reorder(user['user_id'], order_id)
+
+    show_archived_orders(user['user_id'])
+
+def show_archived_orders(user_id):
+    """Older finished orders moved out of the live tables by archive.py (read-only)."""
+    if not st.checkbox("Show older orders", key="order_history_archived"):
+        return
+    if 'archived_orders' not in st.session_state:
+        st.session_state['archived_orders'] = orders.get_archived_order_items(user_id)
+    archived = st.session_state['archived_orders']
+    if archived.empty:
+        st.info("No older orders.")
+        return
+    for order_id, order_items in archived.groupby('order_id', sort=False):
+        st.subheader(f"Order #{order_id} - Status: {order_items['status'].iloc[0]}")
+        st.caption(f"Placed {order_items['order_date'].iloc[0]}")
+        st.dataframe(order_items[['item_name', 'restaurant_name', 'category', 'quantity', 'price', 'total']])
+        st.write(f"Subtotal: ₹{float(order_items['subtotal_amount'].iloc[0]):.2f} | "
+                 f"Charged: ₹{float(order_items['total_amount'].iloc[0]):.2f}")
 
 # --------------------------
 # MAIN
 # --------------------------
 def main():
     # Banner displayed on all pages
-    banner_path = r"C:\Users\Dr Bharathi\Desktop\FOOD ORDERING SYSTEM\images\banner.jpg"
-    show_banner(banner_path)
+    show_banner()
 
     st.sidebar.title("🍽️ Food Ordering System")
 
@@ -838,17 +1049,26 @@ def main():
     # Normal user navigation (logout as sidebar button)
     if 'user' in st.session_state and st.session_state['user']:
         if st.sidebar.button("Logout", key="user_logout"):
+            flush_cart()
             st.session_state.clear()
             rerun_app()
             return
 
         menu = st.sidebar.radio("Navigate", ["Browse Restaurants", "Cart", "Orders"], key="main_menu")
+        # Pending cart changes are written when the user switches pages
+        if st.session_state.get('last_page') != menu:
+            st.session_state['last_page'] = menu
+            flush_cart()
+        sync_cart()
         if menu == "Browse Restaurants":
-            show_restaurants_dropdown_menu()
+            with querystats.page_render("Browse"):
+                show_restaurants_dropdown_menu()
         elif menu == "Cart":
-            show_cart()
+            with querystats.page_render("Cart"):
+                show_cart()
         elif menu == "Orders":
-            show_order_history()
+            with querystats.page_render("Orders"):
+                show_order_history()
         return
 
     # Fallback
@@ -0,0 +1,146 @@
+"""
+Archival of completed orders (migration 007).
+
+Delivered and Cancelled orders older than ARCHIVE_AFTER_DAYS are moved
+with their items, payments and status history from the live tables to the
+*_Archive tables, BATCH_SIZE orders per transaction: copy with INSERT ...
+SELECT, then delete from the live tables.  Each batch locks only the
+orders it moves (FOR UPDATE SKIP LOCKED), so checkout and status changes
+never wait behind the job, and the job can be stopped and rerun at any
+time.
+
+The deletes run with @archiving_orders set, so the Order_Items delete
+triggers skip their per-row work: finished orders give no stock back, the
+subtotal belongs to an order about to be deleted, and the sales rollups
+keep their figures, so the Analytics tab is unaffected.  The job also drops
+the orders' Order_Restaurant_Lines rows (migration 006), which only live
+orders need.  Order history and the admin
+Orders tab read the live tables unless asked to include archived orders.
+
+Run it from cron, e.g. nightly:
+
+    python archive.py                         # FOOD_ARCHIVE_AFTER_DAYS (default 180)
+    python archive.py --older-than 90 --batch-size 200 --dry-run
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from db import _env_int, get_connection
+
+ARCHIVE_AFTER_DAYS = _env_int("FOOD_ARCHIVE_AFTER_DAYS", 180)
+BATCH_SIZE = _env_int("FOOD_ARCHIVE_BATCH_SIZE", 500)
+PAUSE = 0.05  # seconds between batches, to leave the server some air
+FINISHED_STATUSES = ('Delivered', 'Cancelled')
+
+# (live table, archive table), children before Orders for the deletes
+TABLES = (
+    ("Order_Status_History", "Order_Status_History_Archive"),
+    ("Payments", "Payments_Archive"),
+    ("Order_Items", "Order_Items_Archive"),
+    ("Orders", "Orders_Archive"),
+)
+
+BATCH_SQL = """
+    SELECT order_id FROM Orders
+    WHERE status IN (%s, %s) AND order_date < %s
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+COUNT_SQL = "SELECT COUNT(*) FROM Orders WHERE status IN (%s, %s) AND order_date < %s"
+
+
+def cutoff_for(days):
+    return datetime.now() - timedelta(days=int(days))
+
+
+def _in_clause(ids):
+    return ",".join(["%s"] * len(ids))
+
+
+def pending(days=ARCHIVE_AFTER_DAYS):
+    """Number of orders the next run would archive."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(COUNT_SQL, FINISHED_STATUSES + (cutoff_for(days),))
+            return int(cursor.fetchone()[0])
+        finally:
+            cursor.close()
+
+
+def archive_batch(cutoff, batch_size=BATCH_SIZE):
+    """
+    Move one batch of finished orders placed before `cutoff`, in one
+    transaction.  Returns {table: rows moved} ({} when nothing is left).
+    """
+    moved = {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            cursor.execute(BATCH_SQL, FINISHED_STATUSES + (cutoff, int(batch_size)))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                conn.rollback()
+                return moved
+            where = f"WHERE order_id IN ({_in_clause(ids)})"
+            for live, archived in reversed(TABLES):
+                cursor.execute(f"INSERT INTO {archived} SELECT * FROM {live} {where}", ids)
+                moved[live] = cursor.rowcount
+            cursor.execute("SET @archiving_orders = 1")
+            try:
+                for live, _ in TABLES:
+                    cursor.execute(f"DELETE FROM {live} {where}", ids)
+                cursor.execute(f"DELETE FROM Order_Restaurant_Lines {where}", ids)
+            finally:
+                # The connection goes back to the pool: never leave the triggers off
+                cursor.execute("SET @archiving_orders = NULL")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    return moved
+
+
+def archive(days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE, max_batches=None, pause=PAUSE):
+    """
+    Archive finished orders older than `days` in batches until none are
+    left (or `max_batches` ran).  Returns {table: rows moved}.
+    """
+    cutoff = cutoff_for(days)
+    totals = {live: 0 for live, _ in TABLES}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        for table, rows in moved.items():
+            totals[table] += rows
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old finished orders to the archive tables.")
+    parser.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_DAYS, metavar="DAYS")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="only count the orders to archive")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        print(f"{pending(args.older_than)} orders older than {args.older_than} days would be archived")
+        return 0
+    for table, rows in archive(args.older_than, args.batch_size, args.max_batches).items():
+        print(f"{table:<22} {rows} rows archived")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
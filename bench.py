@@ -0,0 +1,390 @@
+"""
+Benchmark the ordering data layer headless (no Streamlit).
+
+Seeds a database with a synthetic dataset built on the schema from
+database.sql + migrations, then measures the hot paths used by the app
+through the same service calls its pages make:
+
+    login_user            accounts.login_user()
+    get_cart              cart.get_cart() (cached per user, like the page)
+    add_to_cart           cart.add_to_cart()
+    place_selected_items  add one line to the cart, then orders.place_order()
+    get_order_items       orders.get_order_items() for one user
+
+Each operation runs single-threaded and then with --workers concurrent
+threads.  Results (throughput, p50/p95/p99/max latency, errors) are
+printed as JSON and can be compared with a previous run:
+
+    FOOD_DB_NAME=FoodOrdering_bench python bench.py --reset --users 2000 --orders 20000
+    python bench.py --output before.json
+    python bench.py --baseline before.json --threshold 0.2     # exit 1 on regressions
+
+--reset drops and rebuilds the configured database (the schema statements
+of database.sql, then migrate.py) before seeding; it refuses to touch the default FoodOrdering
+database unless --force is given.  Without --reset, synthetic rows are only
+added when the database holds no bench users yet.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+import accounts
+import cart
+from db import DB_CONFIG, get_connection, pool_stats
+import migrate
+import orders
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.sql")
+BENCH_PASSWORD = "bench"
+BENCH_EMAIL = "bench-{}@example.com"
+CATEGORIES = ("Starters", "Mains", "Desserts", "Beverages", "Sides", "Combos")
+STATUSES = ('Pending', 'Confirmed', 'Out for Delivery', 'Delivered', 'Cancelled')
+STATUS_WEIGHTS = (2, 2, 1, 80, 15)
+CHUNK = 1000
+# --reset runs only the schema statements of database.sql, not its sample
+# data and demo queries / CALLs
+SCHEMA_KEYWORDS = ("CREATE", "DROP", "ALTER", "USE")
+
+
+# --------------------------
+# DATASET
+# --------------------------
+def schema_statements(script):
+    """The DDL statements of `script` (tables, functions, procedures, triggers)."""
+    return [stmt for stmt in migrate.split_statements(script)
+            if stmt.split(None, 1)[0].upper() in SCHEMA_KEYWORDS]
+
+
+def reset_schema(force=False):
+    """Drop and rebuild the configured database from database.sql's schema + migrations."""
+    name = DB_CONFIG['database']
+    if name == "FoodOrdering" and not force:
+        raise SystemExit("Refusing to reset FoodOrdering; set FOOD_DB_NAME to a scratch database or pass --force.")
+    with open(SCHEMA_FILE, encoding="utf-8") as f:
+        script = f.read().replace("FoodOrdering", name)
+    # The database may not exist yet, so this runs outside the pool
+    config = {k: v for k, v in DB_CONFIG.items() if k != 'database'}
+    conn = mysql.connector.connect(**config)
+    try:
+        cursor = conn.cursor()
+        for stmt in schema_statements(script):
+            cursor.execute(stmt)
+            if cursor.with_rows:
+                cursor.fetchall()
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    migrate.migrate(verbose=False)
+
+
+def _insert_many(cursor, sql, rows):
+    for i in range(0, len(rows), CHUNK):
+        cursor.executemany(sql, rows[i:i + CHUNK])
+
+
+def _ids(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def seed(users, restaurants, items_per_restaurant, orders, reviews, partners, seed_value=42):
+    """Add a synthetic dataset; returns a summary of what exists afterwards."""
+    rng = random.Random(seed_value)
+    password = accounts.hash_password(BENCH_PASSWORD)
+    now = datetime.now()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM Users WHERE email LIKE 'bench-%%'")
+        if cursor.fetchone()[0]:
+            cursor.close()
+            return dataset_summary()
+
+        _insert_many(cursor, "INSERT INTO Users (name, email, phone, address, password) VALUES (%s,%s,%s,%s,%s)",
+                     [(f"Bench User {i}", BENCH_EMAIL.format(i), f"9{i:09d}", f"{i} Bench Street", password)
+                      for i in range(users)])
+        _insert_many(cursor, "INSERT INTO Restaurants (name, address, phone) VALUES (%s,%s,%s)",
+                     [(f"Bench Kitchen {i}", f"{i} Market Road", f"8{i:09d}") for i in range(restaurants)])
+        _insert_many(cursor, "INSERT INTO Delivery_Partners (name, phone) VALUES (%s,%s)",
+                     [(f"Bench Rider {i}", f"7{i:09d}") for i in range(partners)])
+        user_ids = _ids(cursor, "SELECT user_id FROM Users WHERE email LIKE 'bench-%%'")
+        restaurant_ids = _ids(cursor, "SELECT restaurant_id FROM Restaurants WHERE name LIKE 'Bench Kitchen %%'")
+        partner_ids = _ids(cursor, "SELECT delivery_partner_id FROM Delivery_Partners WHERE name LIKE 'Bench Rider %%'")
+
+        _insert_many(cursor, "INSERT INTO Menu (restaurant_id, name, price, category, stock) VALUES (%s,%s,%s,%s,%s)",
+                     [(rid, f"Dish {rid}-{j}", round(rng.uniform(40, 600), 2), rng.choice(CATEGORIES), 10 ** 6)
+                      for rid in restaurant_ids for j in range(items_per_restaurant)])
+        placeholders = ",".join(["%s"] * len(restaurant_ids))
+        cursor.execute(f"SELECT menu_id, restaurant_id, price FROM Menu WHERE restaurant_id IN ({placeholders})",
+                       restaurant_ids)
+        menu = {}
+        for menu_id, rid, price in cursor.fetchall():
+            menu.setdefault(rid, []).append((menu_id, price))
+        conn.commit()
+
+        # Orders (and their items) are written in chunks; item triggers keep
+        # the subtotals, payments are added for completed orders.
+        for start in range(0, orders, CHUNK):
+            batch = []
+            for _ in range(min(CHUNK, orders - start)):
+                rid = rng.choice(restaurant_ids)
+                lines = rng.sample(menu[rid], k=min(len(menu[rid]), rng.randint(1, 4)))
+                lines = [(menu_id, price, rng.randint(1, 3)) for menu_id, price in lines]
+                subtotal = sum(float(price) * qty for _, price, qty in lines)
+                batch.append((rng.choice(user_ids), now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+                              round(subtotal * 1.05 + 30, 2), rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+                              rng.choice(partner_ids), lines))
+            cursor.executemany(
+                "INSERT INTO Orders (user_id, order_date, total_amount, status, delivery_partner_id) "
+                "VALUES (%s,%s,%s,%s,%s)",
+                [b[:5] for b in batch]
+            )
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            first_id = cursor.fetchone()[0]
+            order_ids = _ids(cursor, "SELECT order_id FROM Orders WHERE order_id >= %s ORDER BY order_id LIMIT %s",
+                             (first_id, len(batch)))
+            _insert_many(cursor, "INSERT INTO Order_Items (order_id, menu_id, quantity, unit_price) VALUES (%s,%s,%s,%s)",
+                         [(oid, menu_id, qty, price)
+                          for oid, b in zip(order_ids, batch) for menu_id, price, qty in b[5]])
+            _insert_many(cursor, "INSERT INTO Payments (order_id, amount, method, status) VALUES (%s,%s,%s,%s)",
+                         [(oid, b[2], rng.choice(("UPI", "Card", "Cash")), 'Completed')
+                          for oid, b in zip(order_ids, batch) if b[3] != 'Cancelled'])
+            conn.commit()
+
+        _insert_many(cursor, "INSERT INTO Reviews (user_id, restaurant_id, rating, comment, review_date) "
+                             "VALUES (%s,%s,%s,%s,%s)",
+                     [(rng.choice(user_ids), rng.choice(restaurant_ids), rng.randint(1, 5), "Synthetic review",
+                       now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))) for _ in range(reviews)])
+        conn.commit()
+        cursor.close()
+    return dataset_summary()
+
+
+def dataset_summary():
+    tables = ("Users", "Restaurants", "Menu", "Orders", "Order_Items", "Reviews", "Delivery_Partners")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        summary = {}
+        for table in tables:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            summary[table] = cursor.fetchone()[0]
+        cursor.close()
+    return summary
+
+
+def bench_fixture():
+    """User ids/emails and in-stock menu ids of the synthetic dataset."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, email FROM Users WHERE email LIKE 'bench-%%' ORDER BY user_id")
+        users = cursor.fetchall()
+        cursor.execute("""
+            SELECT m.menu_id FROM Menu m JOIN Restaurants r ON m.restaurant_id = r.restaurant_id
+            WHERE r.name LIKE 'Bench Kitchen %%' AND m.stock > 1000
+        """)
+        menu_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    if not users or not menu_ids:
+        raise SystemExit("No bench dataset found; run with --reset (or seed a scratch database first).")
+    return users, menu_ids
+
+
+# --------------------------
+# OPERATIONS (the service calls behind each page)
+# --------------------------
+def op_login_user(ctx, rng):
+    _, email = rng.choice(ctx['users'])
+    if accounts.login_user(email, BENCH_PASSWORD) is None:
+        raise RuntimeError("login failed")
+
+
+def op_get_cart(ctx, rng):
+    user_id, _ = rng.choice(ctx['users'])
+    cart.get_cart(user_id)
+
+
+def op_add_to_cart(ctx, rng):
+    user_id, _ = rng.choice(ctx['users'])
+    cart.add_to_cart(user_id, rng.choice(ctx['menu_ids']), 1)
+
+
+def op_place_selected_items(ctx, rng):
+    user_id, _ = rng.choice(ctx['users'])
+    cart_id = cart.add_to_cart(user_id, rng.choice(ctx['menu_ids']), rng.randint(1, 3))
+    orders.place_order(user_id, [cart_id], "UPI")
+
+
+def op_get_order_items(ctx, rng):
+    user_id, _ = rng.choice(ctx['users'])
+    orders.get_order_items(user_id)
+
+
+OPERATIONS = {
+    "login_user": op_login_user,
+    "get_cart": op_get_cart,
+    "add_to_cart": op_add_to_cart,
+    "place_selected_items": op_place_selected_items,
+    "get_order_items": op_get_order_items,
+}
+
+
+# --------------------------
+# RUNNER
+# --------------------------
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    lat = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000, 3)
+    return {
+        "ops": len(lat),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ops_s": round(len(lat) / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": ms(percentile(lat, 50)),
+        "p95_ms": ms(percentile(lat, 95)),
+        "p99_ms": ms(percentile(lat, 99)),
+        "max_ms": ms(lat[-1] if lat else None),
+    }
+
+
+def run_operation(fn, ctx, workers, iterations, seed_value=0):
+    """Run `iterations` calls per worker on `workers` threads; returns a summary."""
+    latencies, errors, lock = [], {}, threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed_value * 1000 + n)
+        local, local_errors = [], {}
+        for _ in range(iterations):
+            started = time.perf_counter()
+            try:
+                fn(ctx, rng)
+            except Exception as e:  # keep measuring; report what failed
+                name = type(e).__name__
+                local_errors[name] = local_errors.get(name, 0) + 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            for k, v in local_errors.items():
+                errors[k] = errors.get(k, 0) + v
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def run(operations, workers, iterations, warmup):
+    users, menu_ids = bench_fixture()
+    ctx = {"users": users, "menu_ids": menu_ids}
+    results = {}
+    for name in operations:
+        fn = OPERATIONS[name]
+        run_operation(fn, ctx, 1, warmup, seed_value=99)
+        results[name] = {
+            "single": run_operation(fn, ctx, 1, iterations, seed_value=1),
+            "concurrent": run_operation(fn, ctx, workers, iterations, seed_value=2),
+        }
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Regressions where p95 grew or throughput fell by more than `threshold`."""
+    regressions = []
+    for op, modes in results.items():
+        for mode, cur in modes.items():
+            old = baseline.get("results", {}).get(op, {}).get(mode)
+            if not old:
+                continue
+            if old.get("p95_ms") and cur.get("p95_ms") and cur["p95_ms"] > old["p95_ms"] * (1 + threshold):
+                regressions.append(f"{op}/{mode}: p95 {old['p95_ms']}ms -> {cur['p95_ms']}ms")
+            if (old.get("throughput_ops_s") and cur.get("throughput_ops_s")
+                    and cur["throughput_ops_s"] < old["throughput_ops_s"] * (1 - threshold)):
+                regressions.append(f"{op}/{mode}: throughput {old['throughput_ops_s']} -> {cur['throughput_ops_s']} ops/s")
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ordering data layer.")
+    parser.add_argument("--reset", action="store_true", help="rebuild the configured database before seeding")
+    parser.add_argument("--force", action="store_true", help="allow --reset on the FoodOrdering database")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--restaurants", type=int, default=50)
+    parser.add_argument("--items", type=int, default=40, help="menu items per restaurant")
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--reviews", type=int, default=5000)
+    parser.add_argument("--partners", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=200, help="calls per worker and mode")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="comma-separated operations to run")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression (default 20%%)")
+    args = parser.parse_args(argv)
+
+    operations = [op.strip() for op in args.ops.split(",") if op.strip()]
+    unknown = [op for op in operations if op not in OPERATIONS]
+    if unknown:
+        parser.error(f"unknown operation(s): {', '.join(unknown)}")
+
+    if args.reset:
+        reset_schema(args.force)
+    dataset = seed(args.users, args.restaurants, args.items, args.orders, args.reviews, args.partners)
+
+    results = run(operations, args.workers, args.iterations, args.warmup)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "database": DB_CONFIG['database'],
+            "workers": args.workers,
+            "iterations": args.iterations,
+            "dataset": dataset,
+            "pool": pool_stats(),
+        },
+        "results": results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report["regressions"] = regressions
+        status = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2, default=str)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
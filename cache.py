@@ -0,0 +1,127 @@
+"""
+Process-wide, entity-keyed cache for catalog data.
+
+Entries are addressed by (namespace, key), e.g. ("menu", restaurant_id) or
+("cart", user_id).  Every entry carries its own TTL and the cache holds at
+most `max_entries` values, evicting the least recently used one first.
+
+Invalidation is targeted: invalidate("menu", 3) drops only restaurant 3's
+menu.  Dropping a whole namespace bumps that namespace's version instead of
+walking the cache, so older entries simply stop matching and age out
+through LRU eviction.
+
+Like the connection pool, the cache lives in an imported module so it
+survives Streamlit reruns and is shared by every session in the process.
+Other processes keep their own copy; TTLs bound how stale those can get.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Default TTLs (seconds) per namespace
+DEFAULT_TTLS = {
+    "restaurants": 300,
+    "menu": 60,
+    "menu_summary": 60,
+    "reviews": 120,
+    "ratings": 120,
+    "partners": 600,
+    "cart": 30,
+    "coupons": 60,
+    "analytics": 60,
+    "images": 3600,
+}
+DEFAULT_TTL = 60
+MAX_ENTRIES = 5000
+
+_MISSING = object()
+
+
+class EntityCache:
+    """Thread-safe LRU cache with per-key TTLs and namespace versions."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttls=None, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()     # (namespace, key) -> (version, expires_at, value)
+        self._versions = {}            # namespace -> int
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _ttl(self, namespace, ttl):
+        if ttl is not None:
+            return ttl
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def get(self, namespace, key, default=None):
+        """Return a live cached value or `default`."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get((namespace, key))
+            if item is not None:
+                version, expires_at, value = item
+                if version == self._versions.get(namespace, 0) and expires_at > now:
+                    self._data.move_to_end((namespace, key))
+                    self.hits += 1
+                    return value
+                del self._data[(namespace, key)]
+            self.misses += 1
+        return default
+
+    def set(self, namespace, key, value, ttl=None):
+        """Store `value` under (namespace, key) for `ttl` seconds."""
+        expires_at = time.monotonic() + self._ttl(namespace, ttl)
+        with self._lock:
+            version = self._versions.get(namespace, 0)
+            self._data[(namespace, key)] = (version, expires_at, value)
+            self._data.move_to_end((namespace, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        """Return the cached value, calling `loader()` and caching it on a miss."""
+        value = self.get(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def get_many(self, namespace, keys):
+        """Return {key: value} for the keys that are cached and live."""
+        found = {}
+        for key in keys:
+            value = self.get(namespace, key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def invalidate(self, namespace, key=_MISSING):
+        """Drop one entry, or the whole namespace when no key is given."""
+        with self._lock:
+            if key is _MISSING:
+                self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            else:
+                self._data.pop((namespace, key), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Process-wide instance used by the data helpers
+cache = EntityCache()
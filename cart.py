@@ -0,0 +1,380 @@
+"""
+Shopping cart: one row per (user, menu item) in Cart.
+
+Reads are cached per user in the entity cache ("cart" namespace) and every
+write drops that user's entry.  Batch writes (add_many, set_quantities,
+remove_many, reorder) change any number of lines with one statement each
+on one connection, instead of a connection and commit per item.
+
+SessionCart is the Streamlit page's copy of a user's cart: loaded once,
+changed in memory, and written back by flush() in one transaction of
+coalesced changes (write-behind).  Changes are sent as deltas, so two
+sessions of the same user merge instead of overwriting each other; when
+the cart read back after a flush differs from the local one, `conflict` is
+set and the merged server state is adopted.  Checkout holds (stock.hold) for the items
+selected in the cart are managed here too, so the page only passes the
+selection.
+"""
+import time
+
+import mysql.connector
+import pandas as pd
+
+from cache import cache
+from catalog import invalidate_menu
+from db import get_connection
+from errors import ER_NO_REFERENCED_ROW, NotFoundError, ValidationError
+import stock
+
+CART_SQL = """
+    SELECT c.cart_id, m.menu_id, m.restaurant_id, m.name AS item_name, m.category, m.price,
+           c.quantity, (m.price * c.quantity) AS total, r.name AS restaurant_name
+    FROM Cart c
+    JOIN Menu m ON c.menu_id = m.menu_id
+    JOIN Restaurants r ON m.restaurant_id = r.restaurant_id
+    WHERE c.user_id=%s
+"""
+# Cart has UNIQUE KEY (user_id, menu_id); LAST_INSERT_ID(cart_id) makes
+# lastrowid the line's id when an existing line is incremented as well.
+ADD_SQL = """
+    INSERT INTO Cart (user_id, menu_id, quantity)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE cart_id = LAST_INSERT_ID(cart_id),
+                            quantity = quantity + VALUES(quantity)
+"""
+# A past order's items (still on the menu and in stock) added to the cart,
+# merged per menu item, in one INSERT ... SELECT.
+REORDER_SQL = """
+    INSERT INTO Cart (user_id, menu_id, quantity)
+    SELECT src.user_id, src.menu_id, src.quantity
+    FROM (
+        SELECT o.user_id, oi.menu_id, SUM(oi.quantity) AS quantity
+        FROM Orders o
+        JOIN Order_Items oi ON oi.order_id = o.order_id
+        JOIN Menu m ON m.menu_id = oi.menu_id
+        WHERE o.order_id = %s AND o.user_id = %s AND m.stock > 0
+        GROUP BY o.user_id, oi.menu_id
+    ) AS src
+    ON DUPLICATE KEY UPDATE quantity = Cart.quantity + src.quantity
+"""
+MAX_BATCH_ITEMS = 500
+
+
+def invalidate(user_id):
+    cache.invalidate("cart", int(user_id))
+
+
+def get_cart(user_id):
+    """Cart lines of a user with item, price and restaurant details."""
+    def load():
+        with get_connection() as conn:
+            return pd.read_sql(CART_SQL, conn, params=(int(user_id),))
+    return cache.get_or_load("cart", int(user_id), load)
+
+
+def add_to_cart(user_id, menu_id, quantity):
+    """
+    Add `quantity` of an item (increments an existing line).  Returns the
+    cart_id of the line.  Raises ValidationError for a non-positive
+    quantity and NotFoundError when the item no longer exists.
+    """
+    quantity = int(quantity)
+    if quantity <= 0:
+        raise ValidationError("Quantity must be at least 1.")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(ADD_SQL, (user_id, menu_id, quantity))
+            cart_id = cursor.lastrowid
+            conn.commit()
+        except mysql.connector.IntegrityError as e:
+            if e.errno == ER_NO_REFERENCED_ROW:
+                raise NotFoundError("This item is no longer available.") from e
+            raise
+        finally:
+            cursor.close()
+    invalidate(user_id)
+    return cart_id
+
+
+def remove_cart_item(user_id, cart_id):
+    """Delete one of the user's cart lines; returns False when it was already gone."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM Cart WHERE cart_id=%s AND user_id=%s", (cart_id, user_id))
+        removed = cursor.rowcount > 0
+        conn.commit()
+        cursor.close()
+    invalidate(user_id)
+    return removed
+
+
+def normalize_items(items, allow_zero=False):
+    """
+    {menu_id: quantity} from a dict or (menu_id, quantity) pairs; repeated
+    menu ids are summed.  Raises ValidationError for non-numeric values,
+    quantities below 1 (below 0 with `allow_zero`) or too many items.
+    """
+    pairs = items.items() if isinstance(items, dict) else items
+    merged = {}
+    try:
+        for menu_id, quantity in pairs:
+            menu_id, quantity = int(menu_id), int(quantity)
+            if quantity < (0 if allow_zero else 1):
+                raise ValidationError("Quantity must be at least 1." if not allow_zero
+                                      else "Quantity cannot be negative.")
+            merged[menu_id] = merged.get(menu_id, 0) + quantity
+    except (TypeError, ValueError) as e:
+        raise ValidationError("Items must be (menu_id, quantity) pairs of integers.") from e
+    if len(merged) > MAX_BATCH_ITEMS:
+        raise ValidationError(f"At most {MAX_BATCH_ITEMS} items can be changed at once.")
+    return merged
+
+
+def upsert_sql(user_id, items, replace=False):
+    """
+    One multi-row INSERT ... ON DUPLICATE KEY UPDATE for {menu_id: quantity}:
+    quantities are added to existing lines, or overwrite them with `replace`.
+    Returns (sql, params).
+    """
+    update = "VALUES(quantity)" if replace else "quantity + VALUES(quantity)"
+    sql = ("INSERT INTO Cart (user_id, menu_id, quantity) VALUES "
+           + ",".join(["(%s,%s,%s)"] * len(items))
+           + f" ON DUPLICATE KEY UPDATE quantity = {update}")
+    params = [v for menu_id, quantity in items.items() for v in (user_id, menu_id, quantity)]
+    return sql, params
+
+
+def _batch_write(user_id, statements):
+    """Run (sql, params) statements in one transaction; returns total rowcount."""
+    affected = 0
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            for sql, params in statements:
+                cursor.execute(sql, params)
+                affected += cursor.rowcount
+            conn.commit()
+        except mysql.connector.IntegrityError as e:
+            conn.rollback()
+            if e.errno == ER_NO_REFERENCED_ROW:
+                raise NotFoundError("One or more items are no longer available.") from e
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    invalidate(user_id)
+    return affected
+
+
+def add_many(user_id, items):
+    """
+    Add several items at once (dict or (menu_id, quantity) pairs), each
+    incrementing an existing line.  Nothing is added when any item is
+    invalid or gone (ValidationError / NotFoundError).
+    """
+    items = normalize_items(items)
+    if items:
+        _batch_write(user_id, [upsert_sql(user_id, items)])
+
+
+def set_quantities(user_id, items):
+    """
+    Set the quantity of several items; 0 removes the line.  Items not yet in
+    the cart are added.  One transaction.
+    """
+    items = normalize_items(items, allow_zero=True)
+    keep = {menu_id: q for menu_id, q in items.items() if q > 0}
+    drop = [menu_id for menu_id, q in items.items() if q == 0]
+    statements = []
+    if keep:
+        statements.append(upsert_sql(user_id, keep, replace=True))
+    if drop:
+        statements.append((
+            f"DELETE FROM Cart WHERE user_id=%s AND menu_id IN ({','.join(['%s'] * len(drop))})",
+            [user_id] + drop,
+        ))
+    if statements:
+        _batch_write(user_id, statements)
+
+
+def remove_many(user_id, cart_ids):
+    """Delete several of the user's cart lines; returns how many were removed."""
+    cart_ids = [int(c) for c in cart_ids]
+    if not cart_ids:
+        return 0
+    return _batch_write(user_id, [(
+        f"DELETE FROM Cart WHERE user_id=%s AND cart_id IN ({','.join(['%s'] * len(cart_ids))})",
+        [user_id] + cart_ids,
+    )])
+
+
+def reorder(user_id, order_id):
+    """
+    Put every item of one of the user's past orders back in the cart (added
+    to existing lines).  Items that are out of stock are skipped.  Raises
+    NotFoundError when the order is not the user's or nothing is available.
+    """
+    if not _batch_write(user_id, [(REORDER_SQL, (int(order_id), int(user_id)))]):
+        raise NotFoundError("None of this order's items are available.")
+
+
+def hold_selection(user_id, cart_df, menu_ids):
+    """
+    Hold stock for the selected cart lines (by menu_id) and release holds
+    on the rest.  Returns the {menu_id: quantity} now held.  Raises
+    stock.OutOfStockError when an item is short; holds are left unchanged
+    in that case.
+    """
+    selected = cart_df[cart_df['menu_id'].isin(menu_ids)]
+    wanted = {int(r.menu_id): int(r.quantity) for r in selected.itertuples()}
+    changed = stock.hold(user_id, wanted)
+    for rid in cart_df[cart_df['menu_id'].isin(changed)]['restaurant_id'].unique():
+        invalidate_menu(rid, stock_only=True)
+    return wanted
+
+
+def sync_sql(user_id, changes):
+    """
+    Statements applying {menu_id: (quantity, delta)} from a session cart:
+    lines with a positive target get the delta added (or are inserted with
+    the target when another session removed them), zero targets are
+    deleted.  Returns [(sql, params)].
+    """
+    keep = [(m, q, d) for m, (q, d) in changes.items() if q > 0]
+    drop = [m for m, (q, _) in changes.items() if q <= 0]
+    statements = []
+    if keep:
+        cases = " ".join(["WHEN %s THEN %s"] * len(keep))
+        statements.append((
+            "INSERT INTO Cart (user_id, menu_id, quantity) VALUES "
+            + ",".join(["(%s,%s,%s)"] * len(keep))
+            + f" ON DUPLICATE KEY UPDATE quantity = GREATEST(quantity + CASE menu_id {cases} ELSE 0 END, 1)",
+            [v for m, q, _ in keep for v in (user_id, m, q)] + [v for m, _, d in keep for v in (m, d)],
+        ))
+    if drop:
+        statements.append((
+            f"DELETE FROM Cart WHERE user_id=%s AND menu_id IN ({','.join(['%s'] * len(drop))})",
+            [user_id] + drop,
+        ))
+    return statements
+
+
+class SessionCart:
+    """
+    In-memory cart of one user for one Streamlit session (write-behind).
+
+    lines:   {menu_id: quantity} as the user sees it
+    base:    {menu_id: quantity} as last read from the Cart table
+    details: {menu_id: row} item, price and restaurant columns for display
+    """
+
+    FLUSH_INTERVAL = 5.0      # seconds a change may wait before flush_due()
+    RELOAD_INTERVAL = 60.0    # re-read the table after this long (other sessions)
+    COLUMNS = ['cart_id', 'menu_id', 'restaurant_id', 'item_name', 'category', 'price',
+               'quantity', 'total', 'restaurant_name']
+
+    def __init__(self, user_id):
+        self.user_id = int(user_id)
+        self.lines = {}
+        self.base = {}
+        self.details = {}
+        self.conflict = False
+        self.dirty_since = None
+        self.loaded_at = 0.0
+        self.reload()
+
+    # -- reads -----------------------------------------------------------
+    def reload(self):
+        """Replace local state with the Cart table (unflushed changes are lost)."""
+        df = get_cart(self.user_id)
+        self.details = {int(r['menu_id']): r for r in df[self.COLUMNS].to_dict('records')}
+        self.base = {m: int(r['quantity']) for m, r in self.details.items()}
+        self.lines = dict(self.base)
+        self.dirty_since = None
+        self.loaded_at = time.monotonic()
+
+    @property
+    def dirty(self):
+        return self.dirty_since is not None
+
+    def frame(self):
+        """Cart lines as a DataFrame with get_cart()'s columns (cart_id is
+        None for lines not flushed yet)."""
+        if any(m not in self.details for m in self.lines):
+            self.flush(force=True)
+        rows = []
+        for menu_id, quantity in self.lines.items():
+            row = dict(self.details[menu_id])
+            if menu_id not in self.base:
+                row['cart_id'] = None
+            row['quantity'] = quantity
+            row['total'] = float(row['price']) * quantity
+            rows.append(row)
+        return pd.DataFrame(rows, columns=self.COLUMNS)
+
+    # -- local changes -----------------------------------------------------
+    def _changed(self):
+        if self.dirty_since is None:
+            self.dirty_since = time.monotonic()
+
+    def add(self, menu_id, quantity, item=None):
+        """Add `quantity` of an item; `item` supplies its display columns."""
+        menu_id, quantity = int(menu_id), int(quantity)
+        if quantity <= 0:
+            raise ValidationError("Quantity must be at least 1.")
+        if item is not None:
+            self.details.setdefault(menu_id, {**item, 'menu_id': menu_id, 'cart_id': None})
+        self.lines[menu_id] = self.lines.get(menu_id, 0) + quantity
+        self._changed()
+
+    def set_quantity(self, menu_id, quantity):
+        menu_id, quantity = int(menu_id), int(quantity)
+        if quantity < 0:
+            raise ValidationError("Quantity cannot be negative.")
+        if quantity == 0:
+            self.lines.pop(menu_id, None)
+        else:
+            self.lines[menu_id] = quantity
+        self._changed()
+
+    def remove(self, menu_ids):
+        for menu_id in menu_ids:
+            self.lines.pop(int(menu_id), None)
+        self._changed()
+
+    # -- sync ------------------------------------------------------------
+    def pending(self):
+        """{menu_id: (quantity, delta)} of lines that differ from the table."""
+        changes = {}
+        for menu_id in set(self.lines) | set(self.base):
+            target = self.lines.get(menu_id, 0)
+            delta = target - self.base.get(menu_id, 0)
+            if delta:
+                changes[menu_id] = (target, delta)
+        return changes
+
+    def flush_due(self):
+        now = time.monotonic()
+        return ((self.dirty and now - self.dirty_since >= self.FLUSH_INTERVAL)
+                or now - self.loaded_at >= self.RELOAD_INTERVAL)
+
+    def flush(self, force=False):
+        """
+        Write pending changes in one transaction and read the cart back.
+        Without `force` nothing happens unless flush_due().  Raises
+        NotFoundError (nothing written, local changes kept) when an item
+        was deleted from the menu.  Returns True when anything was written.
+        """
+        if not force and not self.flush_due():
+            return False
+        changes = self.pending()
+        if changes:
+            _batch_write(self.user_id, sync_sql(self.user_id, changes))
+        expected = dict(self.lines)
+        self.reload()
+        self.conflict = self.lines != expected
+        return bool(changes)
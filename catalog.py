@@ -0,0 +1,374 @@
+"""
+Catalog data: restaurants, menus, reviews and delivery partners.
+
+Reads go through the process-wide entity cache (cache.py) so browsing
+sessions are served from memory; write paths invalidate only the entries
+they touch (e.g. one restaurant's menu).
+
+The browse page used to issue 1 + 2N queries (restaurants, then menu and
+reviews per restaurant).  load_catalog() serves what it can from the cache
+and fetches everything else in a constant number of batched queries, so
+the page cost no longer grows with the number of restaurants.
+
+Ratings come from Restaurant_Rating_Stats (kept up to date by triggers on
+Reviews) and only the newest REVIEW_PAGE_SIZE reviews per restaurant are
+loaded up front; older ones are fetched on demand ("load more").
+
+Admin writes (add/delete restaurants and menu items) live here as well
+and invalidate what they touch.
+
+The browse page lists restaurant summaries only (load_summaries(): one
+grouped query over Menu for categories and price ranges) and filters them
+in memory; a restaurant's full menu is loaded when it is opened.  Dish
+search is served by the inverted index in search.py, which the
+invalidation helpers below keep current.
+"""
+import mysql.connector
+import pandas as pd
+
+from cache import cache
+from db import get_connection
+from errors import ER_ROW_IS_REFERENCED, ConflictError, NotFoundError, ValidationError
+from search import UNCATEGORIZED, menu_index
+
+REVIEW_PAGE_SIZE = 5
+
+MENU_SUMMARY_SQL = """
+    SELECT restaurant_id, category, COUNT(*) AS items,
+           MIN(price) AS min_price, MAX(price) AS max_price
+    FROM Menu
+    GROUP BY restaurant_id, category
+"""
+MENU_SQL = "SELECT * FROM Menu WHERE restaurant_id IN ({}) ORDER BY restaurant_id, menu_id"
+# Newest REVIEW_PAGE_SIZE reviews of each restaurant; the LATERAL subquery
+# reads them straight off idx_reviews_restaurant_date per restaurant.
+REVIEWS_SQL = """
+    SELECT rs.restaurant_id, x.review_id, x.user_name, x.rating, x.comment, x.review_date
+    FROM Restaurants rs
+    JOIN LATERAL (
+        SELECT r.review_id, u.name AS user_name, r.rating, r.comment, r.review_date
+        FROM Reviews r
+        JOIN Users u ON r.user_id = u.user_id
+        WHERE r.restaurant_id = rs.restaurant_id
+        ORDER BY r.review_date DESC, r.review_id DESC
+        LIMIT %d
+    ) x ON TRUE
+    WHERE rs.restaurant_id IN ({})
+    ORDER BY rs.restaurant_id, x.review_date DESC, x.review_id DESC
+""" % REVIEW_PAGE_SIZE
+
+
+def _in_clause(ids):
+    return ",".join(["%s"] * len(ids))
+
+
+# --------------------------
+# CACHED READS
+# --------------------------
+def get_restaurants():
+    def load():
+        with get_connection() as conn:
+            return pd.read_sql("SELECT * FROM Restaurants ORDER BY restaurant_id", conn)
+    return cache.get_or_load("restaurants", "all", load)
+
+
+def get_menu_by_restaurant(restaurant_id):
+    restaurant_id = int(restaurant_id)
+    return _load_grouped("menu", MENU_SQL, [restaurant_id])[restaurant_id]
+
+
+def get_reviews_by_restaurant(restaurant_id, limit=REVIEW_PAGE_SIZE):
+    """Newest `limit` reviews of a restaurant (the first page is cached)."""
+    restaurant_id = int(restaurant_id)
+    if limit <= REVIEW_PAGE_SIZE:
+        return _load_grouped("reviews", REVIEWS_SQL, [restaurant_id])[restaurant_id].head(limit)
+    with get_connection() as conn:
+        return pd.read_sql("""
+            SELECT r.review_id, u.name AS user_name, r.rating, r.comment, r.review_date
+            FROM Reviews r
+            JOIN Users u ON r.user_id = u.user_id
+            WHERE r.restaurant_id = %s
+            ORDER BY r.review_date DESC, r.review_id DESC
+            LIMIT %s
+        """, conn, params=(restaurant_id, int(limit)))
+
+
+def get_rating_stats():
+    """
+    {restaurant_id: {"count", "average", "histogram" (list of counts for
+    1..5 stars)}} from the maintained aggregate table; one small query.
+    """
+    def load():
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT restaurant_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5
+                FROM Restaurant_Rating_Stats
+            """)
+            rows = cursor.fetchall()
+            cursor.close()
+        stats = {}
+        for row in rows:
+            count = int(row['review_count'])
+            stats[int(row['restaurant_id'])] = {
+                "count": count,
+                "average": (float(row['rating_sum']) / count) if count else 0.0,
+                "histogram": [int(row[f'stars_{i}']) for i in range(1, 6)],
+            }
+        return stats
+    return cache.get_or_load("ratings", "all", load)
+
+
+def get_menu_summary():
+    """
+    {restaurant_id: {category: {"items", "min_price", "max_price"}}} for
+    every restaurant with a menu; one grouped query, cached.  Stock is not
+    part of it, so checkouts do not invalidate it.
+    """
+    def load():
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(MENU_SUMMARY_SQL)
+            rows = cursor.fetchall()
+            cursor.close()
+        summary = {}
+        for row in rows:
+            # NULL and '' categories are listed (and merged) as UNCATEGORIZED
+            categories = summary.setdefault(int(row['restaurant_id']), {})
+            key = row['category'] or UNCATEGORIZED
+            entry = categories.setdefault(key, {"items": 0, "min_price": float('inf'), "max_price": float('-inf')})
+            entry["items"] += int(row['items'])
+            entry["min_price"] = min(entry["min_price"], float(row['min_price']))
+            entry["max_price"] = max(entry["max_price"], float(row['max_price']))
+        return summary
+    return cache.get_or_load("menu_summary", "all", load)
+
+
+def get_delivery_partners():
+    """All delivery partners as a list of dicts (delivery_partner_id, name)."""
+    def load():
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT delivery_partner_id, name FROM Delivery_Partners ORDER BY name")
+            partners = cursor.fetchall()
+            cursor.close()
+        return partners
+    return cache.get_or_load("partners", "all", load)
+
+
+def _load_grouped(namespace, sql, restaurant_ids):
+    """
+    Return {restaurant_id: DataFrame} for `namespace` ("menu"/"reviews"),
+    fetching every cache miss with a single IN (...) query.
+    """
+    found = cache.get_many(namespace, restaurant_ids)
+    missing = [rid for rid in restaurant_ids if rid not in found]
+    if not missing:
+        return found
+
+    with get_connection() as conn:
+        df = pd.read_sql(sql.format(_in_clause(missing)), conn, params=tuple(missing))
+
+    groups = {int(k): g for k, g in df.groupby('restaurant_id', sort=False)}
+    empty = df.iloc[0:0]
+    for rid in missing:
+        frame = groups.get(rid, empty)
+        if namespace == "reviews":
+            frame = frame.drop(columns=['restaurant_id'])
+        frame = frame.reset_index(drop=True)
+        cache.set(namespace, rid, frame)
+        found[rid] = frame
+    return found
+
+
+def load_catalog():
+    """
+    Load all restaurants with their menus and reviews.  Cached entries are
+    reused; misses are fetched with at most three queries in total.
+
+    Returns an ordered dict: restaurant_id -> {
+        "restaurant": dict of the Restaurants row,
+        "menu": DataFrame of Menu rows ordered by menu_id,
+        "rating": {"count", "average", "histogram"},
+        "reviews": newest REVIEW_PAGE_SIZE reviews (review_id, user_name,
+                   rating, comment, review_date),
+    }
+    """
+    restaurants = get_restaurants()
+    if restaurants.empty:
+        return {}
+
+    ids = [int(i) for i in restaurants['restaurant_id']]
+    menus = _load_grouped("menu", MENU_SQL, ids)
+    reviews = _load_grouped("reviews", REVIEWS_SQL, ids)
+    ratings = get_rating_stats()
+    no_rating = {"count": 0, "average": 0.0, "histogram": [0] * 5}
+
+    catalog = {}
+    for row in restaurants.to_dict('records'):
+        rid = int(row['restaurant_id'])
+        catalog[rid] = {
+            "restaurant": row,
+            "menu": menus[rid],
+            "rating": ratings.get(rid, no_rating),
+            "reviews": reviews[rid],
+        }
+    return catalog
+
+
+def load_summaries():
+    """
+    Restaurant summaries for the browse list, without menus or reviews.
+
+    Returns a list of dicts (restaurant order): restaurant_id, name,
+    address, image (or None), rating ({"count", "average", "histogram"}),
+    categories ({category: {"items", "min_price", "max_price"}}),
+    min_price / max_price (None without a menu).
+    """
+    restaurants = get_restaurants()
+    ratings = get_rating_stats()
+    menu_summary = get_menu_summary()
+    no_rating = {"count": 0, "average": 0.0, "histogram": [0] * 5}
+
+    summaries = []
+    for row in restaurants.to_dict('records'):
+        rid = int(row['restaurant_id'])
+        categories = menu_summary.get(rid, {})
+        summaries.append({
+            "restaurant_id": rid,
+            "name": row['name'],
+            "address": row.get('address'),
+            "image": row.get('image'),
+            "rating": ratings.get(rid, no_rating),
+            "categories": categories,
+            "min_price": min((c['min_price'] for c in categories.values()), default=None),
+            "max_price": max((c['max_price'] for c in categories.values()), default=None),
+        })
+    return summaries
+
+
+def filter_summaries(summaries, text="", categories=(), price_range=None):
+    """
+    Restaurants whose name (or a category) contains `text`, serving any of
+    `categories`, with at least one item priced within `price_range`
+    (min, max) in those categories.  Pure in-memory filtering.
+    """
+    text = (text or "").strip().lower()
+    wanted = set(categories or ())
+    matches = []
+    for s in summaries:
+        cats = s['categories']
+        if wanted:
+            cats = {c: v for c, v in cats.items() if c in wanted}
+            if not cats:
+                continue
+        if text and text not in s['name'].lower() and not any(text in c.lower() for c in cats):
+            continue
+        if price_range is not None:
+            lo, hi = price_range
+            if not any(v['min_price'] <= hi and v['max_price'] >= lo for v in cats.values()):
+                continue
+        matches.append(s)
+    return matches
+
+
+# --------------------------
+# ADMIN WRITES
+# --------------------------
+def _write(statements, conflict_message="This change conflicts with existing data."):
+    """
+    Run [(sql, params)] in one transaction and return the last rowcount.
+    Foreign key violations become ConflictError(conflict_message).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for sql, params in statements:
+                cursor.execute(sql, params)
+            rowcount = cursor.rowcount
+            conn.commit()
+        except mysql.connector.IntegrityError as e:
+            if e.errno == ER_ROW_IS_REFERENCED:
+                raise ConflictError(conflict_message) from e
+            raise
+        finally:
+            cursor.close()
+    return rowcount
+
+
+def add_restaurant(name, address):
+    if not name:
+        raise ValidationError("Restaurant name is required.")
+    _write([("INSERT INTO Restaurants (name, address) VALUES (%s,%s)", (name, address))])
+    invalidate_restaurant()
+
+
+def delete_restaurant(restaurant_id):
+    """Delete a restaurant and its menu; ConflictError when orders or reviews reference them."""
+    restaurant_id = int(restaurant_id)
+    deleted = _write(
+        [("DELETE FROM Menu WHERE restaurant_id=%s", (restaurant_id,)),
+         ("DELETE FROM Restaurants WHERE restaurant_id=%s", (restaurant_id,))],
+        "This restaurant has orders or reviews and cannot be deleted.",
+    )
+    invalidate_restaurant(restaurant_id)
+    if not deleted:
+        raise NotFoundError("Restaurant not found.")
+
+
+def _check_item(price, stock):
+    if price is not None and float(price) < 0:
+        raise ValidationError("Price cannot be negative.")
+    if stock is not None and int(stock) < 0:
+        raise ValidationError("Stock cannot be negative.")
+
+
+def add_menu_item(restaurant_id, name, category, price, stock):
+    if not name:
+        raise ValidationError("Item name is required.")
+    _check_item(price, stock)
+    _write([("INSERT INTO Menu (restaurant_id, name, category, price, stock) VALUES (%s,%s,%s,%s,%s)",
+             (int(restaurant_id), name, category, price, stock))])
+    invalidate_menu(restaurant_id)
+
+
+def update_menu_item(restaurant_id, menu_id, price, stock):
+    _check_item(price, stock)
+    _write([("UPDATE Menu SET price=%s, stock=%s WHERE menu_id=%s", (price, stock, int(menu_id)))])
+    invalidate_menu(restaurant_id)
+
+
+def delete_menu_item(restaurant_id, menu_id):
+    """ConflictError when the item appears in orders, carts or checkout holds."""
+    deleted = _write([("DELETE FROM Menu WHERE menu_id=%s", (int(menu_id),))],
+                     "This item appears in orders or carts and cannot be deleted.")
+    invalidate_menu(restaurant_id)
+    if not deleted:
+        raise NotFoundError("Menu item not found.")
+
+
+# --------------------------
+# INVALIDATION
+# --------------------------
+def invalidate_restaurant(restaurant_id=None):
+    """After restaurant add/delete: drop the list (and that restaurant's data)."""
+    cache.invalidate("restaurants")
+    cache.invalidate("ratings", "all")
+    cache.invalidate("menu_summary", "all")
+    if restaurant_id is not None:
+        cache.invalidate("menu", int(restaurant_id))
+        cache.invalidate("reviews", int(restaurant_id))
+        menu_index.mark_dirty(restaurant_id)
+
+
+def invalidate_menu(restaurant_id, stock_only=False):
+    """After menu edits; `stock_only` when just stock levels changed (orders)."""
+    cache.invalidate("menu", int(restaurant_id))
+    if not stock_only:
+        cache.invalidate("menu_summary", "all")
+    menu_index.mark_dirty(restaurant_id, stock_only)
+
+
+def invalidate_reviews(restaurant_id):
+    cache.invalidate("reviews", int(restaurant_id))
+    cache.invalidate("ratings", "all")
@@ -0,0 +1,64 @@
+"""
+Coupons and the checkout price preview.
+
+Active coupons are a small table, so they are kept in memory: the entity
+cache holds every active coupon and reloads them when the "coupons" TTL
+expires, so typing in the coupon box costs no database round trip.
+Expiry dates are still checked on every lookup.  Checkout re-reads the
+coupon inside its transaction, so a coupon disabled within the TTL can show
+in the preview but is never charged.
+"""
+from datetime import date
+
+import pricing
+from cache import cache
+from db import get_connection
+
+ACTIVE_COUPONS_SQL = """
+    SELECT code, discount_percent, max_discount_amount, expiry_date
+    FROM Coupons
+    WHERE active=TRUE AND (expiry_date IS NULL OR expiry_date >= CURDATE())
+"""
+
+
+def _load_active():
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(ACTIVE_COUPONS_SQL)
+        rows = cursor.fetchall()
+        cursor.close()
+    return {row['code']: row for row in rows}
+
+
+def active_coupons():
+    """{code: coupon row} of active, unexpired coupons (cached)."""
+    today = date.today()
+    coupons = cache.get_or_load("coupons", "active", _load_active)
+    return {code: row for code, row in coupons.items()
+            if row['expiry_date'] is None or row['expiry_date'] >= today}
+
+
+def invalidate():
+    cache.invalidate("coupons")
+
+
+def lookup_coupon(code):
+    """The active, unexpired coupon row (dict) for `code`, or None."""
+    if not code:
+        return None
+    return active_coupons().get(code)
+
+
+def quote(subtotal, coupon_code=None):
+    """
+    Price breakdown for a cart subtotal with the same rules as checkout.
+    Returns a dict of Decimals: subtotal, discount, subtotal_after_coupon,
+    tax, delivery_fee, total, plus coupon (row or None).
+    """
+    coupon = lookup_coupon(coupon_code)
+    return {**pricing.price(subtotal, coupon), "coupon": coupon}
+
+
+def quote_many(lines, key="cart", coupon_column="coupon_code"):
+    """pricing.price_batch() of many carts against the active coupons."""
+    return pricing.price_batch(lines, active_coupons(), key=key, coupon_column=coupon_column)
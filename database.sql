@@ -506,8 +506,6 @@ DELETE FROM Cart WHERE user_id=1 AND menu_id=2;
  
 
 
-DELIMITER $$
-
 ALTER TABLE Payments
 ADD COLUMN coupon_code VARCHAR(50) NULL;
 
@@ -0,0 +1,307 @@
+"""
+Database access layer for the Food Ordering System.
+
+All MySQL access goes through one process-wide connection pool.  Streamlit
+re-executes app.py on every rerun, but imported modules stay loaded, so the
+pool (and its open connections) is shared by every session in the process.
+
+Usage:
+
+    from db import get_connection
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("...")
+        conn.commit()
+
+The connection is returned to the pool when the block exits.  It is
+wrapped by querystats.InstrumentedConnection, which records the latency
+and row count of every statement and the time spent waiting for the pool.  Anything left
+uncommitted is rolled back on the way back in, so a pooled connection never
+carries a stale transaction/read snapshot into the next checkout.
+
+Settings are read from the environment (defaults match the original
+hard-coded credentials):
+
+    FOOD_DB_HOST, FOOD_DB_PORT, FOOD_DB_USER, FOOD_DB_PASSWORD, FOOD_DB_NAME
+    FOOD_DB_POOL_SIZE       connections kept open when idle      (default 5)
+    FOOD_DB_MAX_OVERFLOW    extra connections allowed under load (default 10)
+    FOOD_DB_POOL_TIMEOUT    seconds to wait for a free connection (default 10)
+    FOOD_DB_POOL_RECYCLE    close connections older than this    (default 1800)
+    FOOD_DB_PING_INTERVAL   ping on checkout if idle longer than (default 5)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+
+import querystats
+
+
+# --------------------------
+# CONFIGURATION
+# --------------------------
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+DB_CONFIG = {
+    "host": os.environ.get("FOOD_DB_HOST", "localhost"),
+    "port": _env_int("FOOD_DB_PORT", 3306),
+    "user": os.environ.get("FOOD_DB_USER", "root"),
+    "password": os.environ.get("FOOD_DB_PASSWORD", "Sirishreyu@2431"),
+    "database": os.environ.get("FOOD_DB_NAME", "FoodOrdering"),
+}
+
+POOL_CONFIG = {
+    "pool_size": _env_int("FOOD_DB_POOL_SIZE", 5),
+    "max_overflow": _env_int("FOOD_DB_MAX_OVERFLOW", 10),
+    "timeout": _env_float("FOOD_DB_POOL_TIMEOUT", 10.0),
+    "recycle": _env_float("FOOD_DB_POOL_RECYCLE", 1800.0),
+    "ping_interval": _env_float("FOOD_DB_PING_INTERVAL", 5.0),
+}
+
+
+class PoolTimeoutError(mysql_errors.PoolError):
+    """Raised when no connection becomes free within the pool timeout."""
+
+
+# --------------------------
+# CONNECTION POOL
+# --------------------------
+class _PooledConnection:
+    """Book-keeping for one physical connection owned by the pool."""
+
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    Thread-safe MySQL connection pool.
+
+    Up to `pool_size` connections are kept open while idle; under load up to
+    `max_overflow` more are opened and closed again once returned.  When all
+    `pool_size + max_overflow` connections are checked out, callers wait up
+    to `timeout` seconds before PoolTimeoutError is raised.
+
+    On checkout a connection is recycled (closed and reopened) once it is
+    older than `recycle` seconds, and pinged when it has been idle longer
+    than `ping_interval` seconds, so connections dropped by the server
+    (wait_timeout, restarts) are replaced transparently.
+    """
+
+    def __init__(self, db_config, pool_size=5, max_overflow=10, timeout=10.0,
+                 recycle=1800.0, ping_interval=5.0, connect=None):
+        self.db_config = dict(db_config)
+        self.pool_size = max(int(pool_size), 1)
+        self.max_overflow = max(int(max_overflow), 0)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self._connect = connect or mysql.connector.connect
+
+        self._cond = threading.Condition()
+        self._idle = []            # LIFO stack of _PooledConnection
+        self._in_use = {}          # id(conn) -> _PooledConnection
+        self._opening = 0          # connections being opened right now
+
+        # gauges / counters
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    # -- internals -------------------------------------------------------
+    def _total(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _open(self):
+        conn = self._connect(**self.db_config)
+        self._opened += 1
+        return _PooledConnection(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, entry, now):
+        if self.recycle and now - entry.created_at > self.recycle:
+            self._recycled += 1
+            return False
+        if now - entry.last_used > self.ping_interval:
+            try:
+                entry.conn.ping(reconnect=False)
+            except Exception:
+                self._ping_failures += 1
+                return False
+        return True
+
+    # -- public API ------------------------------------------------------
+    def checkout(self):
+        """Borrow a connection, waiting up to `timeout` seconds for one."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._in_use[id(entry.conn)] = entry
+                    break
+                if self._total() < self.pool_size + self.max_overflow:
+                    entry = None
+                    self._opening += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        msg=f"No database connection available within {self.timeout:.1f}s "
+                            f"({len(self._in_use)} in use)"
+                    )
+                self._cond.wait(remaining)
+
+        # Network work (ping / connect) happens outside the lock; the slot
+        # stays reserved in _in_use / _opening meanwhile.
+        if entry is not None and not self._is_healthy(entry, time.monotonic()):
+            self._close_quietly(entry.conn)
+            with self._cond:
+                del self._in_use[id(entry.conn)]
+                self._opening += 1
+            entry = None
+        if entry is None:
+            try:
+                entry = self._open()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    if entry is not None:
+                        self._in_use[id(entry.conn)] = entry
+                    self._cond.notify()
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return entry.conn
+
+    def checkin(self, conn, discard=False):
+        """Return a borrowed connection; `discard=True` closes it instead."""
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            self._close_quietly(conn)
+            return
+
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or len(self._idle) >= self.pool_size:
+                keep = False
+            else:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                keep = True
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(conn)
+
+    def dispose(self):
+        """Close every idle connection (in-use ones close on checkin)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._close_quietly(entry.conn)
+
+    def stats(self):
+        """Snapshot of pool gauges and counters."""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "opened": self._opened,
+                "recycled": self._recycled,
+                "ping_failures": self._ping_failures,
+                "checkouts": checkouts,
+                "checkout_timeouts": self._timeouts,
+                "checkout_wait_avg_ms": (self._wait_total / checkouts * 1000.0) if checkouts else 0.0,
+                "checkout_wait_max_ms": self._wait_max * 1000.0,
+            }
+
+
+# --------------------------
+# PROCESS-WIDE POOL
+# --------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+                querystats.start_dumper()
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection for the duration of a `with` block."""
+    pool = get_pool()
+    started = time.perf_counter()
+    conn = pool.checkout()
+    querystats.stats.record_acquire(time.perf_counter() - started)
+    instrumented = querystats.InstrumentedConnection(conn)
+    discard = False
+    try:
+        yield instrumented
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            discard = True
+        raise
+    finally:
+        instrumented.finish()
+        pool.checkin(conn, discard=discard)
+
+
+def pool_stats():
+    """Gauges of the process-wide pool (see ConnectionPool.stats)."""
+    return get_pool().stats()
@@ -0,0 +1,115 @@
+"""
+Delivery-partner dispatcher.
+
+Keeps an in-memory index of delivery partners and how many active orders
+(Pending / Confirmed / Out for Delivery) each one has, and hands new orders
+to the least-loaded partner.  Assignment is O(log n) via a min-heap keyed on
+(active orders, partner id); updates push a fresh heap entry and older
+entries for the same partner are skipped when popped (lazy deletion).
+
+The index is loaded with one grouped query on first use and reloaded every
+REFRESH_INTERVAL seconds, which also picks up partners added elsewhere and
+corrects drift caused by other processes assigning orders.
+"""
+import heapq
+import threading
+import time
+
+from db import get_connection
+
+ACTIVE_STATUSES = ('Pending', 'Confirmed', 'Out for Delivery')
+REFRESH_INTERVAL = 300
+
+
+class Dispatcher:
+    """Least-loaded delivery partner assignment."""
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._load = {}        # partner_id -> active order count
+        self._version = {}     # partner_id -> version of its live heap entry
+        self._heap = []        # (active orders, partner_id, version)
+        self._loaded_at = None
+
+    # -- index maintenance -----------------------------------------------
+    def _push(self, partner_id):
+        version = self._version.get(partner_id, 0) + 1
+        self._version[partner_id] = version
+        heapq.heappush(self._heap, (self._load[partner_id], partner_id, version))
+        # drop stale entries once they dominate the heap
+        if len(self._heap) > 2 * len(self._load) + 64:
+            self._heap = [(self._load[p], p, self._version[p]) for p in self._load]
+            heapq.heapify(self._heap)
+
+    def reset(self, loads):
+        """Replace the index with {partner_id: active order count}."""
+        with self._lock:
+            self._load = {int(p): int(n) for p, n in loads.items()}
+            self._version = {p: 1 for p in self._load}
+            self._heap = [(n, p, 1) for p, n in self._load.items()]
+            heapq.heapify(self._heap)
+            self._loaded_at = time.monotonic()
+
+    def refresh(self):
+        """Reload partners and their active order counts (one query)."""
+        placeholders = ",".join(["%s"] * len(ACTIVE_STATUSES))
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT d.delivery_partner_id, COUNT(o.order_id)
+                FROM Delivery_Partners d
+                LEFT JOIN Orders o
+                       ON o.delivery_partner_id = d.delivery_partner_id
+                      AND o.status IN ({placeholders})
+                GROUP BY d.delivery_partner_id
+            """, ACTIVE_STATUSES)
+            loads = dict(cursor.fetchall())
+            cursor.close()
+        self.reset(loads)
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.refresh()
+
+    # -- public API --------------------------------------------------------
+    def assign(self):
+        """Pick the least-loaded partner and count the new order against it."""
+        self._ensure_fresh()
+        with self._lock:
+            while self._heap:
+                load, partner_id, version = heapq.heappop(self._heap)
+                if self._version.get(partner_id) != version:
+                    continue
+                self._load[partner_id] = load + 1
+                self._push(partner_id)
+                return partner_id
+        return None
+
+    def release(self, partner_id):
+        """An order of `partner_id` was delivered, cancelled or never placed."""
+        if partner_id is None:
+            return
+        with self._lock:
+            if partner_id in self._load and self._load[partner_id] > 0:
+                self._load[partner_id] -= 1
+                self._push(partner_id)
+
+    def add_partner(self, partner_id, active_orders=0):
+        with self._lock:
+            self._load[int(partner_id)] = active_orders
+            self._push(int(partner_id))
+
+    def remove_partner(self, partner_id):
+        with self._lock:
+            self._load.pop(int(partner_id), None)
+            self._version.pop(int(partner_id), None)
+
+    def loads(self):
+        """Snapshot {partner_id: active order count}."""
+        with self._lock:
+            return dict(self._load)
+
+
+# Process-wide dispatcher
+dispatcher = Dispatcher()
@@ -0,0 +1,31 @@
+"""
+Error types raised by the service modules (accounts, catalog, cart,
+coupons, orders, reviews, stock).
+
+Services never talk to Streamlit: they return plain values and raise a
+ServiceError subclass when a request cannot be carried out, with a message
+that is safe to show to the user.  Unexpected database failures still
+surface as mysql.connector.Error.
+"""
+
+
+class ServiceError(Exception):
+    """A request was rejected; nothing was written."""
+
+
+class ValidationError(ServiceError):
+    """The input is invalid (e.g. a rating outside 1..5, a zero quantity)."""
+
+
+class NotFoundError(ServiceError):
+    """The referenced row does not exist (any more)."""
+
+
+class ConflictError(ServiceError):
+    """The change conflicts with existing data (duplicate, still referenced)."""
+
+
+# MySQL error numbers the services translate
+ER_DUP_ENTRY = 1062
+ER_ROW_IS_REFERENCED = 1451      # delete/update blocked by a foreign key
+ER_NO_REFERENCED_ROW = 1452      # insert/update references a missing row
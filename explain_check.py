@@ -0,0 +1,231 @@
+"""
+Run EXPLAIN on every query the application issues and fail on full scans.
+
+Each entry in QUERIES mirrors a statement from the service modules
+(accounts, cart, catalog, coupons, orders, reviews, stock, dispatcher,
+feed, export, analytics, menu_import, archive, api, search) with
+representative parameters.  A plan row fails the check when it reads more
+than --max-rows rows with a full table scan (type ALL), a full index scan (type index) or a filesort,
+unless the query is marked as an intentional scan (e.g. loading the whole
+restaurant list for the catalog).
+
+    python explain_check.py                # default threshold 1000 rows
+    python explain_check.py --max-rows 50 --verbose
+
+Entries use the modules' SQL constants where they exist, so the check
+follows the real queries; keep the remaining inline copies in sync when
+changing those queries.
+"""
+import argparse
+import sys
+from datetime import date
+
+import analytics
+import api
+import archive
+import cart
+import catalog
+import coupons
+from db import get_connection
+import export
+import feed
+import menu_import
+import orders
+import search
+
+ACTIVE = ('Pending', 'Confirmed', 'Out for Delivery')
+
+# (name, sql, params, intentional_full_scan)
+QUERIES = [
+    ("login_user",
+     "SELECT * FROM Users WHERE email=%s AND password=%s",
+     ("alice@example.com", "x"), False),
+    ("catalog.get_restaurants",
+     "SELECT * FROM Restaurants ORDER BY restaurant_id",
+     (), True),
+    ("catalog.menu",
+     catalog.MENU_SQL.format("%s,%s"),
+     (1, 2), False),
+    ("catalog.reviews",
+     catalog.REVIEWS_SQL.format("%s,%s"),
+     (1, 2), False),
+    ("catalog.get_reviews_by_restaurant.more",
+     """SELECT r.review_id, u.name AS user_name, r.rating, r.comment, r.review_date
+        FROM Reviews r JOIN Users u ON r.user_id = u.user_id
+        WHERE r.restaurant_id = %s
+        ORDER BY r.review_date DESC, r.review_id DESC
+        LIMIT %s""",
+     (1, 10), False),
+    ("catalog.get_rating_stats",
+     """SELECT restaurant_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5
+        FROM Restaurant_Rating_Stats""",
+     (), True),
+    ("catalog.get_menu_summary",
+     catalog.MENU_SUMMARY_SQL,
+     (), True),
+    ("catalog.get_delivery_partners",
+     "SELECT delivery_partner_id, name FROM Delivery_Partners ORDER BY name",
+     (), True),
+    ("get_cart",
+     cart.CART_SQL,
+     (1,), False),
+    ("add_to_cart",
+     cart.ADD_SQL,
+     (1, 1, 1), False),
+    ("cart.reorder",
+     cart.REORDER_SQL,
+     (1, 1), False),
+    ("remove_cart_item",
+     "DELETE FROM Cart WHERE cart_id=%s AND user_id=%s",
+     (1, 1), False),
+    ("coupons.active_coupons",
+     coupons.ACTIVE_COUPONS_SQL,
+     (), True),
+    ("place_order.coupon",
+     """SELECT discount_percent, max_discount_amount FROM Coupons
+        WHERE code=%s AND active=TRUE AND (expiry_date IS NULL OR expiry_date >= CURDATE())
+        LIMIT 1""",
+     ("WELCOME10",), False),
+    ("place_order.cart_lines",
+     """SELECT c.menu_id, c.quantity, m.price, m.restaurant_id
+        FROM Cart c JOIN Menu m ON c.menu_id = m.menu_id
+        WHERE c.cart_id IN (%s,%s) AND c.user_id = %s
+        ORDER BY c.menu_id""",
+     (1, 2, 1), False),
+    ("stock.adjust",
+     """UPDATE Menu SET stock = stock - CASE menu_id WHEN %s THEN %s WHEN %s THEN %s END
+        WHERE menu_id IN (%s,%s) AND stock >= CASE menu_id WHEN %s THEN %s WHEN %s THEN %s END""",
+     (1, 1, 2, 1, 1, 2, 1, 1, 2, 1), False),
+    ("stock.consume.holds",
+     "SELECT menu_id, quantity FROM Stock_Reservations WHERE user_id = %s AND menu_id IN (%s,%s) ORDER BY menu_id",
+     (1, 1, 2), False),
+    ("stock.release_expired",
+     """SELECT reservation_id, menu_id, quantity FROM Stock_Reservations
+        WHERE expires_at < NOW() ORDER BY menu_id LIMIT 500""",
+     (), False),
+    ("stock.release_order",
+     """SELECT oi.menu_id, SUM(oi.quantity) AS quantity, m.restaurant_id
+        FROM Order_Items oi JOIN Menu m ON oi.menu_id = m.menu_id
+        WHERE oi.order_id = %s GROUP BY oi.menu_id, m.restaurant_id""",
+     (1,), False),
+    ("set_order_status.lock",
+     "SELECT status, delivery_partner_id FROM Orders WHERE order_id=%s",
+     (1,), False),
+    ("dispatcher.refresh",
+     """SELECT d.delivery_partner_id, COUNT(o.order_id)
+        FROM Delivery_Partners d
+        LEFT JOIN Orders o ON o.delivery_partner_id = d.delivery_partner_id AND o.status IN (%s,%s,%s)
+        GROUP BY d.delivery_partner_id""",
+     ACTIVE, True),
+    ("get_order_items.user",
+     orders.union_parts(orders.ORDER_ROWS_SQL + " WHERE o.user_id=%s")[0] + " ORDER BY order_id DESC",
+     (1,), False),
+    ("orders.get_orders_page",
+     """SELECT o.order_id, oi.quantity, m.name, r.name, u.name, d.name
+        FROM (SELECT o.order_id FROM Orders o
+              WHERE o.status IN (%s,%s) AND o.order_id < %s
+              ORDER BY o.order_id DESC LIMIT %s) page
+        JOIN Orders o ON o.order_id = page.order_id
+        JOIN Users u ON o.user_id = u.user_id
+        LEFT JOIN Delivery_Partners d ON o.delivery_partner_id = d.delivery_partner_id
+        JOIN Order_Items oi ON o.order_id = oi.order_id
+        JOIN Menu m ON oi.menu_id = m.menu_id
+        JOIN Restaurants r ON m.restaurant_id = r.restaurant_id
+        ORDER BY o.order_id DESC, oi.order_item_id""",
+     ('Pending', 'Confirmed', 1000000, 21), False),
+    ("status_history",
+     "SELECT * FROM Order_Status_History WHERE order_id=%s ORDER BY history_id",
+     (1,), False),
+    ("export.order_items",
+     *export.dataset_sql("order_items", date(2025, 1, 1), date(2025, 1, 1)),
+     False),
+    ("analytics.revenue_by_restaurant",
+     analytics.RESTAURANT_REVENUE_SQL,
+     ("2025-01-01", "2025-01-31"), False),
+    ("analytics.top_items",
+     analytics.TOP_ITEMS_SQL,
+     ("2025-01-01", "2025-01-31", 10), False),
+    ("feed.poll",
+     feed.FEED_SQL,
+     (1000000, 500), False),
+    ("menu_import.current",
+     menu_import.CURRENT_BY_RESTAURANT_SQL,
+     (1,), False),
+    ("menu_import.current_by_id",
+     menu_import.CURRENT_BY_ID_SQL.format("%s, %s, %s"),
+     (1, 2, 3), False),
+    ("archive.batch",
+     archive.BATCH_SQL,
+     ("Delivered", "Cancelled", "2025-01-01", 500), False),
+    ("search.build",
+     search.ITEMS_SQL.format(where=""),
+     (), True),
+    ("orders.get_archived_order_items",
+     orders.union_parts(orders.ORDER_ROWS_SQL + " WHERE o.user_id=%s", parts=[orders.ARCHIVE_TABLES])[0]
+     + " ORDER BY order_id DESC",
+     (1,), False),
+    ("api.order_history.archived",
+     orders.union_parts(api.HISTORY_ORDERS_SQL, include_archived=True, before="AND o.order_id < %s")[0]
+     + " ORDER BY order_id DESC LIMIT %s",
+     (1, 1000000, 21) * 2 + (21,), False),
+    ("api.order_history.archived_items",
+     orders.union_parts(api.HISTORY_ITEMS_SQL, include_archived=True, ids="%s, %s, %s")[0]
+     + " ORDER BY order_id DESC, order_item_id",
+     (1, 2, 3) * 2, False),
+]
+
+
+def check_plan(rows, max_rows):
+    """Return a list of problems found in EXPLAIN output rows (dicts)."""
+    problems = []
+    for row in rows:
+        est = int(row.get('rows') or 0)
+        if est <= max_rows:
+            continue
+        scan = row.get('type')
+        extra = row.get('Extra') or ""
+        table = row.get('table')
+        if scan == 'ALL':
+            problems.append(f"full table scan on {table} (~{est} rows)")
+        elif scan == 'index':
+            problems.append(f"full index scan on {table} (~{est} rows)")
+        if 'filesort' in extra:
+            problems.append(f"filesort on {table} (~{est} rows)")
+    return problems
+
+
+def run(max_rows, verbose=False):
+    failures = 0
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        for name, sql, params, intentional in QUERIES:
+            cursor.execute("EXPLAIN " + sql, params)
+            plan = cursor.fetchall()
+            problems = check_plan(plan, max_rows)
+            if problems and not intentional:
+                failures += 1
+                print(f"FAIL {name}: " + "; ".join(problems))
+            elif verbose:
+                note = " (intentional scan)" if problems else ""
+                print(f"ok   {name}{note}")
+            if verbose:
+                for row in plan:
+                    print(f"       {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                          f"rows={row.get('rows')} extra={row.get('Extra')}")
+        cursor.close()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN every application query.")
+    parser.add_argument("--max-rows", type=int, default=1000,
+                        help="row estimate above which scans/filesorts fail (default 1000)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    failures = run(args.max_rows, args.verbose)
+    print(f"{failures} query plan(s) failed." if failures else "All query plans OK.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Streaming export of orders, order items, payments and sales rollups.
+
+Rows are read with an unbuffered cursor: MySQL streams the result set and
+the client pulls CHUNK_SIZE rows at a time, writing each chunk to CSV (csv
+module) or Parquet (one pyarrow row group per chunk) before reading the
+next.  Memory stays bounded by the chunk size whatever the date range; no
+DataFrame of the whole result is ever built.
+
+Datasets (date range on Orders.order_date, both ends inclusive):
+
+    orders              one row per order
+    order_items         one row per item, with restaurant and price paid
+    payments            payments of those orders
+    daily               per day: orders, cancellations, subtotal, revenue
+    restaurant_daily    per restaurant and day: orders, items sold, item revenue
+    restaurants         per restaurant over the range
+
+Revenue figures exclude cancelled orders.  export() writes several datasets
+from one connection inside a consistent-snapshot read-only transaction, so
+the files agree with each other.  Orders moved to the archive tables
+(archive.py) are only exported with include_archived / --archived, which
+also reads the archive tables.
+
+    python export.py --from 2025-01-01 --to 2025-01-31 --format parquet --out exports/
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from mysql.connector.constants import FieldType
+
+from db import get_pool
+from orders import union_parts
+import querystats
+
+CHUNK_SIZE = 5000
+FORMATS = ("csv", "parquet")
+
+_RANGE = "o.order_date >= %s AND o.order_date < %s"
+# Each dataset is (rows, query): `rows` runs per table set through
+# orders.union_parts() (live, plus archived with include_archived) and
+# fills `query`'s {rows}.
+_ITEM_ROWS = f"""
+        SELECT o.order_id, o.order_date, m.restaurant_id, oi.quantity, oi.unit_price
+        FROM {{orders}} o
+        JOIN {{items}} oi ON oi.order_id = o.order_id
+        JOIN Menu m ON m.menu_id = oi.menu_id
+        WHERE {_RANGE} AND o.status <> 'Cancelled'
+"""
+DATASETS = {
+    "orders": (f"""
+        SELECT o.order_id, o.order_date, o.status, o.user_id, u.name AS user_name,
+               o.delivery_partner_id, o.coupon_code, o.subtotal_amount, o.total_amount
+        FROM {{orders}} o
+        JOIN Users u ON u.user_id = o.user_id
+        WHERE {_RANGE}
+    """, "{rows} ORDER BY order_date, order_id"),
+    "order_items": (f"""
+        SELECT oi.order_item_id, oi.order_id, o.order_date, o.status,
+               r.restaurant_id, r.name AS restaurant_name, oi.menu_id, m.name AS item_name,
+               m.category, oi.quantity, oi.unit_price, oi.unit_price * oi.quantity AS line_total
+        FROM {{orders}} o
+        JOIN {{items}} oi ON oi.order_id = o.order_id
+        JOIN Menu m ON m.menu_id = oi.menu_id
+        JOIN Restaurants r ON r.restaurant_id = m.restaurant_id
+        WHERE {_RANGE}
+    """, "{rows} ORDER BY order_date, order_item_id"),
+    "payments": (f"""
+        SELECT p.payment_id, p.order_id, p.payment_date, p.amount, p.method, p.status, p.coupon_code,
+               o.order_date
+        FROM {{orders}} o
+        JOIN {{payments}} p ON p.order_id = o.order_id
+        WHERE {_RANGE}
+    """, """
+        SELECT payment_id, order_id, payment_date, amount, method, status, coupon_code
+        FROM ({rows}) p
+        ORDER BY order_date, payment_id
+    """),
+    "daily": (f"""
+        SELECT o.order_date, o.status, o.subtotal_amount, o.total_amount
+        FROM {{orders}} o
+        WHERE {_RANGE}
+    """, """
+        SELECT DATE(o.order_date) AS day,
+               COUNT(*) AS orders,
+               CAST(SUM(o.status = 'Cancelled') AS SIGNED) AS cancelled,
+               SUM(CASE WHEN o.status <> 'Cancelled' THEN o.subtotal_amount ELSE 0 END) AS subtotal,
+               SUM(CASE WHEN o.status <> 'Cancelled' THEN o.total_amount ELSE 0 END) AS revenue
+        FROM ({rows}) o
+        GROUP BY DATE(o.order_date)
+        ORDER BY day
+    """),
+    "restaurant_daily": (_ITEM_ROWS, """
+        SELECT DATE(x.order_date) AS day, r.restaurant_id, r.name AS restaurant_name,
+               COUNT(DISTINCT x.order_id) AS orders,
+               CAST(SUM(x.quantity) AS SIGNED) AS items_sold,
+               SUM(x.unit_price * x.quantity) AS item_revenue
+        FROM ({rows}) x
+        JOIN Restaurants r ON r.restaurant_id = x.restaurant_id
+        GROUP BY DATE(x.order_date), r.restaurant_id, r.name
+        ORDER BY day, r.restaurant_id
+    """),
+    "restaurants": (_ITEM_ROWS, """
+        SELECT r.restaurant_id, r.name AS restaurant_name,
+               COUNT(DISTINCT x.order_id) AS orders,
+               CAST(SUM(x.quantity) AS SIGNED) AS items_sold,
+               SUM(x.unit_price * x.quantity) AS item_revenue
+        FROM ({rows}) x
+        JOIN Restaurants r ON r.restaurant_id = x.restaurant_id
+        GROUP BY r.restaurant_id, r.name
+        ORDER BY r.restaurant_id
+    """),
+}
+
+
+def date_bounds(date_from, date_to):
+    """[start, end) datetimes for an inclusive date range (None = open)."""
+    start = datetime.combine(date_from, datetime.min.time()) if date_from else datetime(1970, 1, 1)
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time()) if date_to else datetime(9999, 1, 1)
+    return start, end
+
+
+def dataset_sql(dataset, date_from=None, date_to=None, include_archived=False):
+    """(sql, params) of `dataset` over the date range."""
+    rows_sql, query = DATASETS[dataset]
+    rows, params = union_parts(rows_sql, date_bounds(date_from, date_to), include_archived)
+    return query.format(rows=rows), params
+
+
+def iter_chunks(conn, dataset, date_from=None, date_to=None, chunk_size=CHUNK_SIZE, include_archived=False):
+    """
+    Yield (description, rows) chunks of `dataset` read from `conn` with an
+    unbuffered cursor; an empty result yields one empty chunk so writers
+    still get the columns.  The generator must be run to completion before
+    `conn` is used again.
+    """
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(*dataset_sql(dataset, date_from, date_to, include_archived))
+        description = cursor.description
+        first = True
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows and not first:
+                break
+            first = False
+            yield description, rows
+            if not rows:
+                break
+    finally:
+        cursor.close()
+
+
+def write_csv(chunks, out):
+    """Write chunks to text stream `out` (header first); returns the row count."""
+    writer = csv.writer(out)
+    count = 0
+    header = False
+    for description, rows in chunks:
+        if not header:
+            writer.writerow([d[0] for d in description])
+            header = True
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def _arrow_type(type_code):
+    import pyarrow as pa
+
+    if type_code == FieldType.NEWDECIMAL or type_code == FieldType.DECIMAL:
+        return pa.decimal128(20, 2)   # every exported amount is DECIMAL(..., 2)
+    if type_code in (FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24):
+        return pa.int64()
+    if type_code in (FieldType.FLOAT, FieldType.DOUBLE):
+        return pa.float64()
+    if type_code in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return pa.timestamp("us")
+    if type_code == FieldType.DATE:
+        return pa.date32()
+    return pa.string()
+
+
+def write_parquet(chunks, out):
+    """
+    Write chunks to `out` (path or binary file) as Parquet, one row group per
+    chunk, with column types taken from the cursor description.  Returns
+    the row count.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    count = 0
+    try:
+        for description, rows in chunks:
+            if writer is None:
+                schema = pa.schema([(d[0], _arrow_type(d[1])) for d in description])
+                writer = pq.ParquetWriter(out, schema, compression="snappy")
+            columns = list(zip(*rows)) or [[] for _ in description]
+            writer.write_table(pa.table(
+                [pa.array(col, type=field.type) for col, field in zip(columns, writer.schema)],
+                schema=writer.schema,
+            ))
+            count += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def _write(fmt, chunks, path):
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            return write_csv(chunks, f)
+    return write_parquet(chunks, str(path))
+
+
+def export(date_from, date_to, out_dir, fmt="csv", datasets=None, chunk_size=CHUNK_SIZE,
+           include_archived=False):
+    """
+    Write each dataset to out_dir/<dataset>_<from>_<to>.<fmt> from one
+    consistent snapshot.  Returns {dataset: (path, rows)}.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    datasets = list(datasets or DATASETS)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    label = f"{date_from or 'start'}_{date_to or 'now'}"
+
+    results = {}
+    pool = get_pool()
+    started = time.perf_counter()
+    raw = pool.checkout()
+    querystats.stats.record_acquire(time.perf_counter() - started)
+    # Timed like get_connection(): only the reads count, not the file writes
+    conn = querystats.InstrumentedConnection(raw)
+    finished = False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+        cursor.close()
+        for dataset in datasets:
+            path = out_dir / f"{dataset}_{label}.{fmt}"
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            chunks = iter_chunks(conn, dataset, date_from, date_to, chunk_size, include_archived)
+            rows = _write(fmt, chunks, tmp)
+            os.replace(tmp, path)
+            results[dataset] = (path, rows)
+        conn.rollback()
+        finished = True
+    finally:
+        conn.finish()
+        # An interrupted stream leaves unread rows behind: drop the connection
+        pool.checkin(raw, discard=not finished)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export orders and sales rollups.")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--out", default="exports")
+    parser.add_argument("--dataset", action="append", choices=list(DATASETS),
+                        help="repeat to export several (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--archived", action="store_true", help="include archived orders")
+    args = parser.parse_args(argv)
+
+    results = export(args.date_from, args.date_to, args.out, args.format, args.dataset, args.chunk_size,
+                     args.archived)
+    for dataset, (path, rows) in results.items():
+        print(f"{dataset:<17} {rows:>9} rows  {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
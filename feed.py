@@ -0,0 +1,227 @@
+"""
+Order status change feed.
+
+trg_orders_update_status_after writes every status transition into
+Order_Status_History.  ChangeFeed tails that table by history_id, one
+indexed range query (history_id > last seen) per poll for all orders, and
+fans new rows out to subscribers, so screens showing orders can apply
+status changes incrementally instead of re-running the order join.
+
+    sub = order_feed.subscribe(user_id=7)   # or subscribe() for every order
+    ...
+    for event in sub.drain():
+        ...   # {"history_id", "order_id", "user_id", "old_status", "new_status", "changed_at"}
+
+Subscriptions are held weakly: dropping the last reference (e.g. a
+Streamlit session ending) unsubscribes.  A subscriber that falls more than
+its queue length behind is marked `overflowed` and should reload.
+
+Auto-increment ids are handed out before commit, so a transaction can
+commit a lower history_id after a higher one was already read.  Ids skipped
+over are remembered and re-checked for GAP_TIMEOUT seconds (rolled-back
+inserts leave permanent gaps), so late commits are still delivered.
+
+The feed polls in a daemon thread that starts with the first subscriber.
+It also keeps the last BUFFER_SIZE events in memory for since() callers
+(e.g. HTTP clients that remember the last history_id they saw).
+"""
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+from db import get_connection
+
+POLL_INTERVAL = 1.0       # seconds between polls
+BATCH = 500               # rows per poll query
+BUFFER_SIZE = 5000        # recent events kept for since()
+QUEUE_SIZE = 1000         # pending events per subscriber
+GAP_TIMEOUT = 30.0        # seconds to wait for a skipped history_id to commit
+
+log = logging.getLogger(__name__)
+
+FEED_SQL = """
+    SELECT h.history_id, h.order_id, o.user_id, h.old_status, h.new_status, h.changed_at
+    FROM Order_Status_History h
+    JOIN Orders o ON o.order_id = h.order_id
+    WHERE h.history_id > %s
+    ORDER BY h.history_id
+    LIMIT %s
+"""
+GAP_SQL = """
+    SELECT h.history_id, h.order_id, o.user_id, h.old_status, h.new_status, h.changed_at
+    FROM Order_Status_History h
+    JOIN Orders o ON o.order_id = h.order_id
+    WHERE h.history_id IN ({})
+"""
+
+
+class Subscription:
+    """Queue of feed events for one subscriber (all orders or one user's)."""
+
+    def __init__(self, feed, user_id=None, maxlen=QUEUE_SIZE):
+        self.feed = feed
+        self.user_id = user_id
+        self.overflowed = False
+        self._events = deque()
+        self._maxlen = maxlen
+        self._lock = threading.Lock()
+
+    def matches(self, event):
+        return self.user_id is None or event['user_id'] == self.user_id
+
+    def push(self, event):
+        with self._lock:
+            if len(self._events) >= self._maxlen:
+                self._events.popleft()
+                self.overflowed = True
+            self._events.append(event)
+
+    def drain(self):
+        """Return and clear the pending events (oldest first)."""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+    def reset(self):
+        """Clear pending events and the overflow flag (after a full reload)."""
+        with self._lock:
+            self._events.clear()
+            self.overflowed = False
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+
+class ChangeFeed:
+    """Tails Order_Status_History and fans events out to subscriptions."""
+
+    def __init__(self, poll_interval=POLL_INTERVAL, batch=BATCH, buffer_size=BUFFER_SIZE):
+        self.poll_interval = poll_interval
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._subs = weakref.WeakSet()
+        self._recent = deque(maxlen=buffer_size)
+        self._gaps = {}            # history_id -> first seen missing (monotonic)
+        self.last_id = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    # -- polling -----------------------------------------------------------
+    def _fetch(self, cursor):
+        if self.last_id is None:
+            cursor.execute("SELECT IFNULL(MAX(history_id), 0) AS last_id FROM Order_Status_History")
+            self.last_id = int(cursor.fetchone()['last_id'])
+        rows = []
+        if self._gaps:
+            cursor.execute(GAP_SQL.format(",".join(["%s"] * len(self._gaps))), list(self._gaps))
+            rows.extend(cursor.fetchall())
+        cursor.execute(FEED_SQL, (self.last_id, self.batch))
+        fresh = cursor.fetchall()
+        rows.extend(fresh)
+        return rows, len(fresh) == self.batch
+
+    def poll_once(self):
+        """Fetch and dispatch new events; returns how many were delivered."""
+        delivered = 0
+        more = True
+        while more:
+            with get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                rows, more = self._fetch(cursor)
+                cursor.close()
+            now = time.monotonic()
+            events = []
+            with self._lock:
+                for row in rows:
+                    hid = int(row['history_id'])
+                    if hid in self._gaps:
+                        del self._gaps[hid]
+                    elif hid <= self.last_id:
+                        continue
+                    else:
+                        for missing in range(self.last_id + 1, hid):
+                            self._gaps[missing] = now
+                        self.last_id = hid
+                    events.append(row)
+                self._gaps = {h: t for h, t in self._gaps.items() if now - t < GAP_TIMEOUT}
+                self._recent.extend(events)
+                subs = list(self._subs)
+            for event in events:
+                for sub in subs:
+                    if sub.matches(event):
+                        sub.push(event)
+            delivered += len(events)
+        return delivered
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception:
+                log.exception("order status feed poll failed")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="order-feed", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # -- subscribers -------------------------------------------------------
+    def subscribe(self, user_id=None, maxlen=QUEUE_SIZE):
+        """New subscription to one user's orders (or all orders when None)."""
+        sub = Subscription(self, user_id, maxlen)
+        with self._lock:
+            self._subs.add(sub)
+        self.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def since(self, after_id, user_id=None):
+        """
+        Buffered events with history_id > after_id (for `user_id` if given).
+        Returns (events, complete); complete is False when events older than
+        the buffer were requested and the caller should reload instead.
+        """
+        self.start()
+        with self._lock:
+            recent = list(self._recent)
+            last_id = self.last_id
+        complete = (bool(recent) and recent[0]['history_id'] <= after_id + 1) or after_id == last_id
+        events = [e for e in recent
+                  if e['history_id'] > after_id and (user_id is None or e['user_id'] == user_id)]
+        return events, complete
+
+    def cursor(self):
+        """
+        Highest history_id below which every event has been seen: last_id,
+        or just under the oldest id still awaiting a late commit.  Clients
+        resuming from it may receive some events twice, never miss one.
+        """
+        with self._lock:
+            if self._gaps:
+                return min(self._gaps) - 1
+            return self.last_id or 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "last_id": self.last_id,
+                "subscribers": len(self._subs),
+                "buffered": len(self._recent),
+                "pending_gaps": len(self._gaps),
+            }
+
+
+# Process-wide feed
+order_feed = ChangeFeed()
@@ -0,0 +1,162 @@
+"""
+Image assets: restaurant pictures and the banner, served as small WebP
+thumbnails instead of the full-size originals.
+
+Images are resolved relative to the repository's images/ directory, so the
+app no longer depends on one machine's absolute paths.  A restaurant's
+image is looked up in RESTAURANT_IMAGES, then by a file named after the
+restaurant (e.g. "Burger Hub" -> images/burger-hub.jpeg).
+
+Thumbnails are produced at fixed widths (THUMB_WIDTHS) the first time they
+are needed and written to an on-disk cache keyed by the SHA-256 of the
+source file, so a replaced image gets new thumbnails and restarts reuse the
+old ones.  The encoded bytes are then served from the process-wide entity
+cache, so reruns do no file or Pillow work at all.
+
+    python images.py            # pre-generate every thumbnail
+"""
+import hashlib
+import io
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+
+from cache import cache
+
+IMAGES_DIR = Path(__file__).resolve().parent / "images"
+CACHE_DIR = Path(os.environ.get("FOOD_IMAGE_CACHE_DIR", IMAGES_DIR / ".thumbs"))
+THUMB_WIDTHS = (320, 500, 700)
+WEBP_QUALITY = 80
+EXTENSIONS = (".webp", ".jpg", ".jpeg", ".png")
+
+BANNER = "banner.jpg"
+RESTAURANT_IMAGES = {
+    'Pizza Palace': "pizza-palace.jpg",
+    'Sushi World': "sushi-world.jpg",
+    'Burger Hub': "burger-hub.jpeg",
+    'Curry House': "curry-house.jpeg",
+    'Taco Town': "taco.jpeg",
+    'Pasta Corner': "pasta-corner.jpeg",
+    'Sandwich Stop': "sandwich-shop.png",
+}
+
+_hash_lock = threading.Lock()
+_source_hashes = {}     # path -> (mtime_ns, size, sha256)
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def resolve(filename):
+    """Path of `filename` inside images/, or None when it does not exist."""
+    if not filename:
+        return None
+    path = (IMAGES_DIR / filename).resolve()
+    if IMAGES_DIR not in path.parents or not path.is_file():
+        return None
+    return path
+
+
+def restaurant_image_path(name, filename=None):
+    """
+    Source image of a restaurant: an explicit `filename` (e.g. from a DB
+    column), the RESTAURANT_IMAGES entry, or images/<slug of name>.<ext>.
+    """
+    for candidate in (filename, RESTAURANT_IMAGES.get(name)):
+        path = resolve(candidate)
+        if path is not None:
+            return path
+    slug = _slug(name or "")
+    for ext in EXTENSIONS:
+        path = resolve(slug + ext)
+        if path is not None:
+            return path
+    return None
+
+
+def source_hash(path):
+    """SHA-256 of the file, recomputed only when its mtime or size changes."""
+    st = os.stat(path)
+    with _hash_lock:
+        known = _source_hashes.get(path)
+        if known is not None and known[:2] == (st.st_mtime_ns, st.st_size):
+            return known[2]
+    digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    with _hash_lock:
+        _source_hashes[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+
+def _fixed_width(width):
+    """Smallest configured width that is at least `width` (else the largest)."""
+    for w in THUMB_WIDTHS:
+        if w >= width:
+            return w
+    return THUMB_WIDTHS[-1]
+
+
+def _render(path, width):
+    """Resize `path` to `width` pixels wide (never upscaled) and encode as WebP."""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="WEBP", quality=WEBP_QUALITY, method=6)
+    return out.getvalue()
+
+
+def _disk_thumbnail(path, digest, width):
+    target = CACHE_DIR / f"{digest[:32]}_{width}.webp"
+    if target.is_file():
+        return target.read_bytes()
+    data = _render(path, width)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+    return data
+
+
+def thumbnail(path, width):
+    """
+    WebP bytes of `path` at the configured width closest to `width`, or
+    None when the source is missing or cannot be decoded.
+    """
+    if path is None:
+        return None
+    path = str(path)
+    width = _fixed_width(width)
+    try:
+        digest = source_hash(path)
+        return cache.get_or_load("images", (digest, width), lambda: _disk_thumbnail(path, digest, width))
+    except (OSError, ValueError):
+        return None
+
+
+def restaurant_thumbnail(name, width=500, filename=None):
+    return thumbnail(restaurant_image_path(name, filename), width)
+
+
+def banner(width=700):
+    return thumbnail(resolve(BANNER), width)
+
+
+def warm():
+    """Generate every known thumbnail; returns the number of images found."""
+    paths = [p for p in (resolve(BANNER), *(restaurant_image_path(n) for n in RESTAURANT_IMAGES)) if p]
+    for path in paths:
+        for width in THUMB_WIDTHS:
+            thumbnail(path, width)
+    return len(paths)
+
+
+if __name__ == "__main__":
+    print(f"{warm()} source image(s), thumbnails in {CACHE_DIR}")
+    sys.exit(0)
@@ -0,0 +1,348 @@
+"""
+Bulk menu import: onboarding a restaurant's menu and price / stock feeds.
+
+A file (CSV with a header row, or JSON: a list of objects or {"items": [...]})
+holds one menu row per record with any of these columns:
+
+    menu_id      existing item to change (optional for a restaurant import)
+    name         item name; without menu_id it identifies the item
+                 within the restaurant (case-insensitive)
+    category, price, stock
+
+Empty or missing cells leave the current value alone, so a stock feed only
+needs menu_id,stock.  New items need a price; their category defaults to
+UNCATEGORIZED and their stock to 100.  Rows are validated first (every problem is reported
+with its line number), then diffed against the current Menu rows and the
+changes applied in one transaction:
+
+    inserts    one multi-row INSERT per BATCH_SIZE rows (executemany)
+    updates    INSERT ... ON DUPLICATE KEY UPDATE on menu_id, batched the
+               same way, so thousands of stock changes cost a few statements
+    deletes    DELETE ... WHERE menu_id IN (...), only with delete_missing
+
+import_menu(restaurant_id, rows) syncs one restaurant: unknown names are
+added, and with delete_missing=True items absent from the file are deleted.
+import_menu(None, rows) is a feed across restaurants: every row needs a
+menu_id and only existing items are changed.  The current rows are read
+FOR UPDATE inside the transaction, so the diff cannot race with other
+edits; dry_run=True reports the diff without writing.
+
+    python menu_import.py menu.csv --restaurant 12 --dry-run
+    python menu_import.py stock_feed.json
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+import mysql.connector
+
+from catalog import UNCATEGORIZED, invalidate_menu
+from db import get_connection
+from errors import ER_ROW_IS_REFERENCED, ConflictError, ValidationError
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 20          # validation messages kept in the report
+MAX_PRICE = Decimal("999999.99")   # Menu.price is DECIMAL(8,2)
+FIELDS = ("name", "category", "price", "stock")
+NAME_LENGTH, CATEGORY_LENGTH = 100, 50
+
+CURRENT_BY_RESTAURANT_SQL = """
+    SELECT menu_id, restaurant_id, name, category, price, stock
+    FROM Menu WHERE restaurant_id = %s
+    FOR UPDATE
+"""
+CURRENT_BY_ID_SQL = """
+    SELECT menu_id, restaurant_id, name, category, price, stock
+    FROM Menu WHERE menu_id IN ({})
+    FOR UPDATE
+"""
+INSERT_SQL = "INSERT INTO Menu (restaurant_id, name, category, price, stock) VALUES (%s,%s,%s,%s,%s)"
+# Every row exists (and is locked): the INSERT always takes the UPDATE branch
+UPDATE_SQL = """
+    INSERT INTO Menu (menu_id, restaurant_id, name, category, price, stock) VALUES (%s,%s,%s,%s,%s,%s)
+    ON DUPLICATE KEY UPDATE name = VALUES(name), category = VALUES(category),
+                            price = VALUES(price), stock = VALUES(stock)
+"""
+DELETE_SQL = "DELETE FROM Menu WHERE menu_id IN ({})"
+
+
+# --------------------------
+# PARSING / VALIDATION
+# --------------------------
+def read_records(data, fmt=None, filename=""):
+    """
+    Records (dicts) from CSV or JSON text / bytes.  `fmt` is "csv" or
+    "json"; by default it follows the filename extension.  Each record gets
+    its source line (CSV) or position (JSON) as "_line".
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    fmt = fmt or ("json" if str(filename).lower().endswith(".json") else "csv")
+    if fmt == "json":
+        try:
+            parsed = json.loads(data)
+        except ValueError as e:
+            raise ValidationError(f"Invalid JSON: {e}") from e
+        if isinstance(parsed, dict):
+            parsed = parsed.get("items")
+        if not isinstance(parsed, list) or not all(isinstance(r, dict) for r in parsed):
+            raise ValidationError('JSON must be a list of objects or {"items": [...]}.')
+        return [{**r, "_line": i} for i, r in enumerate(parsed, 1)]
+
+    reader = csv.DictReader(io.StringIO(data))
+    if not reader.fieldnames:
+        raise ValidationError("The CSV file is empty.")
+    reader.fieldnames = [(f or "").strip().lower() for f in reader.fieldnames]
+    return [{**r, "_line": reader.line_num} for r in reader]
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def validate(records):
+    """
+    Clean rows from parsed records: (rows, errors).  A row holds the
+    provided fields only (menu_id, name, category, price as Decimal, stock
+    as int) plus "_line"; errors are "line N: message" strings.
+    """
+    rows, errors = [], []
+    for record in records:
+        line = record.get("_line")
+        row, problems = {"_line": line}, []
+        try:
+            if not _blank(record.get("menu_id")):
+                row["menu_id"] = int(str(record["menu_id"]).strip())
+        except ValueError:
+            problems.append("menu_id must be an integer")
+        if not _blank(record.get("name")):
+            row["name"] = str(record["name"]).strip()
+            if len(row["name"]) > NAME_LENGTH:
+                problems.append(f"name is longer than {NAME_LENGTH} characters")
+        if not _blank(record.get("category")):
+            row["category"] = str(record["category"]).strip()
+            if len(row["category"]) > CATEGORY_LENGTH:
+                problems.append(f"category is longer than {CATEGORY_LENGTH} characters")
+        if not _blank(record.get("price")):
+            try:
+                price = Decimal(str(record["price"]).strip())
+                if not price.is_finite() or price < 0 or price > MAX_PRICE:
+                    problems.append(f"price must be between 0 and {MAX_PRICE}")
+                elif price != price.quantize(Decimal("0.01")):
+                    problems.append("price has more than 2 decimals")
+                else:
+                    row["price"] = price.quantize(Decimal("0.01"))
+            except InvalidOperation:
+                problems.append("price must be a number")
+        if not _blank(record.get("stock")):
+            try:
+                stock = Decimal(str(record["stock"]).strip())
+                if stock != stock.to_integral_value() or stock < 0:
+                    raise InvalidOperation
+                row["stock"] = int(stock)
+            except InvalidOperation:
+                problems.append("stock must be a whole number >= 0")
+        if "menu_id" not in row and "name" not in row:
+            problems.append("menu_id or name is required")
+        if problems:
+            errors.append(f"line {line}: " + "; ".join(problems))
+        else:
+            rows.append(row)
+    return rows, errors
+
+
+# --------------------------
+# DIFF
+# --------------------------
+def diff(current, rows, restaurant_id=None, delete_missing=False):
+    """
+    Changes that turn `current` (Menu rows) into the state described by
+    `rows`.  Returns (plan, errors) where plan holds
+    inserts [(restaurant_id, name, category, price, stock)],
+    updates [(old row, new row)], deletes [old rows] and unchanged (count).
+    """
+    by_id = {row["menu_id"]: row for row in current}
+    by_name = {}
+    for row in current:
+        by_name.setdefault(row["name"].strip().lower(), row)
+
+    plan = {"inserts": [], "updates": [], "deletes": [], "unchanged": 0}
+    errors, seen, new_names = [], set(), set()
+    for row in rows:
+        line = row["_line"]
+        if "menu_id" in row:
+            old = by_id.get(row["menu_id"])
+            if old is None:
+                errors.append(f"line {line}: menu_id {row['menu_id']} is not "
+                              + ("on this menu" if restaurant_id is not None else "a menu item"))
+                continue
+        else:
+            old = by_name.get(row["name"].lower()) if restaurant_id is not None else None
+            if old is None and restaurant_id is None:
+                errors.append(f"line {line}: menu_id is required without a restaurant")
+                continue
+
+        if old is None:
+            key = row["name"].lower()
+            if key in new_names:
+                errors.append(f"line {line}: '{row['name']}' appears more than once")
+                continue
+            if "price" not in row:
+                errors.append(f"line {line}: price is required for the new item '{row['name']}'")
+                continue
+            new_names.add(key)
+            plan["inserts"].append((restaurant_id, row["name"], row.get("category", UNCATEGORIZED),
+                                    row["price"], row.get("stock", 100)))
+            continue
+
+        if old["menu_id"] in seen:
+            errors.append(f"line {line}: item {old['menu_id']} ('{old['name']}') appears more than once")
+            continue
+        seen.add(old["menu_id"])
+        new = {**old, **{f: row[f] for f in FIELDS if f in row}}
+        if any(new[f] != old[f] for f in FIELDS):
+            plan["updates"].append((old, new))
+        else:
+            plan["unchanged"] += 1
+
+    if delete_missing:
+        plan["deletes"] = [row for row in current if row["menu_id"] not in seen]
+    return plan, errors
+
+
+def _normalize(row):
+    row = dict(row)
+    row["price"] = Decimal(row["price"]).quantize(Decimal("0.01"))
+    row["stock"] = int(row["stock"] or 0)
+    return row
+
+
+# --------------------------
+# IMPORT
+# --------------------------
+def _batches(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _summary(plan, restaurant_ids, dry_run):
+    return {
+        "inserted": len(plan["inserts"]),
+        "updated": len(plan["updates"]),
+        "deleted": len(plan["deletes"]),
+        "unchanged": plan["unchanged"],
+        "restaurants": sorted(restaurant_ids),
+        "dry_run": dry_run,
+        "plan": plan,
+    }
+
+
+def import_menu(restaurant_id, rows, delete_missing=False, dry_run=False):
+    """
+    Validate, diff and apply menu `rows` (records from read_records(), or
+    already validated rows) in one transaction; see the module docstring.
+    Returns {"inserted", "updated", "deleted", "unchanged", "restaurants",
+    "dry_run", "plan"}.  Raises ValidationError listing bad lines and
+    ConflictError when a deleted item is still referenced by orders.
+    """
+    rows, errors = validate(rows)
+    if restaurant_id is None and delete_missing:
+        raise ValidationError("delete_missing needs a restaurant.")
+    if errors:
+        raise ValidationError(_error_message(errors))
+    if not rows:
+        raise ValidationError("The file has no menu rows.")
+
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction()
+            if restaurant_id is not None:
+                cursor.execute(CURRENT_BY_RESTAURANT_SQL, (int(restaurant_id),))
+                current = cursor.fetchall()
+                if not current and not _restaurant_exists(cursor, restaurant_id):
+                    raise ValidationError("Restaurant not found.")
+            else:
+                ids = sorted({row["menu_id"] for row in rows if "menu_id" in row})
+                current = []
+                for batch in _batches(ids):
+                    cursor.execute(CURRENT_BY_ID_SQL.format(",".join(["%s"] * len(batch))), batch)
+                    current.extend(cursor.fetchall())
+            current = [_normalize(row) for row in current]
+
+            plan, errors = diff(current, rows, None if restaurant_id is None else int(restaurant_id),
+                                delete_missing)
+            if errors:
+                raise ValidationError(_error_message(errors))
+            touched = {rid for rid, *_ in plan["inserts"]}
+            touched.update(old["restaurant_id"] for old, _ in plan["updates"])
+            touched.update(old["restaurant_id"] for old in plan["deletes"])
+            if dry_run:
+                conn.rollback()
+                return _summary(plan, touched, True)
+
+            for batch in _batches(plan["inserts"]):
+                cursor.executemany(INSERT_SQL, batch)
+            updates = [(n["menu_id"], n["restaurant_id"], n["name"], n["category"], n["price"], n["stock"])
+                       for _, n in plan["updates"]]
+            for batch in _batches(updates):
+                cursor.executemany(UPDATE_SQL, batch)
+            for batch in _batches([old["menu_id"] for old in plan["deletes"]]):
+                cursor.execute(DELETE_SQL.format(",".join(["%s"] * len(batch))), batch)
+            conn.commit()
+        except mysql.connector.IntegrityError as e:
+            conn.rollback()
+            if e.errno == ER_ROW_IS_REFERENCED:
+                raise ConflictError("Some items to delete appear in orders or carts; nothing was imported.") from e
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    for rid in touched:
+        invalidate_menu(rid)
+    return _summary(plan, touched, False)
+
+
+def _restaurant_exists(cursor, restaurant_id):
+    cursor.execute("SELECT 1 FROM Restaurants WHERE restaurant_id = %s", (int(restaurant_id),))
+    return bool(cursor.fetchall())
+
+
+def _error_message(errors):
+    shown = errors[:MAX_ERRORS]
+    more = f"\n... and {len(errors) - len(shown)} more" if len(errors) > len(shown) else ""
+    return f"{len(errors)} invalid row(s):\n" + "\n".join(shown) + more
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk menu import / price and stock feed.")
+    parser.add_argument("file", type=Path, help="CSV or JSON file")
+    parser.add_argument("--restaurant", type=int, default=None,
+                        help="sync this restaurant's menu (default: feed of existing menu_ids)")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="delete the restaurant's items that are not in the file")
+    parser.add_argument("--format", choices=("csv", "json"), default=None)
+    parser.add_argument("--dry-run", action="store_true", help="report the diff without writing")
+    args = parser.parse_args(argv)
+
+    try:
+        records = read_records(args.file.read_bytes(), args.format, args.file.name)
+        result = import_menu(args.restaurant, records, args.delete_missing, args.dry_run)
+    except (ValidationError, ConflictError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    verb = "would be" if result["dry_run"] else "were"
+    print(f"{result['inserted']} inserted, {result['updated']} updated, {result['deleted']} deleted, "
+          f"{result['unchanged']} unchanged ({verb} applied)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Apply versioned schema migrations from ./migrations.
+
+database.sql builds a fresh database; the files in migrations/ are applied
+on top of it, in order, exactly once.  Applied versions are recorded in the
+Schema_Migrations table.
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied / pending migrations
+
+Migration files are named NNN_description.sql and may use the mysql
+client's DELIMITER directive for triggers and procedures, like database.sql.
+"""
+import argparse
+import os
+import re
+import sys
+
+from db import get_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_FILE_RE = re.compile(r"^(\d+)_([\w\-]+)\.sql$")
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Return [(version, name, path)] sorted by version."""
+    found = []
+    for fname in os.listdir(directory):
+        m = _FILE_RE.match(fname)
+        if m:
+            found.append((int(m.group(1)), m.group(2), os.path.join(directory, fname)))
+    return sorted(found)
+
+
+def split_statements(sql):
+    """Split a script into statements, honouring DELIMITER directives."""
+    statements, buf = [], []
+    delimiter = ";"
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not buf and (not stripped or stripped.startswith("--")):
+            continue
+        if stripped.upper().startswith("DELIMITER "):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        buf.append(line)
+        if stripped.endswith(delimiter):
+            stmt = "\n".join(buf).rstrip()
+            stmt = stmt[: -len(delimiter)].strip()
+            if stmt:
+                statements.append(stmt)
+            buf = []
+    tail = "\n".join(buf).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Schema_Migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_table(cursor)
+    cursor.execute("SELECT version FROM Schema_Migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(directory=MIGRATIONS_DIR, verbose=True):
+    """Apply pending migrations; returns the list of versions applied."""
+    done = []
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        applied = applied_versions(cursor)
+        for version, name, path in discover(directory):
+            if version in applied:
+                continue
+            with open(path, encoding="utf-8") as f:
+                statements = split_statements(f.read())
+            if verbose:
+                print(f"Applying {version:03d}_{name} ({len(statements)} statements)")
+            # DDL auto-commits in MySQL, so a failed migration stops the run
+            # and is not recorded; fix it and re-run.
+            for stmt in statements:
+                cursor.execute(stmt)
+                if cursor.with_rows:
+                    cursor.fetchall()
+            cursor.execute("INSERT INTO Schema_Migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            done.append(version)
+        cursor.close()
+    return done
+
+
+def status(directory=MIGRATIONS_DIR):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        applied = applied_versions(cursor)
+        conn.commit()
+        cursor.close()
+    for version, name, _ in discover(directory):
+        mark = "applied" if version in applied else "pending"
+        print(f"{version:03d}_{name}: {mark}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--status", action="store_true", help="list migrations and exit")
+    args = parser.parse_args(argv)
+    if args.status:
+        status()
+        return 0
+    applied = migrate()
+    print(f"{len(applied)} migration(s) applied." if applied else "Schema is up to date.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+-- Stock is now reserved by the application (stock.py) with conditional,
+-- ordered decrements before order items are inserted, so the item trigger
+-- no longer touches Menu.stock.
+
+-- Short-lived holds on stock while items sit in checkout
+CREATE TABLE Stock_Reservations (
+    reservation_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    menu_id INT NOT NULL,
+    quantity INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id),
+    FOREIGN KEY (menu_id) REFERENCES Menu(menu_id),
+    UNIQUE KEY uniq_reservation_user_menu (user_id, menu_id),
+    KEY idx_reservation_expires (expires_at),
+    CHECK (quantity > 0)
+);
+
+DROP TRIGGER IF EXISTS trg_after_insert_order_item;
+DELIMITER //
+CREATE TRIGGER trg_after_insert_order_item
+AFTER INSERT ON Order_Items
+FOR EACH ROW
+BEGIN
+    -- Recalculate order total
+    UPDATE Orders
+    SET total_amount = GetOrderTotal(NEW.order_id)
+    WHERE order_id = NEW.order_id;
+END;
+//
+DELIMITER ;
+
+-- Only items of a live order give their stock back when deleted; stock of
+-- cancelled orders is released by the application at cancel time.
+DROP TRIGGER IF EXISTS trg_after_delete_order_item;
+DELIMITER //
+CREATE TRIGGER trg_after_delete_order_item
+AFTER DELETE ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF (SELECT status FROM Orders WHERE order_id = OLD.order_id)
+       IN ('Pending', 'Confirmed', 'Out for Delivery') THEN
+        UPDATE Menu
+        SET stock = stock + OLD.quantity
+        WHERE menu_id = OLD.menu_id;
+    END IF;
+
+    UPDATE Orders
+    SET total_amount = GetOrderTotal(OLD.order_id)
+    WHERE order_id = OLD.order_id;
+END;
+//
+DELIMITER ;
@@ -0,0 +1,25 @@
+-- Indexes shaped after the queries the application actually issues.
+-- InnoDB secondary indexes carry the primary key, so (col, pk) indexes
+-- also serve "WHERE col = ? ORDER BY pk" without a filesort.
+
+-- Orders of one user, newest first (order history)
+CREATE INDEX idx_orders_user_order ON Orders (user_id, order_id);
+
+-- Active-order count per delivery partner (dispatcher), covering
+CREATE INDEX idx_orders_partner_status ON Orders (delivery_partner_id, status);
+
+-- Reviews of a restaurant, newest first (browse page)
+CREATE INDEX idx_reviews_restaurant_date ON Reviews (restaurant_id, review_date);
+
+-- Menu of a restaurant in menu_id order (browse page, admin menu tab)
+CREATE INDEX idx_menu_restaurant ON Menu (restaurant_id, menu_id);
+
+-- Items of an order; covering for the order-item joins and stock release
+CREATE INDEX idx_order_items_order_menu ON Order_Items (order_id, menu_id, quantity);
+
+-- Coupon validation at cart preview / checkout, covering
+CREATE INDEX idx_coupons_lookup
+    ON Coupons (code, active, expiry_date, discount_percent, max_discount_amount);
+
+-- Status history of an order in change order
+CREATE INDEX idx_status_history_order ON Order_Status_History (order_id, history_id);
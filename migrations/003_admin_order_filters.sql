@@ -0,0 +1,7 @@
+-- Admin Orders tab: keyset pagination on order_id with server-side filters.
+
+-- Status filter, newest first
+CREATE INDEX idx_orders_status_order ON Orders (status, order_id);
+
+-- Date range filter
+CREATE INDEX idx_orders_date ON Orders (order_date);
@@ -0,0 +1,112 @@
+-- Per-restaurant rating aggregates, maintained incrementally by triggers on
+-- Reviews (AddReview inserts through them), so restaurant headers and
+-- GetRestaurantAvgRating no longer scan Reviews.
+
+CREATE TABLE Restaurant_Rating_Stats (
+    restaurant_id INT PRIMARY KEY,
+    review_count INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    stars_1 INT NOT NULL DEFAULT 0,
+    stars_2 INT NOT NULL DEFAULT 0,
+    stars_3 INT NOT NULL DEFAULT 0,
+    stars_4 INT NOT NULL DEFAULT 0,
+    stars_5 INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (restaurant_id) REFERENCES Restaurants(restaurant_id) ON DELETE CASCADE
+);
+
+-- Backfill from existing reviews
+INSERT INTO Restaurant_Rating_Stats
+    (restaurant_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+SELECT restaurant_id, COUNT(*), SUM(rating),
+       SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+FROM Reviews
+GROUP BY restaurant_id;
+
+DELIMITER //
+CREATE TRIGGER trg_after_insert_review
+AFTER INSERT ON Reviews
+FOR EACH ROW
+BEGIN
+    INSERT INTO Restaurant_Rating_Stats
+        (restaurant_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+    VALUES (NEW.restaurant_id, 1, NEW.rating,
+            NEW.rating = 1, NEW.rating = 2, NEW.rating = 3, NEW.rating = 4, NEW.rating = 5)
+    ON DUPLICATE KEY UPDATE
+        review_count = review_count + 1,
+        rating_sum = rating_sum + NEW.rating,
+        stars_1 = stars_1 + (NEW.rating = 1),
+        stars_2 = stars_2 + (NEW.rating = 2),
+        stars_3 = stars_3 + (NEW.rating = 3),
+        stars_4 = stars_4 + (NEW.rating = 4),
+        stars_5 = stars_5 + (NEW.rating = 5);
+END;
+//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_after_delete_review
+AFTER DELETE ON Reviews
+FOR EACH ROW
+BEGIN
+    UPDATE Restaurant_Rating_Stats
+    SET review_count = review_count - 1,
+        rating_sum = rating_sum - OLD.rating,
+        stars_1 = stars_1 - (OLD.rating = 1),
+        stars_2 = stars_2 - (OLD.rating = 2),
+        stars_3 = stars_3 - (OLD.rating = 3),
+        stars_4 = stars_4 - (OLD.rating = 4),
+        stars_5 = stars_5 - (OLD.rating = 5)
+    WHERE restaurant_id = OLD.restaurant_id;
+END;
+//
+DELIMITER ;
+
+-- Edited reviews: move the old rating out and the new one in
+DELIMITER //
+CREATE TRIGGER trg_after_update_review
+AFTER UPDATE ON Reviews
+FOR EACH ROW
+BEGIN
+    IF OLD.rating <> NEW.rating OR OLD.restaurant_id <> NEW.restaurant_id THEN
+        UPDATE Restaurant_Rating_Stats
+        SET review_count = review_count - 1,
+            rating_sum = rating_sum - OLD.rating,
+            stars_1 = stars_1 - (OLD.rating = 1),
+            stars_2 = stars_2 - (OLD.rating = 2),
+            stars_3 = stars_3 - (OLD.rating = 3),
+            stars_4 = stars_4 - (OLD.rating = 4),
+            stars_5 = stars_5 - (OLD.rating = 5)
+        WHERE restaurant_id = OLD.restaurant_id;
+        INSERT INTO Restaurant_Rating_Stats
+            (restaurant_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+        VALUES (NEW.restaurant_id, 1, NEW.rating,
+                NEW.rating = 1, NEW.rating = 2, NEW.rating = 3, NEW.rating = 4, NEW.rating = 5)
+        ON DUPLICATE KEY UPDATE
+            review_count = review_count + 1,
+            rating_sum = rating_sum + NEW.rating,
+            stars_1 = stars_1 + (NEW.rating = 1),
+            stars_2 = stars_2 + (NEW.rating = 2),
+            stars_3 = stars_3 + (NEW.rating = 3),
+            stars_4 = stars_4 + (NEW.rating = 4),
+            stars_5 = stars_5 + (NEW.rating = 5);
+    END IF;
+END;
+//
+DELIMITER ;
+
+-- Read the aggregate instead of AVG() over Reviews
+DROP FUNCTION IF EXISTS GetRestaurantAvgRating;
+DELIMITER //
+CREATE FUNCTION GetRestaurantAvgRating(p_restaurant_id INT)
+RETURNS DECIMAL(3,2)
+READS SQL DATA
+BEGIN
+    DECLARE avg_rating DECIMAL(3,2) DEFAULT 0.00;
+    SELECT IF(review_count > 0, rating_sum / review_count, 0.00) INTO avg_rating
+    FROM Restaurant_Rating_Stats
+    WHERE restaurant_id = p_restaurant_id;
+    RETURN IFNULL(avg_rating, 0.00);
+END;
+//
+DELIMITER ;
@@ -0,0 +1,111 @@
+-- Order totals are maintained incrementally instead of being re-summed by
+-- GetOrderTotal() on every item row (O(k^2) for a k-item order).
+--
+-- Order_Items.unit_price snapshots the menu price when the item is ordered,
+-- so later price edits no longer rewrite historical orders.
+-- Orders.subtotal_amount is the sum of unit_price * quantity, kept up to
+-- date by the item triggers; Orders.total_amount is the final charged
+-- amount (coupon, tax and delivery fee applied) written by the application.
+
+ALTER TABLE Order_Items ADD COLUMN unit_price DECIMAL(10,2) DEFAULT NULL AFTER quantity;
+ALTER TABLE Orders ADD COLUMN subtotal_amount DECIMAL(10,2) NOT NULL DEFAULT 0.00 AFTER order_date;
+
+-- Backfill: existing items get the current menu price (the best we have)
+UPDATE Order_Items oi
+JOIN Menu m ON oi.menu_id = m.menu_id
+SET oi.unit_price = m.price
+WHERE oi.unit_price IS NULL;
+
+UPDATE Orders o
+JOIN (
+    SELECT order_id, SUM(unit_price * quantity) AS subtotal
+    FROM Order_Items
+    GROUP BY order_id
+) s ON s.order_id = o.order_id
+SET o.subtotal_amount = s.subtotal;
+
+-- Inserts that do not supply a price (PlaceOrder, ad-hoc SQL) take the
+-- current menu price.
+DELIMITER //
+CREATE TRIGGER trg_before_insert_order_item
+BEFORE INSERT ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF NEW.unit_price IS NULL THEN
+        SET NEW.unit_price = (SELECT price FROM Menu WHERE menu_id = NEW.menu_id);
+    END IF;
+END;
+//
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_after_insert_order_item;
+DELIMITER //
+CREATE TRIGGER trg_after_insert_order_item
+AFTER INSERT ON Order_Items
+FOR EACH ROW
+BEGIN
+    UPDATE Orders
+    SET subtotal_amount = subtotal_amount + NEW.unit_price * NEW.quantity
+    WHERE order_id = NEW.order_id;
+END;
+//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_after_update_order_item
+AFTER UPDATE ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF OLD.order_id <> NEW.order_id THEN
+        UPDATE Orders
+        SET subtotal_amount = subtotal_amount - OLD.unit_price * OLD.quantity
+        WHERE order_id = OLD.order_id;
+        UPDATE Orders
+        SET subtotal_amount = subtotal_amount + NEW.unit_price * NEW.quantity
+        WHERE order_id = NEW.order_id;
+    ELSEIF OLD.unit_price <> NEW.unit_price OR OLD.quantity <> NEW.quantity THEN
+        UPDATE Orders
+        SET subtotal_amount = subtotal_amount - OLD.unit_price * OLD.quantity
+                                              + NEW.unit_price * NEW.quantity
+        WHERE order_id = NEW.order_id;
+    END IF;
+END;
+//
+DELIMITER ;
+
+-- Only items of a live order give their stock back when deleted; stock of
+-- cancelled orders is released by the application at cancel time.
+DROP TRIGGER IF EXISTS trg_after_delete_order_item;
+DELIMITER //
+CREATE TRIGGER trg_after_delete_order_item
+AFTER DELETE ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF (SELECT status FROM Orders WHERE order_id = OLD.order_id)
+       IN ('Pending', 'Confirmed', 'Out for Delivery') THEN
+        UPDATE Menu
+        SET stock = stock + OLD.quantity
+        WHERE menu_id = OLD.menu_id;
+    END IF;
+
+    UPDATE Orders
+    SET subtotal_amount = subtotal_amount - OLD.unit_price * OLD.quantity
+    WHERE order_id = OLD.order_id;
+END;
+//
+DELIMITER ;
+
+-- GetOrderTotal (still used by the PlaceOrder procedures) reads the
+-- maintained subtotal instead of joining Menu.
+DROP FUNCTION IF EXISTS GetOrderTotal;
+DELIMITER //
+CREATE FUNCTION GetOrderTotal(p_order_id INT)
+RETURNS DECIMAL(10,2)
+READS SQL DATA
+BEGIN
+    DECLARE total DECIMAL(10,2) DEFAULT 0.00;
+    SELECT subtotal_amount INTO total FROM Orders WHERE order_id = p_order_id;
+    RETURN IFNULL(total, 0.00);
+END;
+//
+DELIMITER ;
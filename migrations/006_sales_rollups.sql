@@ -0,0 +1,259 @@
+-- Pre-aggregated sales rollups for the admin Analytics tab, maintained
+-- incrementally by triggers on Orders and Order_Items so dashboards read a
+-- few rows per day instead of scanning orders.
+--
+-- Sales figures (orders, items sold, revenue at the price paid) exclude
+-- cancelled orders: cancelling an order takes its items back out, and
+-- un-cancelling (ad-hoc SQL) puts them back.  Dates are the order date.
+-- `python analytics.py --backfill` rebuilds every table from the base data.
+
+CREATE TABLE Sales_Daily_Restaurant (
+    sales_date DATE NOT NULL,
+    restaurant_id INT NOT NULL,
+    orders INT NOT NULL DEFAULT 0,
+    items_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (sales_date, restaurant_id)
+);
+
+CREATE TABLE Sales_Daily_Item (
+    sales_date DATE NOT NULL,
+    menu_id INT NOT NULL,
+    restaurant_id INT NOT NULL,
+    items_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (sales_date, menu_id)
+);
+
+-- Orders currently in each status, by order date (the status funnel)
+CREATE TABLE Order_Status_Daily (
+    order_date DATE NOT NULL,
+    status ENUM('Pending', 'Confirmed', 'Out for Delivery', 'Delivered', 'Cancelled') NOT NULL,
+    orders INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (order_date, status)
+);
+
+CREATE TABLE Coupon_Usage_Daily (
+    usage_date DATE NOT NULL,
+    coupon_code VARCHAR(50) NOT NULL,
+    orders INT NOT NULL DEFAULT 0,
+    cancelled INT NOT NULL DEFAULT 0,
+    charged DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (usage_date, coupon_code)
+);
+
+-- Item lines per (order, restaurant), so the item triggers know when an
+-- order's first line of a restaurant arrives or its last one leaves without
+-- rescanning the order (which made a k-line order O(k^2) again).
+CREATE TABLE Order_Restaurant_Lines (
+    order_id INT NOT NULL,
+    restaurant_id INT NOT NULL,
+    line_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (order_id, restaurant_id)
+);
+
+-- Backfill (same statements as analytics.backfill())
+INSERT INTO Sales_Daily_Restaurant (sales_date, restaurant_id, orders, items_sold, revenue)
+SELECT DATE(o.order_date), m.restaurant_id, COUNT(DISTINCT o.order_id),
+       SUM(oi.quantity), SUM(oi.unit_price * oi.quantity)
+FROM Orders o
+JOIN Order_Items oi ON oi.order_id = o.order_id
+JOIN Menu m ON m.menu_id = oi.menu_id
+WHERE o.status <> 'Cancelled'
+GROUP BY DATE(o.order_date), m.restaurant_id;
+
+INSERT INTO Sales_Daily_Item (sales_date, menu_id, restaurant_id, items_sold, revenue)
+SELECT DATE(o.order_date), oi.menu_id, MIN(m.restaurant_id),
+       SUM(oi.quantity), SUM(oi.unit_price * oi.quantity)
+FROM Orders o
+JOIN Order_Items oi ON oi.order_id = o.order_id
+JOIN Menu m ON m.menu_id = oi.menu_id
+WHERE o.status <> 'Cancelled'
+GROUP BY DATE(o.order_date), oi.menu_id;
+
+INSERT INTO Order_Status_Daily (order_date, status, orders)
+SELECT DATE(order_date), status, COUNT(*)
+FROM Orders
+GROUP BY DATE(order_date), status;
+
+INSERT INTO Coupon_Usage_Daily (usage_date, coupon_code, orders, cancelled, charged)
+SELECT DATE(order_date), coupon_code, COUNT(*), SUM(status = 'Cancelled'),
+       SUM(CASE WHEN status <> 'Cancelled' THEN total_amount ELSE 0 END)
+FROM Orders
+WHERE coupon_code IS NOT NULL
+GROUP BY DATE(order_date), coupon_code;
+
+INSERT INTO Order_Restaurant_Lines (order_id, restaurant_id, line_count)
+SELECT oi.order_id, m.restaurant_id, COUNT(*)
+FROM Order_Items oi
+JOIN Menu m ON m.menu_id = oi.menu_id
+GROUP BY oi.order_id, m.restaurant_id;
+
+-- Applies one order item change to the sales rollups.  p_sign is +1 for an
+-- inserted row, -1 for a deleted one and 0 for a quantity/price change; it
+-- is called after the change, so the restaurant's order count moves when
+-- the first item of that restaurant arrives or the last one leaves.  Line
+-- counts are kept for cancelled orders too, in case they are un-cancelled.
+DELIMITER //
+CREATE PROCEDURE ApplyItemSales(IN p_order_id INT, IN p_menu_id INT, IN p_sign INT,
+                                IN p_quantity INT, IN p_amount DECIMAL(14,2))
+proc: BEGIN
+    DECLARE v_day DATE;
+    DECLARE v_status VARCHAR(20);
+    DECLARE v_rid INT;
+    DECLARE v_lines INT DEFAULT 0;
+    DECLARE v_orders INT DEFAULT 0;
+
+    SELECT DATE(order_date), status INTO v_day, v_status FROM Orders WHERE order_id = p_order_id;
+    IF v_day IS NULL THEN
+        LEAVE proc;
+    END IF;
+    SELECT restaurant_id INTO v_rid FROM Menu WHERE menu_id = p_menu_id;
+
+    IF p_sign <> 0 THEN
+        INSERT INTO Order_Restaurant_Lines (order_id, restaurant_id, line_count)
+        VALUES (p_order_id, v_rid, p_sign)
+        ON DUPLICATE KEY UPDATE line_count = line_count + p_sign;
+        SELECT line_count INTO v_lines
+        FROM Order_Restaurant_Lines
+        WHERE order_id = p_order_id AND restaurant_id = v_rid;
+        IF v_lines <= 0 THEN
+            DELETE FROM Order_Restaurant_Lines WHERE order_id = p_order_id AND restaurant_id = v_rid;
+        END IF;
+        SET v_orders = CASE WHEN p_sign > 0 AND v_lines = 1 THEN 1
+                            WHEN p_sign < 0 AND v_lines = 0 THEN -1
+                            ELSE 0 END;
+    END IF;
+    IF v_status = 'Cancelled' THEN
+        LEAVE proc;
+    END IF;
+
+    INSERT INTO Sales_Daily_Restaurant (sales_date, restaurant_id, orders, items_sold, revenue)
+    VALUES (v_day, v_rid, v_orders, p_quantity, p_amount)
+    ON DUPLICATE KEY UPDATE orders = orders + v_orders,
+                            items_sold = items_sold + p_quantity,
+                            revenue = revenue + p_amount;
+
+    INSERT INTO Sales_Daily_Item (sales_date, menu_id, restaurant_id, items_sold, revenue)
+    VALUES (v_day, p_menu_id, v_rid, p_quantity, p_amount)
+    ON DUPLICATE KEY UPDATE items_sold = items_sold + p_quantity,
+                            revenue = revenue + p_amount;
+END;
+//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_rollup_after_insert_order_item
+AFTER INSERT ON Order_Items
+FOR EACH ROW
+BEGIN
+    CALL ApplyItemSales(NEW.order_id, NEW.menu_id, 1, NEW.quantity, NEW.unit_price * NEW.quantity);
+END;
+//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_rollup_after_update_order_item
+AFTER UPDATE ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF OLD.order_id <> NEW.order_id OR OLD.menu_id <> NEW.menu_id THEN
+        CALL ApplyItemSales(OLD.order_id, OLD.menu_id, -1, -OLD.quantity, -OLD.unit_price * OLD.quantity);
+        CALL ApplyItemSales(NEW.order_id, NEW.menu_id, 1, NEW.quantity, NEW.unit_price * NEW.quantity);
+    ELSEIF OLD.quantity <> NEW.quantity OR OLD.unit_price <> NEW.unit_price THEN
+        CALL ApplyItemSales(NEW.order_id, NEW.menu_id, 0, NEW.quantity - OLD.quantity,
+                            NEW.unit_price * NEW.quantity - OLD.unit_price * OLD.quantity);
+    END IF;
+END;
+//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_rollup_after_delete_order_item
+AFTER DELETE ON Order_Items
+FOR EACH ROW
+BEGIN
+    CALL ApplyItemSales(OLD.order_id, OLD.menu_id, -1, -OLD.quantity, -OLD.unit_price * OLD.quantity);
+END;
+//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_rollup_after_insert_order
+AFTER INSERT ON Orders
+FOR EACH ROW
+BEGIN
+    INSERT INTO Order_Status_Daily (order_date, status, orders)
+    VALUES (DATE(NEW.order_date), NEW.status, 1)
+    ON DUPLICATE KEY UPDATE orders = orders + 1;
+
+    IF NEW.coupon_code IS NOT NULL THEN
+        INSERT INTO Coupon_Usage_Daily (usage_date, coupon_code, orders, cancelled, charged)
+        VALUES (DATE(NEW.order_date), NEW.coupon_code, 1, NEW.status = 'Cancelled',
+                IF(NEW.status = 'Cancelled', 0, NEW.total_amount))
+        ON DUPLICATE KEY UPDATE orders = orders + 1,
+                                cancelled = cancelled + (NEW.status = 'Cancelled'),
+                                charged = charged + IF(NEW.status = 'Cancelled', 0, NEW.total_amount);
+    END IF;
+END;
+//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_rollup_after_update_order
+AFTER UPDATE ON Orders
+FOR EACH ROW
+BEGIN
+    DECLARE v_sign INT DEFAULT 0;
+    IF (OLD.status = 'Cancelled') <> (NEW.status = 'Cancelled') THEN
+        SET v_sign = IF(NEW.status = 'Cancelled', -1, 1);
+    END IF;
+
+    IF OLD.status <> NEW.status THEN
+        UPDATE Order_Status_Daily SET orders = orders - 1
+        WHERE order_date = DATE(OLD.order_date) AND status = OLD.status;
+        INSERT INTO Order_Status_Daily (order_date, status, orders)
+        VALUES (DATE(NEW.order_date), NEW.status, 1)
+        ON DUPLICATE KEY UPDATE orders = orders + 1;
+    END IF;
+
+    -- Cancelling takes the order's items out of the sales rollups
+    IF v_sign <> 0 THEN
+        INSERT INTO Sales_Daily_Restaurant (sales_date, restaurant_id, orders, items_sold, revenue)
+        SELECT d.sales_date, d.restaurant_id, d.orders, d.items_sold, d.revenue
+        FROM (
+            SELECT DATE(NEW.order_date) AS sales_date, m.restaurant_id, v_sign AS orders,
+                   v_sign * SUM(oi.quantity) AS items_sold,
+                   v_sign * SUM(oi.unit_price * oi.quantity) AS revenue
+            FROM Order_Items oi JOIN Menu m ON m.menu_id = oi.menu_id
+            WHERE oi.order_id = NEW.order_id
+            GROUP BY m.restaurant_id
+        ) AS d
+        ON DUPLICATE KEY UPDATE orders = Sales_Daily_Restaurant.orders + d.orders,
+                                items_sold = Sales_Daily_Restaurant.items_sold + d.items_sold,
+                                revenue = Sales_Daily_Restaurant.revenue + d.revenue;
+
+        INSERT INTO Sales_Daily_Item (sales_date, menu_id, restaurant_id, items_sold, revenue)
+        SELECT d.sales_date, d.menu_id, d.restaurant_id, d.items_sold, d.revenue
+        FROM (
+            SELECT DATE(NEW.order_date) AS sales_date, oi.menu_id, MIN(m.restaurant_id) AS restaurant_id,
+                   v_sign * SUM(oi.quantity) AS items_sold,
+                   v_sign * SUM(oi.unit_price * oi.quantity) AS revenue
+            FROM Order_Items oi JOIN Menu m ON m.menu_id = oi.menu_id
+            WHERE oi.order_id = NEW.order_id
+            GROUP BY oi.menu_id
+        ) AS d
+        ON DUPLICATE KEY UPDATE items_sold = Sales_Daily_Item.items_sold + d.items_sold,
+                                revenue = Sales_Daily_Item.revenue + d.revenue;
+    END IF;
+
+    IF NEW.coupon_code IS NOT NULL AND (v_sign <> 0 OR OLD.total_amount <> NEW.total_amount) THEN
+        UPDATE Coupon_Usage_Daily
+        SET cancelled = cancelled - v_sign,
+            charged = charged - IF(OLD.status = 'Cancelled', 0, OLD.total_amount)
+                              + IF(NEW.status = 'Cancelled', 0, NEW.total_amount)
+        WHERE usage_date = DATE(NEW.order_date) AND coupon_code = NEW.coupon_code;
+    END IF;
+END;
+//
+DELIMITER ;
@@ -0,0 +1,74 @@
+-- Archive tables for completed orders.  archive.py moves Delivered and
+-- Cancelled orders older than FOOD_ARCHIVE_AFTER_DAYS out of the live
+-- (hot) tables in small batches, so the tables checkout, the status feed
+-- and order history work on stay small.
+--
+-- Hot/archive table pairs rather than PARTITION BY RANGE (order_date):
+-- InnoDB partitioned tables cannot have foreign keys, and order_date is not
+-- part of the primary key.  The archive tables have the same columns (LIKE)
+-- so rows move with INSERT ... SELECT *; keep them in step when a later
+-- migration changes an order table.  Archived orders still reference their
+-- user and menu items, so those cannot be deleted, as before.
+
+CREATE TABLE Orders_Archive LIKE Orders;
+CREATE TABLE Order_Items_Archive LIKE Order_Items;
+CREATE TABLE Payments_Archive LIKE Payments;
+CREATE TABLE Order_Status_History_Archive LIKE Order_Status_History;
+
+-- The archive job's batch query: finished orders older than the cutoff
+CREATE INDEX idx_orders_status_date ON Orders (status, order_date);
+
+ALTER TABLE Orders_Archive
+    ADD CONSTRAINT fk_orders_archive_user FOREIGN KEY (user_id) REFERENCES Users(user_id);
+ALTER TABLE Order_Items_Archive
+    ADD CONSTRAINT fk_order_items_archive_menu FOREIGN KEY (menu_id) REFERENCES Menu(menu_id);
+
+-- archive.py sets @archiving_orders while it deletes the rows it has just
+-- copied: the item delete triggers then skip their per-row work (subtotal
+-- of an order about to be deleted, stock -- finished orders give none back
+-- -- and the sales rollups, which keep counting archived orders).
+DROP TRIGGER IF EXISTS trg_after_delete_order_item;
+DELIMITER //
+CREATE TRIGGER trg_after_delete_order_item
+AFTER DELETE ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF @archiving_orders IS NULL THEN
+        IF (SELECT status FROM Orders WHERE order_id = OLD.order_id)
+           IN ('Pending', 'Confirmed', 'Out for Delivery') THEN
+            UPDATE Menu
+            SET stock = stock + OLD.quantity
+            WHERE menu_id = OLD.menu_id;
+        END IF;
+
+        UPDATE Orders
+        SET subtotal_amount = subtotal_amount - OLD.unit_price * OLD.quantity
+        WHERE order_id = OLD.order_id;
+    END IF;
+END;
+//
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS trg_rollup_after_delete_order_item;
+DELIMITER //
+CREATE TRIGGER trg_rollup_after_delete_order_item
+AFTER DELETE ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF @archiving_orders IS NULL THEN
+        CALL ApplyItemSales(OLD.order_id, OLD.menu_id, -1, -OLD.quantity, -OLD.unit_price * OLD.quantity);
+    END IF;
+END;
+//
+DELIMITER ;
+
+-- Hot + archived rows, for ad-hoc reports (application code uses
+-- orders.union_parts(): MySQL materializes UNION views before joining them).
+CREATE VIEW Orders_All AS
+    SELECT * FROM Orders UNION ALL SELECT * FROM Orders_Archive;
+CREATE VIEW Order_Items_All AS
+    SELECT * FROM Order_Items UNION ALL SELECT * FROM Order_Items_Archive;
+CREATE VIEW Payments_All AS
+    SELECT * FROM Payments UNION ALL SELECT * FROM Payments_Archive;
+CREATE VIEW Order_Status_History_All AS
+    SELECT * FROM Order_Status_History UNION ALL SELECT * FROM Order_Status_History_Archive;
@@ -0,0 +1,332 @@
+"""
+Orders: placement, state changes, order history and the paginated admin listing.
+
+place_order() turns selected cart rows into an order inside one database
+transaction: either the order, its items, its payment and the cart cleanup
+all commit together, or nothing does (no more half-built 'Pending' orders
+with a 0.00 total).  Stock is taken through stock.py (conditional, ordered
+decrements that use the user's checkout holds first) before any order row
+is written, and given back when an order is cancelled.  Delivery partners
+are assigned by the in-memory dispatcher (least active orders first).
+
+Each item stores the price it was ordered at (Order_Items.unit_price); the
+item triggers keep Orders.subtotal_amount as the sum of those, while
+Orders.total_amount is the final charged amount computed by pricing.py
+(the same engine as the cart preview).
+
+Old finished orders are moved to the *_Archive tables by archive.py; the
+read functions here only look at them when asked (include_archived).
+"""
+import pandas as pd
+
+import cart
+from catalog import invalidate_menu
+from db import get_connection
+from dispatcher import dispatcher, ACTIVE_STATUSES
+from errors import ServiceError
+import pricing
+import stock
+
+
+class OrderError(ServiceError):
+    """Order could not be placed (nothing was written)."""
+
+
+def _in_clause(ids):
+    return ",".join(["%s"] * len(ids))
+
+
+def place_order(user_id, cart_ids, payment_method, coupon_code=None):
+    """
+    Place an order for the given cart rows of `user_id` in one transaction.
+
+    Returns a dict with order_id, total (final charged amount) and
+    restaurant_ids (restaurants whose stock changed).  The user's cached
+    cart and those restaurants' cached menus are invalidated.
+    Raises OrderError when none of the cart rows exist any more,
+    stock.OutOfStockError when an item is short, and mysql.connector.Error
+    on database failures; in every case the transaction is rolled back.
+    """
+    cart_ids = [int(c) for c in cart_ids]
+    if not cart_ids:
+        raise OrderError("No items selected.")
+    placeholders = _in_clause(cart_ids)
+
+    delivery_partner_id = dispatcher.assign()
+    placed = False
+    # The partner slot is given back unless the order commits, including
+    # when no connection could be checked out
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                conn.start_transaction()
+
+                # 1) Lock the selected cart rows and read the lines to order.
+                #    Locking Cart keeps a second tab from ordering the same rows.
+                cursor.execute(f"""
+                    SELECT c.menu_id, c.quantity, m.price, m.restaurant_id
+                    FROM Cart c
+                    JOIN Menu m ON c.menu_id = m.menu_id
+                    WHERE c.cart_id IN ({placeholders}) AND c.user_id = %s
+                    ORDER BY c.menu_id
+                    FOR UPDATE OF c
+                """, cart_ids + [user_id])
+                lines = cursor.fetchall()
+                if not lines:
+                    raise OrderError("Selected cart items are no longer in your cart.")
+
+                # 2) Coupon lookup (only when a code was entered)
+                coupon = None
+                if coupon_code:
+                    cursor.execute("""
+                        SELECT discount_percent, max_discount_amount FROM Coupons
+                        WHERE code=%s AND active=TRUE AND (expiry_date IS NULL OR expiry_date >= CURDATE())
+                        LIMIT 1
+                    """, (coupon_code,))
+                    coupon = cursor.fetchone()
+
+                # 3) Take stock (checkout holds first) before any row referencing Menu
+                #    is inserted: the FK checks would otherwise take shared locks on
+                #    the hot Menu rows first and concurrent checkouts could deadlock.
+                quantities = {}
+                for line in lines:
+                    quantities[line['menu_id']] = quantities.get(line['menu_id'], 0) + line['quantity']
+                stock.consume(cursor, user_id, quantities)
+
+                final_total = pricing.price_lines(
+                    ((line['price'], line['quantity']) for line in lines), coupon
+                )["total"]
+
+                # 4) Order row with its delivery partner and final charged amount
+                cursor.execute(
+                    "INSERT INTO Orders (user_id, total_amount, status, delivery_partner_id, coupon_code) "
+                    "VALUES (%s, %s, 'Pending', %s, %s)",
+                    (user_id, final_total, delivery_partner_id, coupon_code if coupon else None)
+                )
+                order_id = cursor.lastrowid
+
+                # 5) All items in one multi-row insert, prices snapshotted; the
+                #    item trigger adds each line to Orders.subtotal_amount
+                cursor.execute(
+                    "INSERT INTO Order_Items (order_id, menu_id, quantity, unit_price) VALUES "
+                    + ",".join(["(%s,%s,%s,%s)"] * len(lines)),
+                    [v for line in lines for v in (order_id, line['menu_id'], line['quantity'], line['price'])]
+                )
+
+                # 6) Payment record
+                cursor.execute(
+                    "INSERT INTO Payments (order_id, amount, method, status, coupon_code) VALUES (%s,%s,%s,%s,%s)",
+                    (order_id, final_total, payment_method, 'Completed', coupon_code if coupon else None)
+                )
+
+                # 7) Remove the ordered cart rows
+                cursor.execute(
+                    f"DELETE FROM Cart WHERE cart_id IN ({placeholders}) AND user_id = %s",
+                    cart_ids + [user_id]
+                )
+
+                conn.commit()
+                placed = True
+            finally:
+                cursor.close()
+    finally:
+        if not placed:
+            dispatcher.release(delivery_partner_id)
+
+    # Cart rows were consumed and stock taken for the ordered menus
+    restaurant_ids = sorted({int(line['restaurant_id']) for line in lines})
+    cart.invalidate(user_id)
+    for rid in restaurant_ids:
+        invalidate_menu(rid, stock_only=True)
+    return {
+        "order_id": order_id,
+        "total": final_total,
+        "restaurant_ids": restaurant_ids,
+    }
+
+
+def set_order_status(order_id, new_status):
+    """
+    Change an order's status (history is logged by trigger).  Cancelling a
+    live order gives its stock back in the same transaction.  Delivered and
+    Cancelled are final: such orders are left unchanged.  When an order
+    stops being active its delivery partner's load drops in the dispatcher.
+    Returns the restaurant ids whose stock changed (their cached menus are
+    invalidated).
+    """
+    restaurant_ids = []
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction()
+            cursor.execute(
+                "SELECT status, delivery_partner_id FROM Orders WHERE order_id=%s FOR UPDATE", (order_id,)
+            )
+            order = cursor.fetchone()
+            if order is None or order['status'] == new_status or order['status'] not in ACTIVE_STATUSES:
+                conn.rollback()
+                return restaurant_ids
+            cursor.execute("UPDATE Orders SET status=%s WHERE order_id=%s", (new_status, order_id))
+            if new_status == 'Cancelled':
+                restaurant_ids = stock.release_order(cursor, order_id)
+            conn.commit()
+        finally:
+            cursor.close()
+
+    if new_status not in ACTIVE_STATUSES:
+        dispatcher.release(order['delivery_partner_id'])
+    for rid in restaurant_ids:
+        invalidate_menu(rid, stock_only=True)
+    return restaurant_ids
+
+
+ORDER_ROWS_SQL = """
+    SELECT
+        o.order_id,
+        o.user_id,
+        o.status,
+        o.subtotal_amount,
+        o.total_amount,
+        o.order_date,
+        u.name AS user_name,
+        d.name AS delivery_partner_name,
+        m.name AS item_name,
+        m.category,
+        r.name AS restaurant_name,
+        r.restaurant_id,
+        oi.quantity,
+        oi.unit_price AS price,
+        (oi.unit_price * oi.quantity) AS total
+    FROM {orders} o
+    JOIN Users u ON o.user_id = u.user_id
+    LEFT JOIN Delivery_Partners d ON o.delivery_partner_id = d.delivery_partner_id
+    JOIN {items} oi ON o.order_id = oi.order_id
+    JOIN Menu m ON oi.menu_id = m.menu_id
+    JOIN Restaurants r ON m.restaurant_id = r.restaurant_id
+"""
+# Order tables of the live data and of archive.py's archive
+HOT_TABLES = {"orders": "Orders", "items": "Order_Items", "payments": "Payments"}
+ARCHIVE_TABLES = {"orders": "Orders_Archive", "items": "Order_Items_Archive", "payments": "Payments_Archive"}
+
+
+def union_parts(sql, params=(), include_archived=False, parts=None, **fmt):
+    """
+    `sql` (with {orders} / {items} / {payments} placeholders, and any `fmt`
+    ones) once per table set -- the live tables, plus the archive tables
+    with `include_archived`, or the given `parts` -- joined with UNION ALL.
+    Each part runs on its own indexes; the *_All views of migration 007
+    would be materialized before joining.  Returns (sql, params for every
+    part); callers append an outer ORDER BY / LIMIT or wrap it in FROM (...).
+    """
+    if parts is None:
+        parts = [HOT_TABLES, ARCHIVE_TABLES] if include_archived else [HOT_TABLES]
+    query = " UNION ALL ".join(f"({sql.format(**tables, **fmt)})" for tables in parts)
+    return query, tuple(params) * len(parts)
+
+
+def _order_rows(parts, user_id=None):
+    where = " WHERE o.user_id=%s" if user_id else ""
+    query, params = union_parts(ORDER_ROWS_SQL + where, (user_id,) if user_id else (), parts=parts)
+    with get_connection() as conn:
+        return pd.read_sql(query + " ORDER BY order_id DESC", conn, params=params or None)
+
+
+def get_order_items(user_id=None, include_archived=False):
+    """
+    All orders (of `user_id` when given), newest first, with user, delivery
+    partner, item and restaurant details; one row per order item.  Only
+    live orders unless `include_archived` (see archive.py).
+    """
+    return _order_rows([HOT_TABLES] + ([ARCHIVE_TABLES] if include_archived else []), user_id)
+
+
+def get_archived_order_items(user_id=None):
+    """Like get_order_items() for archived orders only."""
+    return _order_rows([ARCHIVE_TABLES], user_id)
+
+
+def get_orders_page(statuses=None, date_from=None, date_to=None, restaurant_id=None,
+                    delivery_partner_id=None, before_order_id=None, page_size=20,
+                    include_archived=False):
+    """
+    One page of orders (newest first) with their items, filtered server-side.
+
+    Keyset pagination on order_id: pass the returned `next_before` as
+    `before_order_id` to get the following page.  `date_to` is inclusive.
+    `restaurant_id` matches orders containing at least one item from it.
+    Archived orders are only searched with `include_archived`.
+
+    Returns (DataFrame with one row per order item, next_before or None).
+    """
+    where, params = [], []
+    if statuses:
+        where.append(f"o.status IN ({_in_clause(statuses)})")
+        params.extend(statuses)
+    if date_from is not None:
+        where.append("o.order_date >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        where.append("o.order_date < %s + INTERVAL 1 DAY")
+        params.append(date_to)
+    if delivery_partner_id is not None:
+        where.append("o.delivery_partner_id = %s")
+        params.append(int(delivery_partner_id))
+    if restaurant_id is not None:
+        where.append("""EXISTS (SELECT 1 FROM {items} fi JOIN Menu fm ON fi.menu_id = fm.menu_id
+                                WHERE fi.order_id = o.order_id AND fm.restaurant_id = %s)""")
+        params.append(int(restaurant_id))
+    if before_order_id is not None:
+        where.append("o.order_id < %s")
+        params.append(int(before_order_id))
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+    # The derived table picks page_size + 1 order ids (the extra one tells
+    # whether a next page exists); only those orders are joined.
+    query = f"""
+        SELECT
+            o.order_id,
+            o.user_id,
+            o.status,
+            o.subtotal_amount,
+            o.total_amount,
+            o.order_date,
+            u.name AS user_name,
+            d.name AS delivery_partner_name,
+            m.name AS item_name,
+            m.category,
+            r.name AS restaurant_name,
+            r.restaurant_id,
+            oi.quantity,
+            oi.unit_price AS price,
+            (oi.unit_price * oi.quantity) AS total
+        FROM (
+            SELECT o.order_id FROM {{orders}} o
+            {where_sql}
+            ORDER BY o.order_id DESC
+            LIMIT %s
+        ) page
+        JOIN {{orders}} o ON o.order_id = page.order_id
+        JOIN Users u ON o.user_id = u.user_id
+        LEFT JOIN Delivery_Partners d ON o.delivery_partner_id = d.delivery_partner_id
+        JOIN {{items}} oi ON o.order_id = oi.order_id
+        JOIN Menu m ON oi.menu_id = m.menu_id
+        JOIN Restaurants r ON m.restaurant_id = r.restaurant_id
+        ORDER BY o.order_id DESC, oi.order_item_id
+    """
+    params = tuple(params) + (int(page_size) + 1,)
+    with get_connection() as conn:
+        df = pd.read_sql(query.format(**HOT_TABLES), conn, params=params)
+        if include_archived:
+            # Same page from the archive; the merged list is cut to one page below
+            archived = pd.read_sql(query.format(**ARCHIVE_TABLES), conn, params=params)
+            df = pd.concat([df, archived], ignore_index=True).sort_values(
+                'order_id', ascending=False, kind='stable', ignore_index=True)
+
+    order_ids = list(dict.fromkeys(df['order_id']))
+    next_before = None
+    if len(order_ids) > page_size:
+        order_ids = order_ids[:page_size]
+        next_before = int(order_ids[-1])
+        df = df[df['order_id'].isin(order_ids)]
+    return df, next_before
@@ -0,0 +1,134 @@
+"""
+Pricing engine shared by the cart preview, checkout and batch pricing.
+
+All arithmetic is done in integer paise (1/100 rupee), which is exact for
+DECIMAL(10,2) prices, and each component is rounded half-up to the paisa:
+
+    discount  = min(subtotal * discount_percent / 100, max_discount_amount)
+    after     = max(subtotal - discount, 0)
+    tax       = after * TAX_RATE
+    delivery  = DELIVERY_FEE when the subtotal is positive
+    total     = after + tax + delivery
+
+The same integer code runs on Python ints (one cart) and on numpy arrays
+(price_batch(), many carts in one vectorized pass), so the preview, the
+charged amount and batch results always agree.  Amounts are returned as
+Decimal quantized to 0.01.
+
+A coupon is a mapping with discount_percent and max_discount_amount (a
+Coupons row); coupons.py keeps the in-memory table of active ones.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+
+TAX_RATE = Decimal("0.05")       # 5% tax
+DELIVERY_FEE = Decimal("30.00")  # flat delivery fee
+
+CENT = Decimal("0.01")
+_TAX_BP = int(TAX_RATE * 10000)           # basis points
+_DELIVERY_CENTS = int(DELIVERY_FEE * 100)
+
+
+def to_cents(amount):
+    """Exact paise of a price given as Decimal, str, int or float."""
+    if amount is None:
+        return 0
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents):
+    return (Decimal(int(cents)) / 100).quantize(CENT)
+
+
+def _coupon_terms(coupon):
+    """(percent, cap in paise) of a coupon row; no coupon means no discount."""
+    if not coupon:
+        return 0, 0
+    # A missing cap allows no discount (as checkout always priced it)
+    return int(coupon.get('discount_percent') or 0), to_cents(coupon.get('max_discount_amount'))
+
+
+def _price_cents(subtotal, percent, cap):
+    """
+    Core rules on paise.  Works element-wise when the arguments are numpy
+    int64 arrays; returns (discount, after, tax, delivery, total).
+    """
+    discount = np.minimum((subtotal * percent + 50) // 100, cap)
+    discount = np.where(subtotal > 0, discount, 0)
+    after = np.maximum(subtotal - discount, 0)
+    tax = (after * _TAX_BP + 5000) // 10000
+    delivery = np.where(subtotal > 0, _DELIVERY_CENTS, 0)
+    return discount, after, tax, delivery, after + tax + delivery
+
+
+def subtotal_of(lines):
+    """Paise subtotal of (price, quantity) pairs."""
+    return sum(to_cents(price) * int(quantity) for price, quantity in lines)
+
+
+def price(subtotal, coupon=None):
+    """
+    Breakdown for one cart subtotal (Decimal, str, int or float rupees).
+    Returns a dict of Decimals: subtotal, discount, subtotal_after_coupon,
+    tax, delivery_fee, total.
+    """
+    return _quote(to_cents(subtotal), coupon)
+
+
+def price_lines(lines, coupon=None):
+    """Like price() for the (price, quantity) pairs of a cart, in one pass."""
+    return _quote(subtotal_of(lines), coupon)
+
+
+def _quote(subtotal, coupon):
+    percent, cap = _coupon_terms(coupon)
+    discount, after, tax, delivery, total = _price_cents(subtotal, percent, cap)
+    return {
+        "subtotal": from_cents(subtotal),
+        "discount": from_cents(discount),
+        "subtotal_after_coupon": from_cents(after),
+        "tax": from_cents(tax),
+        "delivery_fee": from_cents(delivery),
+        "total": from_cents(total),
+    }
+
+
+def price_batch(lines, coupons=None, key="cart", coupon_column="coupon_code"):
+    """
+    Price many carts at once.  `lines` is a DataFrame with one row per cart
+    line: `key` (cart identifier), price, quantity and optionally
+    `coupon_column` (the code entered for that cart; the first per cart is
+    used).  `coupons` maps code -> coupon row; unknown codes get no discount.
+
+    Returns a DataFrame indexed by `key` with columns coupon_code (the code
+    applied, or None), subtotal, discount, subtotal_after_coupon, tax,
+    delivery_fee and total (Decimal).
+    """
+    columns = ["subtotal", "discount", "subtotal_after_coupon", "tax", "delivery_fee", "total"]
+    if lines.empty:
+        return pd.DataFrame(columns=["coupon_code"] + columns, index=pd.Index([], name=key))
+
+    cents = lines["price"].map(to_cents).to_numpy(dtype=np.int64)
+    amounts = pd.Series(cents * lines["quantity"].to_numpy(dtype=np.int64), index=lines.index)
+    grouped = amounts.groupby(lines[key], sort=True)
+    subtotal = grouped.sum()
+
+    if coupon_column in lines:
+        codes = lines[coupon_column].groupby(lines[key], sort=True).first().reindex(subtotal.index)
+    else:
+        codes = pd.Series(None, index=subtotal.index, dtype=object)
+    coupons = coupons or {}
+    codes = pd.Series([code if code in coupons else None for code in codes], index=subtotal.index, dtype=object)
+    terms = [_coupon_terms(coupons.get(code)) for code in codes]
+    percent = np.array([t[0] for t in terms], dtype=np.int64)
+    cap = np.array([t[1] for t in terms], dtype=np.int64)
+
+    results = _price_cents(subtotal.to_numpy(dtype=np.int64), percent, cap)
+    out = pd.DataFrame({"coupon_code": codes}, index=subtotal.index)
+    for name, values in zip(columns, (subtotal.to_numpy(),) + results):
+        out[name] = [from_cents(v) for v in values]
+    return out
@@ -0,0 +1,409 @@
+"""
+Query instrumentation: latency, rows and pool wait of every database call.
+
+db.get_connection() hands out an InstrumentedConnection whose cursors time
+execute / executemany / callproc and the fetches that follow, so service
+code and pd.read_sql(sql, conn) are measured without changes.  Each
+statement is recorded once (when the cursor runs its next statement or is
+closed) under its fingerprint: the SQL with literals replaced by ?, IN
+lists collapsed and whitespace normalised.
+
+Per fingerprint: count, errors, total / max seconds, rows and a latency
+histogram (BUCKETS).  Pool checkout waits get their own histogram.
+Statements are also attributed to the page being rendered:
+
+    with querystats.page_render("Cart"):
+        show_cart()
+
+Statements slower than FOOD_SLOW_QUERY_MS (default 200) are kept in a
+short slow-query log.  When FOOD_METRICS_FILE is set, the Prometheus text
+format (render_prometheus()) is written there every FOOD_METRICS_INTERVAL
+seconds (default 15).
+"""
+import contextvars
+import functools
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+SLOW_QUERY_SECONDS = _env_float("FOOD_SLOW_QUERY_MS", 200) / 1000.0
+SLOW_LOG_SIZE = 100
+METRICS_FILE = os.environ.get("FOOD_METRICS_FILE")
+METRICS_INTERVAL = _env_float("FOOD_METRICS_INTERVAL", 15)
+MAX_FINGERPRINTS = 2000
+
+_current_page = contextvars.ContextVar("querystats_page", default=None)
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_RE = re.compile(r"\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+",
+                        re.IGNORECASE)
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Normalised form of a statement used as its metrics key."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    text = _COMMENT_RE.sub(" ", sql)
+    text = _STRING_RE.sub("?", text)
+    text = text.replace("%s", "?")
+    text = _NUMBER_RE.sub("?", text)
+    text = " ".join(text.split())
+    text = _IN_LIST_RE.sub("IN (...)", text)
+    text = _VALUES_RE.sub(r"VALUES \1, ...", text)
+    return text
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (seconds)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class QueryStats:
+    """Thread-safe registry of per-fingerprint and per-page measurements."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queries = {}        # fingerprint -> {"hist", "errors", "rows"}
+            self.pages = {}          # page -> {"renders", "queries", "db_seconds", "seconds", "max_queries"}
+            self.acquire = _Histogram()
+            self.slow = deque(maxlen=SLOW_LOG_SIZE)
+            self.started = time.time()
+
+    def record(self, sql, seconds, rows, error=False):
+        fp = fingerprint(sql)
+        page = _current_page.get()
+        with self._lock:
+            entry = self.queries.get(fp)
+            if entry is None:
+                if len(self.queries) >= MAX_FINGERPRINTS:
+                    fp = "(other)"
+                entry = self.queries.setdefault(fp, {"hist": _Histogram(), "errors": 0, "rows": 0})
+            entry["hist"].observe(seconds)
+            entry["rows"] += max(rows, 0)
+            entry["errors"] += bool(error)
+            if seconds >= SLOW_QUERY_SECONDS:
+                self.slow.append({
+                    "at": time.time(), "seconds": seconds, "rows": rows,
+                    "page": page["name"] if page else None, "fingerprint": fp,
+                })
+        if page is not None:
+            page["queries"] += 1
+            page["db_seconds"] += seconds
+
+    def record_acquire(self, seconds):
+        with self._lock:
+            self.acquire.observe(seconds)
+
+    def _finish_render(self, render, seconds):
+        with self._lock:
+            page = self.pages.setdefault(render["name"], {
+                "renders": 0, "queries": 0, "db_seconds": 0.0, "seconds": 0.0, "max_queries": 0,
+            })
+            page["renders"] += 1
+            page["queries"] += render["queries"]
+            page["db_seconds"] += render["db_seconds"]
+            page["seconds"] += seconds
+            page["max_queries"] = max(page["max_queries"], render["queries"])
+
+    # -- reports ---------------------------------------------------------
+    def query_rows(self):
+        """One dict per fingerprint, slowest total time first (times in ms)."""
+        with self._lock:
+            items = [(fp, e["hist"], e["errors"], e["rows"]) for fp, e in self.queries.items()]
+            rows = []
+            for fp, hist, errors, nrows in items:
+                rows.append({
+                    "fingerprint": fp,
+                    "count": hist.count,
+                    "errors": errors,
+                    "total_ms": hist.total * 1000.0,
+                    "avg_ms": hist.total / hist.count * 1000.0 if hist.count else 0.0,
+                    "p50_ms": hist.quantile(0.5) * 1000.0,
+                    "p95_ms": hist.quantile(0.95) * 1000.0,
+                    "max_ms": hist.max * 1000.0,
+                    "avg_rows": nrows / hist.count if hist.count else 0.0,
+                })
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def page_rows(self):
+        with self._lock:
+            rows = []
+            for name, p in self.pages.items():
+                renders = p["renders"] or 1
+                rows.append({
+                    "page": name,
+                    "renders": p["renders"],
+                    "avg_queries": p["queries"] / renders,
+                    "max_queries": p["max_queries"],
+                    "avg_db_ms": p["db_seconds"] / renders * 1000.0,
+                    "avg_render_ms": p["seconds"] / renders * 1000.0,
+                })
+        return sorted(rows, key=lambda r: r["page"])
+
+    def acquire_summary(self):
+        with self._lock:
+            h = self.acquire
+            return {
+                "checkouts": h.count,
+                "avg_ms": h.total / h.count * 1000.0 if h.count else 0.0,
+                "p95_ms": h.quantile(0.95) * 1000.0,
+                "max_ms": h.max * 1000.0,
+            }
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self.slow))
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP food_db_query_duration_seconds Database statement latency by fingerprint.",
+            "# TYPE food_db_query_duration_seconds histogram",
+        ]
+        with self._lock:
+            for fp, e in sorted(self.queries.items()):
+                label = 'fingerprint="%s"' % _escape(fp)
+                lines.extend(_histogram_lines("food_db_query_duration_seconds", label, e["hist"]))
+            lines.append("# HELP food_db_query_rows_total Rows returned or affected by fingerprint.")
+            lines.append("# TYPE food_db_query_rows_total counter")
+            for fp, e in sorted(self.queries.items()):
+                lines.append('food_db_query_rows_total{fingerprint="%s"} %d' % (_escape(fp), e["rows"]))
+            lines.append("# HELP food_db_query_errors_total Failed statements by fingerprint.")
+            lines.append("# TYPE food_db_query_errors_total counter")
+            for fp, e in sorted(self.queries.items()):
+                lines.append('food_db_query_errors_total{fingerprint="%s"} %d' % (_escape(fp), e["errors"]))
+            lines.append("# HELP food_db_pool_acquire_seconds Time to check a connection out of the pool.")
+            lines.append("# TYPE food_db_pool_acquire_seconds histogram")
+            lines.extend(_histogram_lines("food_db_pool_acquire_seconds", "", self.acquire))
+            lines.append("# HELP food_page_renders_total Page renders by page.")
+            lines.append("# TYPE food_page_renders_total counter")
+            for name, p in sorted(self.pages.items()):
+                lines.append('food_page_renders_total{page="%s"} %d' % (_escape(name), p["renders"]))
+            lines.append("# HELP food_page_queries_total Statements issued while rendering a page.")
+            lines.append("# TYPE food_page_queries_total counter")
+            for name, p in sorted(self.pages.items()):
+                lines.append('food_page_queries_total{page="%s"} %d' % (_escape(name), p["queries"]))
+            lines.append("# HELP food_page_db_seconds_total Database time spent rendering a page.")
+            lines.append("# TYPE food_page_db_seconds_total counter")
+            for name, p in sorted(self.pages.items()):
+                lines.append('food_page_db_seconds_total{page="%s"} %.6f' % (_escape(name), p["db_seconds"]))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write render_prometheus() to `path` atomically."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", " ").replace('"', '\\"')
+
+
+def _histogram_lines(name, labels, hist):
+    sep = "," if labels else ""
+    lines, cumulative = [], 0
+    for bound, n in zip(BUCKETS, hist.counts):
+        cumulative += n
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append('%s_bucket{%s%sle="%s"} %d' % (name, labels, sep, le, cumulative))
+    braces = "{%s}" % labels if labels else ""
+    lines.append("%s_sum%s %.6f" % (name, braces, hist.total))
+    lines.append("%s_count%s %d" % (name, braces, hist.count))
+    return lines
+
+
+# Process-wide registry
+stats = QueryStats()
+
+
+@contextmanager
+def page_render(name):
+    """Attribute statements issued inside the block to page `name`."""
+    render = {"name": name, "queries": 0, "db_seconds": 0.0}
+    token = _current_page.set(render)
+    started = time.perf_counter()
+    try:
+        yield render
+    finally:
+        _current_page.reset(token)
+        stats._finish_render(render, time.perf_counter() - started)
+
+
+# --------------------------
+# CONNECTION / CURSOR PROXIES
+# --------------------------
+class TimedCursor:
+    """Cursor proxy that times each statement including its fetches."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._sql = None
+        self._elapsed = 0.0
+        self._rows = 0
+        self._error = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _finish(self):
+        if self._sql is not None:
+            stats.record(self._sql, self._elapsed, self._rows, self._error)
+            self._sql = None
+
+    def _run(self, sql, fn, *args, **kwargs):
+        self._finish()
+        self._sql, self._elapsed, self._rows, self._error = sql, 0.0, 0, False
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._error = True
+            self._elapsed += time.perf_counter() - started
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - started
+        # writes report affected rows; SELECT rows are counted as fetched
+        if not getattr(self._cursor, "with_rows", False):
+            self._rows = max(getattr(self._cursor, "rowcount", 0) or 0, 0)
+        return result
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._run(operation, self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._run(operation, self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def callproc(self, procname, args=()):
+        return self._run(f"CALL {procname}", self._cursor.callproc, procname, args)
+
+    def _fetch(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            result = fn(*args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+        return result
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(self._cursor.fetchmany, *(() if size is None else (size,)))
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        return rows
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are TimedCursors."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursors = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = TimedCursor(self._conn.cursor(*args, **kwargs))
+        self._cursors.append(cursor)
+        return cursor
+
+    def finish(self):
+        """Record statements of cursors that were never closed."""
+        for cursor in self._cursors:
+            cursor._finish()
+        self._cursors = []
+
+
+_dumper = None
+_dumper_lock = threading.Lock()
+
+
+def start_dumper(path=METRICS_FILE, interval=METRICS_INTERVAL):
+    """Write the Prometheus dump to `path` every `interval` seconds (daemon thread)."""
+    global _dumper
+    if not path:
+        return
+    with _dumper_lock:
+        if _dumper is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    stats.write_prometheus(path)
+                except OSError:
+                    pass
+
+        _dumper = threading.Thread(target=run, name="querystats-dump", daemon=True)
+        _dumper.start()
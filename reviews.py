@@ -0,0 +1,34 @@
+"""
+Restaurant reviews (written through the AddReview stored procedure).
+"""
+import mysql.connector
+
+from catalog import invalidate_reviews
+from db import get_connection
+from errors import ER_NO_REFERENCED_ROW, NotFoundError, ValidationError
+
+MAX_COMMENT_LENGTH = 500
+
+
+def submit_review(user_id, restaurant_id, rating, comment):
+    """
+    Add a review.  Raises ValidationError for a rating outside 1..5 or an
+    over-long comment and NotFoundError when the restaurant is gone.
+    """
+    rating = int(rating)
+    if not 1 <= rating <= 5:
+        raise ValidationError("Rating must be between 1 and 5.")
+    if comment and len(comment) > MAX_COMMENT_LENGTH:
+        raise ValidationError(f"Comments are limited to {MAX_COMMENT_LENGTH} characters.")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.callproc('AddReview', [user_id, restaurant_id, rating, comment])
+            conn.commit()
+        except mysql.connector.IntegrityError as e:
+            if e.errno == ER_NO_REFERENCED_ROW:
+                raise NotFoundError("This restaurant no longer exists.") from e
+            raise
+        finally:
+            cursor.close()
+    invalidate_reviews(restaurant_id)
@@ -0,0 +1,373 @@
+"""
+Dish search over an in-memory inverted index.
+
+Every menu item is indexed under the words of its name, its category and
+its restaurant's name (weighted 3 / 2 / 1).  A query matches items that
+contain all of its words, where a word matches
+
+    exactly                     "pizza"    -> pizza
+    as a prefix (last word)     "marg"     -> margherita
+    with one typo (4+ letters)  "panner"   -> paneer
+
+and results are filtered by price range, stock and optionally restaurant /
+category, best match first.  Prefixes come from a sorted vocabulary
+(bisect) and typos from a deletion index (every word with one letter
+removed), so a query touches only the postings of the words it matches and
+answers in milliseconds over hundreds of thousands of items.
+
+The index is built from one streamed query on first use and kept current
+incrementally: catalog.invalidate_menu() / invalidate_restaurant() mark a
+restaurant dirty and its items are re-read before the next search (stock
+changes from orders at most every STOCK_REFRESH_INTERVAL seconds).  Edits
+made by other processes are picked up by a background rebuild every
+REBUILD_INTERVAL seconds.  The in-stock filter is advisory; checkout
+re-checks stock.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+
+from db import get_connection
+
+NAME_WEIGHT, CATEGORY_WEIGHT, RESTAURANT_WEIGHT = 3, 2, 1
+EXACT, PREFIX, TYPO = 1.0, 0.7, 0.4      # match quality multipliers
+MIN_TYPO_LENGTH = 4
+MAX_PREFIX_EXPANSION = 200               # vocabulary words tried for one prefix
+DEFAULT_LIMIT = 50
+BUILD_BATCH = 10000
+REBUILD_INTERVAL = 600.0
+STOCK_REFRESH_INTERVAL = 10.0
+UNCATEGORIZED = "Uncategorized"          # category label of items without one
+
+ITEMS_SQL = """
+    SELECT m.menu_id, m.restaurant_id, m.name, m.category, m.price, m.stock,
+           r.name AS restaurant_name
+    FROM Menu m
+    JOIN Restaurants r ON r.restaurant_id = m.restaurant_id
+    {where}
+"""
+STOCK_SQL = "SELECT menu_id, stock FROM Menu WHERE restaurant_id IN ({})"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lower-cased, accent-free words of `text`."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return _WORD_RE.findall(text.lower())
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a, b):
+    """True when a and b differ by at most one insert, delete, substitution or swap."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class _Item:
+    __slots__ = ("menu_id", "restaurant_id", "name", "category", "price", "stock", "restaurant_name", "words")
+
+    def __init__(self, row):
+        self.menu_id = int(row["menu_id"])
+        self.restaurant_id = int(row["restaurant_id"])
+        self.name = row["name"]
+        self.category = row["category"] or UNCATEGORIZED
+        self.price = float(row["price"] or 0)
+        self.stock = int(row["stock"] or 0)
+        self.restaurant_name = row["restaurant_name"]
+        words = {}
+        for weight, text in ((RESTAURANT_WEIGHT, self.restaurant_name),
+                             (CATEGORY_WEIGHT, self.category), (NAME_WEIGHT, self.name)):
+            for word in tokenize(text):
+                words[word] = max(words.get(word, 0), weight)
+        self.words = words
+
+    def as_dict(self, score):
+        return {
+            "menu_id": self.menu_id, "restaurant_id": self.restaurant_id,
+            "restaurant_name": self.restaurant_name, "name": self.name,
+            "category": self.category, "price": self.price, "stock": self.stock,
+            "score": round(score, 3),
+        }
+
+
+class SearchIndex:
+    """Inverted index of menu items; see the module docstring."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.built_at = None
+        self._rebuilding = False
+        self._dirty = set()          # restaurants whose items must be re-read
+        self._stock_dirty = set()    # restaurants whose stock changed
+        self._stock_refreshed = 0.0
+        self._reloaded_at = {}       # restaurant_id -> when reload_restaurants() last ran
+
+    def _reset(self):
+        self._items = {}             # menu_id -> _Item
+        self._postings = {}          # word -> {menu_id: weight}
+        self._by_restaurant = {}     # restaurant_id -> {menu_id}
+        self._deletion = {}          # word minus one letter -> {word}
+        self._vocab = []             # sorted words (rebuilt lazily)
+        self._vocab_stale = False
+
+    # -- maintenance -----------------------------------------------------
+    def _add(self, item):
+        self._items[item.menu_id] = item
+        self._by_restaurant.setdefault(item.restaurant_id, set()).add(item.menu_id)
+        for word, weight in item.words.items():
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = {}
+                self._vocab_stale = True
+                if len(word) >= MIN_TYPO_LENGTH:
+                    for variant in _deletes(word):
+                        self._deletion.setdefault(variant, set()).add(word)
+            posting[item.menu_id] = weight
+
+    def _remove(self, menu_id):
+        item = self._items.pop(menu_id, None)
+        if item is None:
+            return
+        self._by_restaurant.get(item.restaurant_id, set()).discard(menu_id)
+        for word in item.words:
+            posting = self._postings.get(word)
+            if posting is None:
+                continue
+            posting.pop(menu_id, None)
+            if not posting:
+                del self._postings[word]
+                self._vocab_stale = True
+                if len(word) >= MIN_TYPO_LENGTH:
+                    for variant in _deletes(word):
+                        words = self._deletion.get(variant)
+                        if words is not None:
+                            words.discard(word)
+                            if not words:
+                                del self._deletion[variant]
+
+    def build(self):
+        """(Re)build the whole index from the database."""
+        started = time.monotonic()
+        fresh = SearchIndex()
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(ITEMS_SQL.format(where=""))
+                while True:
+                    rows = cursor.fetchmany(BUILD_BATCH)
+                    if not rows:
+                        break
+                    for row in rows:
+                        fresh._add(_Item(row))
+            finally:
+                cursor.close()
+        with self._lock:
+            self._items, self._postings = fresh._items, fresh._postings
+            self._by_restaurant, self._deletion = fresh._by_restaurant, fresh._deletion
+            self._vocab, self._vocab_stale = [], True
+            self.built_at = time.monotonic()
+            # Restaurants reloaded while the build was reading are newer than it
+            self._dirty.update(rid for rid, at in self._reloaded_at.items() if at >= started)
+            self._reloaded_at = {}
+
+    def mark_dirty(self, restaurant_id, stock_only=False):
+        """Re-read a restaurant's items (or only their stock) before the next search."""
+        with self._lock:
+            (self._stock_dirty if stock_only else self._dirty).add(int(restaurant_id))
+
+    def reload_restaurants(self, restaurant_ids):
+        """Replace the indexed items of these restaurants with the current rows."""
+        ids = [int(r) for r in restaurant_ids]
+        if not ids:
+            return
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(ITEMS_SQL.format(where=f"WHERE m.restaurant_id IN ({','.join(['%s'] * len(ids))})"),
+                               ids)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        with self._lock:
+            now = time.monotonic()
+            for rid in ids:
+                self._reloaded_at[rid] = now
+                for menu_id in list(self._by_restaurant.pop(rid, ())):
+                    self._remove(menu_id)
+            for row in rows:
+                self._add(_Item(row))
+
+    def _refresh_stock(self, restaurant_ids):
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(STOCK_SQL.format(",".join(["%s"] * len(restaurant_ids))), list(restaurant_ids))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        with self._lock:
+            for menu_id, stock in rows:
+                item = self._items.get(menu_id)
+                if item is not None:
+                    item.stock = int(stock or 0)
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                self.build()
+            finally:
+                self._rebuilding = False
+
+        self._rebuilding = True
+        threading.Thread(target=run, name="search-rebuild", daemon=True).start()
+
+    def ensure_current(self):
+        """Build on first use, then apply pending restaurant / stock changes."""
+        if self.built_at is None:
+            with self._lock:
+                if self.built_at is None:
+                    self.build()
+        elif time.monotonic() - self.built_at > REBUILD_INTERVAL and not self._rebuilding:
+            self._rebuild_in_background()
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            now = time.monotonic()
+            stock = set()
+            if self._stock_dirty and now - self._stock_refreshed >= STOCK_REFRESH_INTERVAL:
+                stock, self._stock_dirty = self._stock_dirty - dirty, set()
+                self._stock_refreshed = now
+        if dirty:
+            self.reload_restaurants(dirty)
+        if stock:
+            self._refresh_stock(stock)
+
+    # -- queries ---------------------------------------------------------
+    def _words_for(self, term, prefix):
+        """[(word, quality)] of vocabulary words matching one query term."""
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT
+        if prefix:
+            if self._vocab_stale:
+                self._vocab = sorted(self._postings)
+                self._vocab_stale = False
+            start = bisect.bisect_left(self._vocab, term)
+            for word in self._vocab[start:start + MAX_PREFIX_EXPANSION]:
+                if not word.startswith(term):
+                    break
+                matches.setdefault(word, PREFIX)
+        if len(term) >= MIN_TYPO_LENGTH:
+            candidates = set(self._deletion.get(term, ()))
+            for variant in _deletes(term):
+                candidates |= self._deletion.get(variant, set())
+                if variant in self._postings:
+                    candidates.add(variant)
+            for word in candidates:
+                if word not in matches and _within_one_edit(term, word):
+                    matches[word] = TYPO
+        return list(matches.items())
+
+    def search(self, query, min_price=None, max_price=None, in_stock=False,
+               restaurant_id=None, categories=None, limit=DEFAULT_LIMIT):
+        """
+        Items matching every word of `query`, best first, as dicts (menu_id,
+        restaurant_id, restaurant_name, name, category, price, stock, score).
+        The last word also matches as a prefix unless the query ends in a space.
+        """
+        self.ensure_current()
+        query = query or ""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        prefix_last = not query.endswith(" ")
+        categories = set(categories or ())
+
+        with self._lock:
+            per_term = []
+            for term in dict.fromkeys(terms):
+                words = self._words_for(term, prefix_last and term == terms[-1])
+                if not words:
+                    return []
+                postings = [(self._postings[w], q) for w, q in words]
+                keys = postings[0][0].keys() if len(postings) == 1 else set().union(*(p for p, _ in postings))
+                per_term.append((keys, postings))
+
+            # Intersect the id sets (C speed, smallest first), then filter and
+            # score only the survivors.
+            key_sets = sorted((keys for keys, _ in per_term), key=len)
+            if restaurant_id is not None:
+                key_sets.insert(0, self._by_restaurant.get(int(restaurant_id), set()))
+            candidates = set(key_sets[0])
+            for keys in key_sets[1:]:
+                candidates &= keys
+                if not candidates:
+                    return []
+
+            if min_price is not None or max_price is not None or in_stock or categories:
+                items = self._items
+                candidates = {
+                    menu_id for menu_id in candidates
+                    if (min_price is None or items[menu_id].price >= min_price)
+                    and (max_price is None or items[menu_id].price <= max_price)
+                    and (not in_stock or items[menu_id].stock > 0)
+                    and (not categories or items[menu_id].category in categories)
+                }
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for _, postings in per_term:
+                best = {}
+                for posting, quality in postings:
+                    for menu_id in candidates & posting.keys():
+                        score = posting[menu_id] * quality
+                        if score > best.get(menu_id, 0):
+                            best[menu_id] = score
+                for menu_id, score in best.items():
+                    scores[menu_id] += score
+            results = [(score, -self._items[menu_id].price, menu_id) for menu_id, score in scores.items()]
+            best = heapq.nlargest(limit, results)
+            return [self._items[menu_id].as_dict(score) for score, _, menu_id in best]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "words": len(self._postings),
+                "restaurants": len(self._by_restaurant),
+                "age_s": round(time.monotonic() - self.built_at, 1) if self.built_at else None,
+                "pending_restaurants": len(self._dirty),
+                "pending_stock": len(self._stock_dirty),
+            }
+
+
+# Process-wide index
+menu_index = SearchIndex()
+
+
+def search_menu(query, **filters):
+    """menu_index.search(); see SearchIndex.search for the filters."""
+    return menu_index.search(query, **filters)
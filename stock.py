@@ -0,0 +1,242 @@
+"""
+Stock reservation for checkout.
+
+Menu.stock is the stock still available to order.  It only ever changes
+through this module:
+
+- adjust(): conditional atomic decrement (stock >= qty) for all items of
+  an order in ONE statement.  Rows are touched in ascending menu_id order,
+  so concurrent checkouts lock hot Menu rows in the same order and cannot
+  deadlock each other.  If any item is short nothing is changed and
+  OutOfStockError is raised before the order is written.
+- hold(): short-lived reservations while items sit in checkout (selected
+  in the cart).  Held stock is taken out of Menu.stock and tracked in
+  Stock_Reservations until it is consumed by place_order, released, or it
+  expires (release_expired()).
+- release_order(): gives an order's stock back when it is cancelled.
+
+Functions taking a `cursor` run inside the caller's transaction and expect
+a dictionary cursor; the others manage their own pooled connection.
+"""
+import threading
+import time
+
+from db import get_connection
+from errors import ServiceError
+
+RESERVATION_TTL = 600        # seconds a checkout hold lives
+SWEEP_INTERVAL = 30          # min seconds between expired-hold sweeps per process
+SWEEP_BATCH = 500
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+class OutOfStockError(ServiceError):
+    """One or more items do not have enough stock; nothing was changed."""
+
+    def __init__(self, items):
+        # items: list of dicts with menu_id, name, requested, available
+        self.items = items
+        names = ", ".join(f"{i['name']} (only {max(i['available'], 0)} left)" for i in items)
+        super().__init__(f"Insufficient stock: {names}" if names else "Insufficient stock")
+
+
+def _in_clause(ids):
+    return ",".join(["%s"] * len(ids))
+
+
+def _normalize(quantities, signed=False):
+    """{menu_id: qty} -> [(menu_id, qty)] sorted by menu_id; drops 0 (and negative unless signed)."""
+    merged = {}
+    for menu_id, qty in quantities.items():
+        merged[int(menu_id)] = merged.get(int(menu_id), 0) + int(qty)
+    return sorted((m, q) for m, q in merged.items() if q > 0 or (signed and q < 0))
+
+
+def _case(items):
+    """CASE menu_id WHEN .. THEN .. END fragment and its params."""
+    sql = "CASE menu_id " + " ".join(["WHEN %s THEN %s"] * len(items)) + " END"
+    params = [v for item in items for v in item]
+    return sql, params
+
+
+# --------------------------
+# STOCK ADJUSTMENTS (in caller's transaction)
+# --------------------------
+def adjust(cursor, deltas):
+    """
+    Apply stock deltas ({menu_id: qty}; positive takes stock, negative gives
+    it back) in one statement, all or nothing.  Raises OutOfStockError (the
+    caller must roll back) if any item is short.
+    """
+    items = _normalize(deltas, signed=True)
+    if not items:
+        return
+    case_sql, case_params = _case(items)
+    ids = [m for m, _ in items]
+    cursor.execute(
+        f"UPDATE Menu SET stock = stock - {case_sql} "
+        f"WHERE menu_id IN ({_in_clause(ids)}) AND stock >= {case_sql}",
+        case_params + ids + case_params
+    )
+    if cursor.rowcount != len(items):
+        raise OutOfStockError(_shortages(cursor, [(m, q) for m, q in items if q > 0]))
+
+
+def increment(cursor, quantities):
+    """Put `quantities` ({menu_id: qty}) back into stock."""
+    items = _normalize(quantities)
+    if not items:
+        return
+    case_sql, case_params = _case(items)
+    ids = [m for m, _ in items]
+    cursor.execute(
+        f"UPDATE Menu SET stock = stock + {case_sql} WHERE menu_id IN ({_in_clause(ids)})",
+        case_params + ids
+    )
+
+
+def _shortages(cursor, items):
+    wanted = dict(items)
+    cursor.execute(
+        f"SELECT menu_id, name, stock FROM Menu WHERE menu_id IN ({_in_clause(list(wanted))})",
+        list(wanted)
+    )
+    short = []
+    for row in cursor.fetchall():
+        stock = int(row['stock'] or 0)
+        if stock < wanted[row['menu_id']]:
+            short.append({"menu_id": row['menu_id'], "name": row['name'],
+                          "requested": wanted[row['menu_id']], "available": stock})
+    return short
+
+
+def consume(cursor, user_id, quantities):
+    """
+    Take stock for an order being placed by `user_id`: the user's checkout
+    holds on these items are used first, the rest is decremented now.
+    """
+    items = _normalize(quantities)
+    if not items:
+        return
+    ids = [m for m, _ in items]
+    cursor.execute(
+        f"SELECT menu_id, quantity FROM Stock_Reservations "
+        f"WHERE user_id = %s AND menu_id IN ({_in_clause(ids)}) ORDER BY menu_id FOR UPDATE",
+        [user_id] + ids
+    )
+    held = {row['menu_id']: int(row['quantity']) for row in cursor.fetchall()}
+
+    # take what is not held yet, give back holds larger than the order
+    adjust(cursor, {m: q - held.get(m, 0) for m, q in items})
+    if held:
+        cursor.execute(
+            f"DELETE FROM Stock_Reservations WHERE user_id = %s AND menu_id IN ({_in_clause(list(held))})",
+            [user_id] + list(held)
+        )
+
+
+def release_order(cursor, order_id):
+    """Return an order's items to stock. Returns the affected restaurant ids."""
+    cursor.execute("""
+        SELECT oi.menu_id, SUM(oi.quantity) AS quantity, m.restaurant_id
+        FROM Order_Items oi
+        JOIN Menu m ON oi.menu_id = m.menu_id
+        WHERE oi.order_id = %s
+        GROUP BY oi.menu_id, m.restaurant_id
+    """, (order_id,))
+    rows = cursor.fetchall()
+    increment(cursor, {row['menu_id']: row['quantity'] for row in rows})
+    return sorted({int(row['restaurant_id']) for row in rows})
+
+
+# --------------------------
+# CHECKOUT HOLDS
+# --------------------------
+def hold(user_id, quantities, ttl=RESERVATION_TTL):
+    """
+    Make the user's checkout holds exactly `quantities` ({menu_id: qty}):
+    new or larger holds take stock, smaller or dropped ones give it back,
+    and every remaining hold is extended by `ttl` seconds.
+    Returns the menu_ids whose stock changed.  Raises OutOfStockError
+    (nothing changed) when an item cannot be held.
+    """
+    release_expired()
+    wanted = dict(_normalize(quantities))
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction()
+            cursor.execute(
+                "SELECT menu_id, quantity FROM Stock_Reservations WHERE user_id = %s ORDER BY menu_id FOR UPDATE",
+                (user_id,)
+            )
+            held = {row['menu_id']: int(row['quantity']) for row in cursor.fetchall()}
+
+            deltas = {m: wanted.get(m, 0) - held.get(m, 0) for m in set(wanted) | set(held)}
+            deltas = {m: d for m, d in deltas.items() if d}
+            adjust(cursor, deltas)
+
+            dropped = [m for m in held if m not in wanted]
+            if dropped:
+                cursor.execute(
+                    f"DELETE FROM Stock_Reservations WHERE user_id = %s AND menu_id IN ({_in_clause(dropped)})",
+                    [user_id] + dropped
+                )
+            if wanted:
+                cursor.execute(
+                    "INSERT INTO Stock_Reservations (user_id, menu_id, quantity, expires_at) VALUES "
+                    + ",".join(["(%s, %s, %s, NOW() + INTERVAL %s SECOND)"] * len(wanted))
+                    + " ON DUPLICATE KEY UPDATE quantity = VALUES(quantity), expires_at = VALUES(expires_at)",
+                    [v for m, q in sorted(wanted.items()) for v in (user_id, m, q, int(ttl))]
+                )
+            conn.commit()
+        finally:
+            cursor.close()
+    return sorted(deltas)
+
+
+def release(user_id):
+    """Drop all of the user's checkout holds. Returns the menu_ids released."""
+    return hold(user_id, {})
+
+
+def release_expired(force=False, batch=SWEEP_BATCH):
+    """
+    Give back stock of expired holds.  Runs at most every SWEEP_INTERVAL
+    seconds per process unless `force`; locked rows are skipped so
+    concurrent sweepers never wait on each other.  Returns rows released.
+    """
+    global _last_sweep
+    with _sweep_lock:
+        now = time.monotonic()
+        if not force and now - _last_sweep < SWEEP_INTERVAL:
+            return 0
+        _last_sweep = now
+
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction()
+            cursor.execute("""
+                SELECT reservation_id, menu_id, quantity FROM Stock_Reservations
+                WHERE expires_at < NOW()
+                ORDER BY menu_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (batch,))
+            rows = cursor.fetchall()
+            if rows:
+                totals = {}
+                for row in rows:
+                    totals[row['menu_id']] = totals.get(row['menu_id'], 0) + int(row['quantity'])
+                increment(cursor, totals)
+                ids = [row['reservation_id'] for row in rows]
+                cursor.execute(
+                    f"DELETE FROM Stock_Reservations WHERE reservation_id IN ({_in_clause(ids)})", ids
+                )
+            conn.commit()
+        finally:
+            cursor.close()
+    return len(rows)
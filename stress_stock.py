@@ -0,0 +1,156 @@
+"""
+Concurrency stress check for checkout stock handling.
+
+Creates one "hot" menu item with a small stock and many throw-away users,
+then lets many threads add the item to their carts and check out at the
+same time through orders.place_order().  Afterwards it verifies that:
+
+- the item was never oversold (stock >= 0),
+- stock sold == quantity in Order_Items for the item == sum of successful orders,
+- every failed checkout failed cleanly with OutOfStockError (no deadlocks,
+  no half-written orders).
+
+Requires a database migrated with `python migrate.py`.
+
+    python stress_stock.py --threads 32 --orders 20 --stock 150
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+import uuid
+
+import mysql.connector
+
+from db import get_connection, pool_stats
+from orders import place_order
+from stock import OutOfStockError
+
+
+def _setup(users, stock_qty, restaurant_id):
+    tag = uuid.uuid4().hex[:8]
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO Menu (restaurant_id, name, price, category, stock) VALUES (%s,%s,%s,%s,%s)",
+            (restaurant_id, f"Stress Item {tag}", 10.00, "Stress", stock_qty)
+        )
+        menu_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO Users (name, email, password) VALUES (%s,%s,%s)",
+            [(f"stress-{tag}-{i}", f"stress-{tag}-{i}@example.com", "x") for i in range(users)]
+        )
+        cur.execute("SELECT user_id FROM Users WHERE email LIKE %s ORDER BY user_id", (f"stress-{tag}-%",))
+        user_ids = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        cur.close()
+    return menu_id, user_ids
+
+
+def _cleanup(menu_id, user_ids):
+    placeholders = ",".join(["%s"] * len(user_ids))
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT order_id FROM Orders WHERE user_id IN ({placeholders})", user_ids)
+        order_ids = [row[0] for row in cur.fetchall()]
+        if order_ids:
+            ph = ",".join(["%s"] * len(order_ids))
+            for table in ("Payments", "Order_Status_History", "Order_Items"):
+                cur.execute(f"DELETE FROM {table} WHERE order_id IN ({ph})", order_ids)
+            cur.execute(f"DELETE FROM Orders WHERE order_id IN ({ph})", order_ids)
+        cur.execute(f"DELETE FROM Cart WHERE user_id IN ({placeholders})", user_ids)
+        cur.execute(f"DELETE FROM Stock_Reservations WHERE user_id IN ({placeholders})", user_ids)
+        cur.execute(f"DELETE FROM Users WHERE user_id IN ({placeholders})", user_ids)
+        cur.execute("DELETE FROM Menu WHERE menu_id=%s", (menu_id,))
+        conn.commit()
+        cur.close()
+
+
+def _worker(user_id, menu_id, orders, max_qty, results, lock):
+    rng = random.Random(user_id)
+    for _ in range(orders):
+        qty = rng.randint(1, max_qty)
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO Cart (user_id, menu_id, quantity) VALUES (%s,%s,%s) "
+                "ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)",
+                (user_id, menu_id, qty)
+            )
+            cart_id = cur.lastrowid
+            if not cart_id:
+                cur.execute("SELECT cart_id FROM Cart WHERE user_id=%s AND menu_id=%s", (user_id, menu_id))
+                cart_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
+        try:
+            place_order(user_id, [cart_id], "UPI")
+            outcome, sold = "ok", qty
+        except OutOfStockError:
+            outcome, sold = "out_of_stock", 0
+        except mysql.connector.Error as e:
+            outcome, sold = f"db_error:{e.errno}", 0
+        with lock:
+            results[outcome] = results.get(outcome, 0) + 1
+            results["sold"] = results.get("sold", 0) + sold
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hammer one hot menu item from many threads.")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=20, help="checkouts per thread")
+    parser.add_argument("--stock", type=int, default=150, help="initial stock of the hot item")
+    parser.add_argument("--max-qty", type=int, default=3)
+    parser.add_argument("--restaurant-id", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep the generated rows")
+    args = parser.parse_args(argv)
+
+    menu_id, user_ids = _setup(args.threads, args.stock, args.restaurant_id)
+    results, lock = {}, threading.Lock()
+    threads = [
+        threading.Thread(target=_worker, args=(uid, menu_id, args.orders, args.max_qty, results, lock))
+        for uid in user_ids
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT stock FROM Menu WHERE menu_id=%s", (menu_id,))
+        final_stock = cur.fetchone()[0]
+        cur.execute("SELECT IFNULL(SUM(quantity), 0) FROM Order_Items WHERE menu_id=%s", (menu_id,))
+        ordered = int(cur.fetchone()[0])
+        cur.close()
+
+    sold = results.get("sold", 0)
+    print(f"{args.threads} threads x {args.orders} checkouts in {elapsed:.2f}s")
+    print(f"outcomes: { {k: v for k, v in results.items() if k != 'sold'} }")
+    print(f"stock {args.stock} -> {final_stock}, sold {sold}, in Order_Items {ordered}")
+    print(f"pool: {pool_stats()}")
+
+    failures = []
+    if final_stock < 0:
+        failures.append("stock went negative (oversold)")
+    if args.stock - final_stock != sold or ordered != sold:
+        failures.append("stock sold, Order_Items and successful checkouts disagree")
+    unexpected = [k for k in results if k.startswith("db_error")]
+    if unexpected:
+        failures.append(f"unexpected database errors: {unexpected}")
+
+    if not args.keep:
+        _cleanup(menu_id, user_ids)
+
+    for f in failures:
+        print(f"FAIL: {f}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())